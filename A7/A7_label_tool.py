@@ -3,114 +3,98 @@ from tkinter import filedialog, messagebox
 from PIL import Image, ImageTk
 import os
 import json
-import shutil
-import copy
-import glob
 import re
-import math
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.prefetch import ImagePrefetcher, when_ready
+from common.overlays import parse_labeling_info, read_label_json, sidecar_json_path
+from common.materialize import OutputMaterializer
+from common.a7_transform import (BOX_COLOR, transform_json_data, transform_json_data_multi,
+                                 crop_json_data, make_a7_basename, make_a7_patch_basename)
+from common.crop import save_crop
+from common.journal import ActionJournal, journal_path_for, resume_position
+from common.write_queue import BackgroundWriter
+from common.scan_manifest import StreamingScan, when_resume_position
+from common.json_cache import JsonCache
+from common.perf import PERF
+from common.geometry import display_polygon
+from common.cursor import CursorBox
+from common.tiled_viewer import TiledViewer
+from common.lease import LeaseManager
+from common.shards import ShardWriter, sample_key
+from common.lesion_mask import suggest_patches, LesionMask
 
 # 1. TARGET_OUTPUT_DIR: 정상적으로 라벨링(A7)된 결과물이 저장될 폴더
 # 2. AMBIGUOUS_DIR: 'Next(애매함)' 버튼 클릭 시 원본 이미지가 격리될 폴더
 TARGET_OUTPUT_DIR = r"."
 AMBIGUOUS_DIR = r"."
 
+# 3. OUTPUT_STRATEGY: 원본 JPG를 결과 폴더에 만드는 방식
+#    "auto"(reflink -> hardlink -> copy) | "reflink" | "hardlink" | "symlink" | "copy"
+OUTPUT_STRATEGY = "auto"
+
+# 4. LEASE_MODE: 여러 명이 같은 폴더를 동시에 작업할 때 True
+#    (입력 폴더의 .leases/ 로 이미지 구간을 나눠 가짐, 작업자 이름: LABELING_ANNOTATOR 환경변수)
+LEASE_MODE = False
+
+# 5. SHARD_EXPORT_DIR: 라벨링 결과를 tar shard 로도 함께 저장할 폴더 (None = 끔)
+#    학습 시 작은 파일 대신 큰 파일을 순차로 읽도록. 기존 결과 폴더는 python -m common.shards 로 일괄 변환
+SHARD_EXPORT_DIR = None
+
+# 6. OUTPUT_MODE: 결과 JPG 형태
+#    "full": 원본 이미지 전체 (OUTPUT_STRATEGY 방식) | "crop": 선택한 박스(224x224) 부분만 저장
+#    crop 이면 JSON 박스는 패치 기준 (0, 0), 원본에서의 위치는 metaData["crop"] 에 기록
+#    이미 "full" 로 만든 결과 폴더는 A7/extract_crops.py 로 일괄 변환
+OUTPUT_MODE = "full"
+
+# 7. SUGGEST_TOP_K: 병변(A1~A6 polygon/box)과 겹치지 않는 추천 위치 개수 (0 = 끔)
+#    점선 박스 + 번호로 표시, 숫자키 1~K 로 바로 라벨링. 병변에서 먼 곳이 앞 번호
+SUGGEST_TOP_K = 3
+
+# 8. MULTI_PATCH: True 면 클릭할 때마다 박스가 추가되고 Enter/Space 로 한 번에 저장 (Back = 마지막 박스 취소)
+#    MULTI_PATCH_NO_OVERLAP: 박스끼리 겹치는 클릭은 무시
+#    MULTI_PATCH_OUTPUT: "files" = 박스마다 결과 한 쌍 (IMG_..._A7_..._p1, _p2, ...)
+#                        "single" = 결과 한 쌍, JSON labelingInfo 에 박스 여러 개 (OUTPUT_MODE="crop" 이면 항상 files)
+MULTI_PATCH = False
+MULTI_PATCH_NO_OVERLAP = True
+MULTI_PATCH_OUTPUT = "files"
+
+# 9. OVERLAP_WARN: 커서 박스가 병변(A1~A6)과 겹치면 빨간색으로 표시 (겹치는 비율 > OVERLAP_WARN_FRACTION)
+#    OVERLAP_BLOCK_FRACTION: 이 비율보다 많이 겹치는 클릭은 무시 (None = 경고만)
+OVERLAP_WARN = True
+OVERLAP_WARN_FRACTION = 0.0
+OVERLAP_BLOCK_FRACTION = None
+
 # [STYLE CONFIGURATION]
-BOX_COLOR = "#27b73c" # 건들지 마세요
+# BOX_COLOR ("#27b73c")는 common/a7_transform.py 에 정의 (건들지 마세요)
 BOX_WIDTH = 2 # 건들지 마세요
 
-# --- Shared Logic ---
-
-def clamp_coordinates(x, y, img_w, img_h, box_w=224, box_h=224):
-    """
-    Ensure the box defined by top-left (x, y) stays within image bounds.
-    """
-    if img_w < box_w:
-        final_x = 0
+def write_labeled_outputs(img_path, json_path, x, y, box_w, box_h, out_img, out_json, materializer,
+                          load_json=read_label_json, shards=None, crop=False):
+    """Read + transform + write one A7 pair (runs on a BackgroundWriter thread)."""
+    data = load_json(json_path)  # JsonCache.get: usually parsed already by the prefetcher
+    if crop:
+        img_w, img_h = save_crop(img_path, out_img, x, y, box_w, box_h)
+        new_data = crop_json_data(data, x, y, box_w, box_h, img_w, img_h)
     else:
-        final_x = max(0, min(x, img_w - box_w))
-        
-    if img_h < box_h:
-        final_y = 0
-    else:
-        final_y = max(0, min(y, img_h - box_h))
-        
-    return final_x, final_y
-
-def transform_json_data(original_data, top_left_x, top_left_y, box_w=224, box_h=224):
-    new_data = copy.deepcopy(original_data)
-    
-    # Text Substitution Helper
-    def replace_text_strict_path(text):
-        if not isinstance(text, str): return text
-        text = text.replace("유증상", "무증상")
-        # Regex: A[1-6]_[^/]+ -> A7_정상
-        text = re.sub(r'A[1-6]_[^/]+', 'A7_정상', text)
-        return text
-        
-    def replace_text_filename(text):
-        if not isinstance(text, str): return text
-        text = re.sub(r'A[1-6]', 'A7', text)
-        return text
-
-    # Metadata Transformation
-    meta = new_data.get("metaData", {})
-    
-    if "Raw data ID" in meta:
-        meta["Raw data ID"] = replace_text_filename(meta["Raw data ID"])
-        
-    meta["lesions"] = "A7"
-    meta["Path"] = "무증상"
-    meta["diagnosis"] = "정상" # Strict Rule
-    
-    if "src_path" in meta:
-        meta["src_path"] = replace_text_strict_path(meta["src_path"])
-    if "label_path" in meta:
-        meta["label_path"] = replace_text_strict_path(meta["label_path"])
-        
-    # Labeling Info
-    x1 = int(top_left_x)
-    y1 = int(top_left_y)
-    x2 = x1 + box_w
-    y2 = y1
-    x3 = x2
-    y3 = y1 + box_h
-    x4 = x1
-    y4 = y3
-    x5 = x1
-    y5 = y1
-    
-    polygon_item = {
-        "polygon": {
-            "color": BOX_COLOR,
-            "location": [
-                {
-                    "x1": x1, "y1": y1,
-                    "x2": x2, "y2": y2,
-                    "x3": x3, "y3": y3,
-                    "x4": x4, "y4": y4,
-                    "x5": x5, "y5": y5
-                }
-            ],
-            "label": "A7_정상",
-            "type": "polygon"
-        }
-    }
-    
-    box_item = {
-        "box": {
-            "color": BOX_COLOR,
-            "location": [
-                {"x": x1, "y": y1, "width": box_w, "height": box_h}
-            ],
-            "label": "A7_정상",
-            "type": "box"
-        }
-    }
-    
-    new_data["labelingInfo"] = [polygon_item, box_item]
-    new_data["inspRejectYn"] = "N"
-    
-    return new_data
+        new_data = transform_json_data(data, x, y, box_w, box_h)
+    with open(out_json, 'w', encoding='utf-8') as f:
+        json.dump(new_data, f, ensure_ascii=False, indent=2)
+    if not crop:
+        materializer.place(img_path, out_img)
+    if shards is not None:
+        shards.add_pair(sample_key(os.path.dirname(out_img), out_img), out_img if crop else img_path, new_data)
+
+def write_multi_outputs(img_path, json_path, boxes, box_w, box_h, out_img, out_json, materializer,
+                        load_json=read_label_json, shards=None):
+    """MULTI_PATCH_OUTPUT="single": one A7 pair with a polygon + box per patch (BackgroundWriter thread)."""
+    new_data = transform_json_data_multi(load_json(json_path), boxes, box_w, box_h)
+    with open(out_json, 'w', encoding='utf-8') as f:
+        json.dump(new_data, f, ensure_ascii=False, indent=2)
+    materializer.place(img_path, out_img)
+    if shards is not None:
+        shards.add_pair(sample_key(os.path.dirname(out_img), out_img), img_path, new_data)
 
 # --- GUI Class ---
 
@@ -122,26 +106,76 @@ class LabelTool:
         
         # State
         self.image_list = []
+        self.scan = None  # StreamingScan filling image_list in the background
         self.current_index = 0
         self.base_dir = ""
         self.target_dir = TARGET_OUTPUT_DIR
         self.ambiguous_dir = AMBIGUOUS_DIR
         self.tk_image = None
+        self.image_item = None
         self.raw_pil_image = None
         self.scale_factor = 1.0  # Resize factor (visual / original)
         self.box_w = 224
         self.box_h = 224
-        self.rect_id = None
+        self.lease = None  # LeaseManager in LEASE_MODE
+        self.cursor = None  # CursorBox, created with the canvas
         
         # Stats
         self.count_labeled = 0
         self.count_skipped = 0
+        self.count_patches = 0  # boxes written (more than labeled images in MULTI_PATCH mode)
+        
+        # Boxes clicked on the current image, not saved yet (MULTI_PATCH): [(x, y)] ORIGINAL coords
+        self.pending_patches = []
+        
+        # Append-only decision log (resume + multi-level undo across restarts)
+        self.journal = None
+        
+        # Background decode + resize of the next/previous images
+        # (recently shown frames stay in an LRU cache, so Back is instant)
+        self.prefetcher = ImagePrefetcher(self.root.winfo_screenwidth() * 0.9,
+                                          self.root.winfo_screenheight() * 0.9,
+                                          overlay_loader=self._load_overlays)
+        self.current_overlays = []
+        self.current_suggestions = []  # [(x, y, clearance)] in ORIGINAL coords, best first
+        self.current_lesions = None  # LesionMask of the shown image (cursor overlap warning)
+        
+        # Label JSON parsed once per session: overlay drawing and the A7 transform share it
+        self.json_cache = JsonCache()
+        
+        # Hardlink/reflink output files instead of byte copies where possible
+        self.materializer = OutputMaterializer(OUTPUT_STRATEGY)
+        
+        # Output writes run off the UI thread (bounded queue, flushed on close)
+        self.writer = BackgroundWriter()
+        # Optional packed export (tar shards), appended by the writer threads
+        self.shards = ShardWriter(SHARD_EXPORT_DIR) if SHARD_EXPORT_DIR else None
         
         # Ensure Dirs (Only if paths are set)
         self.ensure_dirs()
         
         # UI Setup
         self.setup_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.writer.watch(self.root, self._on_write_error)
+        PERF.attach_hud(self.root)  # LABELING_PERF=1 only
+        
+    def _on_write_error(self, job):
+        messagebox.showerror("Error", f"Saving failed: {job.label}\n{job.error}\n\nBack으로 되돌린 뒤 다시 작업해주세요.")
+        
+    def on_close(self):
+        self.writer.shutdown()  # nothing queued is lost
+        if self.shards is not None:
+            self.shards.close()  # seals the last shard
+        self.prefetcher.shutdown()
+        print(f"[DEBUG] JSON cache: {self.json_cache.stats()}")
+        if self.lease is not None:
+            self.lease.release()  # the rest of the chunk is free for others right away
+        if self.journal is not None:
+            self.save_progress()  # once per session, for anything still reading progress.json
+            self.journal.close()  # compaction
+        PERF.close()
+        self.root.destroy()
         
     def ensure_dirs(self):
         # If paths are empty strings, do not try to create them yet.
@@ -172,6 +206,11 @@ class LabelTool:
         self.btn_next = tk.Button(btn_frame, text="2. Next (애매함/Skip) [N]", command=self.on_ambiguous_click, height=2, width=22, bg="#ffdddd")
         self.btn_next.pack(side=tk.LEFT, padx=5)
         
+        if MULTI_PATCH:
+            self.btn_save = tk.Button(btn_frame, text="3. 저장 (박스 전부) [Enter]", command=self.process_image_patches,
+                                      height=2, width=24, bg="#ddffdd")
+            self.btn_save.pack(side=tk.LEFT, padx=5)
+        
         # Status Label
         self.lbl_status = tk.Label(top_frame, text="폴더를 선택해주세요.", font=("Arial", 12))
         self.lbl_status.pack(side=tk.LEFT, padx=10)
@@ -195,8 +234,15 @@ class LabelTool:
         self.h_scroll.pack(side=tk.BOTTOM, fill=tk.X)
         self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
-        # Events
-        self.canvas.bind("<Motion>", self.on_mouse_move)
+        # Zoom/pan (Ctrl+Wheel, +/-, 0 = fit): tiles from an image pyramid, only in view
+        self.viewer = TiledViewer(self.canvas, self.v_scroll, self.h_scroll, on_zoom=self._on_zoom)
+        self.viewer.bind_keys(self.root)
+        
+        # Events (motion is coalesced and redrawn at most CURSOR_FPS times a second)
+        # (the box turns red over a lesion: O(1) lookups in the image's LesionMask)
+        self.cursor = CursorBox(self.canvas, self._cursor_geometry, (self.box_w, self.box_h),
+                                outline=BOX_COLOR, width=BOX_WIDTH, warn=self._overlaps_lesion)
+        self.cursor.bind()
         self.canvas.bind("<Button-1>", self.on_click_canvas)
 
         # --- Mouse Wheel Scrolling ---
@@ -215,6 +261,11 @@ class LabelTool:
         self.root.bind("<N>", lambda e: self.on_ambiguous_click())
         self.root.bind("<b>", lambda e: self.on_back_click())
         self.root.bind("<B>", lambda e: self.on_back_click())
+        if MULTI_PATCH:
+            self.root.bind("<Return>", lambda e: self.process_image_patches())
+            self.root.bind("<space>", lambda e: self.process_image_patches())
+        for number in range(1, min(SUGGEST_TOP_K, 9) + 1):
+            self.root.bind(f"<Key-{number}>", lambda e, n=number: self.on_suggestion_key(n))
 
     def _on_mousewheel(self, event):
         """Vertical scroll logic"""
@@ -253,7 +304,8 @@ class LabelTool:
         
     def save_progress(self):
         """
-        Auto-save current index and counts to progress.json in TARGET_OUTPUT_DIR.
+        Write current index and counts to progress.json in TARGET_OUTPUT_DIR.
+        Only at session close now; decisions go to the journal.
         """
         if not self.target_dir or not os.path.exists(self.target_dir):
             return
@@ -281,250 +333,375 @@ class LabelTool:
         directory = filedialog.askdirectory()
         if directory:
             self.base_dir = directory
+            self.prefetcher.clear()
             
             if not self.target_dir or not self.ambiguous_dir:
                 messagebox.showwarning("Warning", "코드 상단의 TARGET_OUTPUT_DIR 및 AMBIGUOUS_DIR 변수가 비어있을 수 있습니다.\n경로를 확인해주세요.")
             
-            # Recursive Search
-            search_pattern = os.path.join(directory, "**", "*.jpg")
-            all_jpgs = glob.glob(search_pattern, recursive=True)
-            all_jpgs = sorted(all_jpgs)
-            
+            # Recursive Search, streamed: images appear in final (sorted) order while the scan runs
+            # (cached manifest: only changed folders are listed again)
+            if self.scan is not None:
+                self.scan.cancel()
             # Filter: filenames containing A1~A6
-            self.image_list = [f for f in all_jpgs if re.search(r'A[1-6]', os.path.basename(f))]
+            self.scan = StreamingScan(directory, accept=lambda f: re.search(r'A[1-6]', os.path.basename(f)))
+            self.image_list = self.scan.items
+            self.scan.watch(self.root, self.update_status)
             
-            if not self.image_list:
-                messagebox.showerror("Error", f"No proper image files (A1~A6) found in: {directory}")
-                return
-            
-            # --- Resume Logic ---
             self.current_index = 0
             self.count_labeled = 0
             self.count_skipped = 0
+            self.count_patches = 0
+            self.tk_image = None
+            self.canvas.delete("all")
+            self.viewer.clear()
+            self.lbl_status.config(text="Scanning...")
             
-            if self.target_dir:
-                progress_path = os.path.join(self.target_dir, "progress.json")
-                if os.path.exists(progress_path):
-                    try:
-                        with open(progress_path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            last_idx = data.get("last_index", 0)
-                            
-                            # Restore Stats
-                            self.count_labeled = data.get("count_labeled", 0)
-                            self.count_skipped = data.get("count_skipped", 0)
-                            
-                        # Confirm Resume
-                        if messagebox.askyesno("Resume", f"이전 작업 기록({last_idx}번째)이 있습니다.\n"
-                                                         f"- Labeled: {self.count_labeled}\n"
-                                                         f"- Skipped: {self.count_skipped}\n"
-                                                         f"이어서 하시겠습니까?"):
-                            if 0 <= last_idx < len(self.image_list):
-                                self.current_index = last_idx
-                            else:
-                                messagebox.showwarning("Warning", "저장된 인덱스가 범위를 벗어났습니다. 처음부터 시작합니다.")
-                                self.current_index = 0
-                                self.count_labeled = 0
-                                self.count_skipped = 0
-                        else:
-                            # Reset if user chooses NO
-                            self.count_labeled = 0
-                            self.count_skipped = 0
-                            
-                    except Exception as e:
-                        print(f"Failed to load progress: {e}")
+            # Start as soon as the first image is found
+            self.scan.when_available(self.root, 1, lambda d=directory: self._start_session(d))
             
+    def _start_session(self, directory):
+        if not self.image_list:
+            messagebox.showerror("Error", f"No proper image files (A1~A6) found in: {directory}")
+            return
+        
+        # --- Resume Logic ---
+        if not self.target_dir:
             self.load_image()
-            self.save_progress() # Save initial state (0 or resumed)
+            return
+        
+        progress_path = os.path.join(self.target_dir, "progress.json")
+        if LEASE_MODE:
+            self._start_leased(directory, progress_path)
+            return
+        
+        if self.journal is None:
+            try:
+                self.journal = ActionJournal(journal_path_for(progress_path))
+            except OSError as e:
+                print(f"Failed to open journal: {e}")
+        
+        last = self.journal.last() if self.journal is not None else None
+        if last is not None:
+            # Waits only until the saved position has been scanned
+            when_resume_position(self.scan, self.root, last,
+                                 lambda idx: self._confirm_resume(idx, last["counts"], False))
+            return
+        
+        if os.path.exists(progress_path):
+            # progress.json from before the journal
+            try:
+                with open(progress_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                last_idx = data.get("last_index", 0)
+                counts = {"labeled": data.get("count_labeled", 0), "skipped": data.get("count_skipped", 0)}
+                self.scan.when_available(self.root, last_idx + 1,
+                                         lambda: self._confirm_resume(last_idx, counts, True))
+                return
+            except Exception as e:
+                print(f"Failed to load progress: {e}")
+        
+        self.load_image()
+        
+    def _start_leased(self, directory, progress_path):
+        """
+        Multi-annotator session: everyone gets disjoint chunks of the same sorted list
+        (.leases/plan.json), so it starts once the scan is complete. Own journal per annotator; no prompt,
+        the journal and the lease files already say where to continue.
+        """
+        if self.lease is not None:
+            self.lease.release()
+        try:
+            self.lease = LeaseManager(directory)
+            if self.journal is not None:
+                self.journal.close()
+            self.journal = ActionJournal(self.lease.journal_path(progress_path))
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to set up leasing in {directory}:\n{e}")
+            return
+        self.lbl_status.config(text="Scanning... (lease mode: waiting for the full list)")
+        
+        def begin():
+            # plan.json: the list of whoever started first, so chunk indices match for everyone
+            self.image_list = self.lease.load_plan(self.scan.items)
+            last = self.journal.last()
+            prefer = None
+            if last is not None:
+                prefer = resume_position(last, self.image_list)
+                self._set_counts(last["counts"])
+            idx = self.lease.start(len(self.image_list), prefer)
+            self.current_index = len(self.image_list) if idx is None else idx
+            print(f"[DEBUG] Lease ({self.lease.owner}): starting at {self.current_index}")
+            self.lease.heartbeat(self.root)
+            self.load_image()
+        
+        self.scan.when_available(self.root, None, begin)
+        
+    def _next_index(self):
+        # Plain mode: the next image. Lease mode: next in the chunk, or the start of a newly claimed one
+        if self.lease is None:
+            return self.current_index + 1
+        nxt = self.lease.advance(self.current_index)
+        return len(self.image_list) if nxt is None else nxt
+        
+    def _confirm_resume(self, last_idx, counts, legacy):
+        # Confirm Resume
+        if messagebox.askyesno("Resume", f"이전 작업 기록({last_idx}번째)이 있습니다.\n"
+                                         f"- Labeled: {counts.get('labeled', 0)}\n"
+                                         f"- Skipped: {counts.get('skipped', 0)}\n"
+                                         f"이어서 하시겠습니까?"):
+            if 0 <= last_idx < len(self.image_list):
+                self.current_index = last_idx
+                self._set_counts(counts)
+                if legacy and self.journal is not None:
+                    self.journal.record("BASE", last_idx, last_idx, counts=self._counts())
+            else:
+                messagebox.showwarning("Warning", "저장된 인덱스가 범위를 벗어났습니다. 처음부터 시작합니다.")
+        elif self.journal is not None:
+            # Reset if user chooses NO
+            self.journal.reset()
+        
+        self.load_image()
             
+    def _refine_image(self, img_path, refine):
+        """
+        Swap the draft preview for the full-quality render (same size, same scale_factor).
+        Ignored if the user already moved to another image.
+        """
+        if self.current_index >= len(self.image_list) or self.image_list[self.current_index] != img_path:
+            return
+        try:
+            frame = refine.result()
+        except Exception:
+            return
+        with PERF.stage("refine_swap"):
+            self.tk_image = ImageTk.PhotoImage(frame.image)
+            self.canvas.itemconfig(self.image_item, image=self.tk_image)
+        # The draft has no overlays (parsing + suggestions run on the worker): draw them now
+        self._set_overlays(frame.overlays)
+        self.canvas.delete("existing_label")
+        self.canvas.delete("suggestion")
+        self.load_existing_labels()
+        self.draw_suggestions()
+
+    def _set_overlays(self, overlays):
+        overlays = overlays or {}
+        self.current_overlays = overlays.get("shapes", [])
+        self.current_suggestions = overlays.get("suggestions", [])
+        self.current_lesions = overlays.get("lesions")
+
+    def _load_overlays(self, img_path):
+        """
+        Parse the corresponding JSON file once (runs on a prefetch worker) and rank the
+        lesion-free patch positions. Both are cached with the frame, so Back doesn't redo them.
+        """
+        json_path = sidecar_json_path(img_path)
+        shapes = parse_labeling_info(self.json_cache.get(json_path))
+        overlays = {"shapes": shapes, "suggestions": [], "lesions": None}
+        if SUGGEST_TOP_K > 0 or OVERLAP_WARN:
+            with Image.open(img_path) as im:  # header only
+                img_w, img_h = im.size
+            if SUGGEST_TOP_K > 0:
+                with PERF.stage("suggest"):
+                    overlays["suggestions"] = suggest_patches(shapes, img_w, img_h, self.box_w, self.box_h,
+                                                              SUGGEST_TOP_K)
+            if OVERLAP_WARN:
+                overlays["lesions"] = LesionMask(shapes, img_w, img_h)
+        return overlays
+
+    @PERF.timed("draw_overlays")
     def load_existing_labels(self):
         """
-        Load and visualize existing labels from the corresponding JSON file.
+        Visualize existing labels parsed from the corresponding JSON file.
         Scale coordinates by self.scale_factor.
         - Box: Red outline
         - Polygon: Blue outline
         """
         if not self.tk_image: return
         
-        current_img_path = self.image_list[self.current_index]
-        basename = os.path.basename(current_img_path)
-        base_name_no_ext = os.path.splitext(basename)[0]
-        json_path = os.path.join(os.path.dirname(current_img_path), base_name_no_ext + ".json")
+        factor = self.scale_factor
         
-        if not os.path.exists(json_path):
-            return
-
-        try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+        for kind, coords, _ in self.current_overlays:
+            # 1. Box
+            if kind == "box":
+                x, y, w, h = coords
                 
-            labeling_info = data.get("labelingInfo", [])
-            factor = self.scale_factor
-            
-            for item in labeling_info:
-                # 1. Box
-                if "box" in item:
-                    box_data = item["box"]
-                    loc_list = box_data.get("location", [])
-                    # location could be a list of dicts
-                    for loc in loc_list:
-                        # Original Coords
-                        x = loc.get("x", 0)
-                        y = loc.get("y", 0)
-                        w = loc.get("width", 0)
-                        h = loc.get("height", 0)
-                        
-                        # Scaled Coords for Visual
-                        sx = x * factor
-                        sy = y * factor
-                        sw = w * factor
-                        sh = h * factor
-                        
-                        self.canvas.create_rectangle(sx, sy, sx+sw, sy+sh, outline="red", width=2, tags="existing_label")
-                        
-                # 2. Polygon
-                if "polygon" in item:
-                    poly_data = item["polygon"]
-                    loc_list = poly_data.get("location", [])
-                    for loc in loc_list:
-                        # loc is like {"x1": 100, "y1": 100, ...}
-                        # We need to flatten and scale
-                        coords = []
-                        i = 1
-                        while True:
-                            kx = f"x{i}"
-                            ky = f"y{i}"
-                            if kx in loc and ky in loc:
-                                coords.append(loc[kx] * factor)
-                                coords.append(loc[ky] * factor)
-                                i += 1
-                            else:
-                                break
-                        
-                        if coords:
-                            self.canvas.create_polygon(coords, outline="blue", width=2, fill="", tags="existing_label")
-                            
-        except Exception as e:
-            print(f"Failed to load existing labels for {basename}: {e}")
+                # Scaled Coords for Visual
+                sx = x * factor
+                sy = y * factor
+                sw = w * factor
+                sh = h * factor
+                
+                self.canvas.create_rectangle(sx, sy, sx+sw, sy+sh, outline="red", width=2, tags="existing_label")
+                
+            # 2. Polygon
+            elif kind == "polygon":
+                scaled = display_polygon(coords, factor)
+                self.canvas.create_polygon(scaled, outline="blue", width=2, fill="", tags="existing_label")
 
-    def load_image(self):
+    def draw_suggestions(self):
+        """Dashed boxes at the suggested positions, numbered like the keys that accept them."""
+        factor = self.scale_factor
+        for i, (x, y, _) in enumerate(self.current_suggestions, start=1):
+            sx, sy = x * factor, y * factor
+            self.canvas.create_rectangle(sx, sy, sx + self.box_w * factor, sy + self.box_h * factor,
+                                         outline="yellow", width=2, dash=(6, 4), tags="suggestion")
+            self.canvas.create_text(sx + 4, sy + 4, text=str(i), fill="yellow", anchor=tk.NW,
+                                    font=("Arial", 14, "bold"), tags="suggestion")
+
+    def on_suggestion_key(self, number):
+        # Guard
+        if not self.tk_image: return
+        if self.current_index >= len(self.image_list): return
+        if number > len(self.current_suggestions): return
+        
+        # Already ORIGINAL coords and inside the image (same as a clamped click)
+        x, y, _ = self.current_suggestions[number - 1]
+        if MULTI_PATCH:
+            self.add_patch(x, y)
+        else:
+            self.process_image_labeled(x, y)
+
+    def update_status(self):
         # Update Status Bar with Stats
         status_text = f"[{self.current_index+1}/{len(self.image_list)}]"
         if 0 <= self.current_index < len(self.image_list):
             status_text += f" {os.path.basename(self.image_list[self.current_index])}"
             
         status_text += f" | Labeled: {self.count_labeled} | Skipped: {self.count_skipped}"
+        if MULTI_PATCH:
+            status_text += f" | Patches: {self.count_patches}"
+            if self.pending_patches:
+                status_text += f" (+{len(self.pending_patches)} pending, Enter = 저장)"
+        
+        if self.scan is not None and not self.scan.done:
+            status_text += f" | {self.scan.status_text()}"
+        if self.lease is not None:
+            status_text += f" | {self.lease.status_text()}"
         
         self.lbl_status.config(text=status_text)
         
+    @PERF.timed("load_image")
+    def load_image(self):
+        self.pending_patches = []  # boxes belong to the image they were clicked on
+        self.update_status()
+        
+        # Guard: not scanned this far yet -> show it when it arrives
+        if self.current_index >= len(self.image_list) and self.scan is not None and not self.scan.done:
+            self.tk_image = None
+            self.canvas.delete("all")
+            self.viewer.clear()
+            self.scan.when_available(self.root, self.current_index + 1, self.load_image)
+            return
+        
         # Guard: End of list
         if self.current_index >= len(self.image_list):
             self.tk_image = None
             self.canvas.delete("all")
+            self.viewer.clear()
             messagebox.showinfo("Done", "모든 이미지가 처리되었습니다!")
             return
             
         img_path = self.image_list[self.current_index]
         
         try:
-            pil_img = Image.open(img_path)
-            self.raw_pil_image = pil_img
-            
-            # --- Auto-Resize Logic ---
-            screen_w = self.root.winfo_screenwidth()
-            screen_h = self.root.winfo_screenheight()
-            
-            target_w = screen_w * 0.9
-            target_h = screen_h * 0.9
-            
-            img_w, img_h = pil_img.size
-            self.scale_factor = 1.0
-            
-            # Check if scaling is needed
-            scale_w = target_w / img_w
-            scale_h = target_h / img_h
-            
-            if scale_w < 1.0 or scale_h < 1.0:
-                self.scale_factor = min(scale_w, scale_h)
-                
-            new_w = int(img_w * self.scale_factor)
-            new_h = int(img_h * self.scale_factor)
-            
-            # Create Resized Image for display
-            # Compatibility for older Pillow versions
-            resample_method = Image.Resampling.LANCZOS if hasattr(Image, "Resampling") else Image.LANCZOS
-            display_img = pil_img.resize((new_w, new_h), resample_method)
-            self.tk_image = ImageTk.PhotoImage(display_img)
+            # Decoded + resized on a worker thread (ready already if prefetched)
+            # (draft preview first if not prefetched yet; full quality swapped in when idle)
+            frame, refine = self.prefetcher.get_progressive(img_path)
+            self.scale_factor = frame.scale_factor
+            self._set_overlays(frame.overlays)  # None for a draft: they come with the refined frame
+            new_w, new_h = frame.size
+            with PERF.stage("photoimage"):
+                self.tk_image = ImageTk.PhotoImage(frame.image)
+            
+            # Warm up the next images (and the previous one for Back)
+            self.prefetcher.schedule(self.image_list, self.current_index)
             
             self.canvas.delete("all")
             self.canvas.config(scrollregion=(0, 0, new_w, new_h))
-            self.canvas.create_image(0, 0, image=self.tk_image, anchor=tk.NW)
+            self.image_item = self.canvas.create_image(0, 0, image=self.tk_image, anchor=tk.NW)
+            self.viewer.reset(img_path, frame.orig_size, frame.scale_factor, self.image_item, (new_w, new_h))
+            if refine is not None:
+                when_ready(self.root, refine, lambda fut, p=img_path: self._refine_image(p, fut))
             
-            # Cursor Box (Reset ID)
-            self.rect_id = self.canvas.create_rectangle(0, 0, 0, 0, outline=BOX_COLOR, width=BOX_WIDTH)
+            # Cursor Box (new item on the cleared canvas)
+            self.cursor.reset()
             
             # Load & Visualize Existing Labels
             self.load_existing_labels()
+            self.draw_suggestions()
+            self.draw_pending_patches()
             
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load image: {e}")
 
-    def get_clamped_box_coords(self, mouse_x, mouse_y):
-        """
-        Returns SCALED coordinates clamped to the RESIZED image.
-        Uses this for visual drawing of the cursor box.
-        """
-        if not self.tk_image: return 0, 0
-        
-        # Display Box Size
-        disp_w = self.box_w * self.scale_factor
-        disp_h = self.box_h * self.scale_factor
-        
-        # Center the box on mouse (Visual Coords)
-        tl_x = mouse_x - (disp_w / 2)
-        tl_y = mouse_y - (disp_h / 2)
-        
-        # Clamp to RESIZED image dimensions
-        img_w = self.tk_image.width()
-        img_h = self.tk_image.height()
-        
-        final_x = max(0, min(tl_x, img_w - disp_w))
-        final_y = max(0, min(tl_y, img_h - disp_h))
-        
-        return final_x, final_y
-
-    def on_mouse_move(self, event):
-        if not self.tk_image: return
-        
-        canvas_x = self.canvas.canvasx(event.x)
-        canvas_y = self.canvas.canvasy(event.y)
-        
-        lx, ly = self.get_clamped_box_coords(canvas_x, canvas_y)
-        
-        # Scaled Dimensions for Visual Box
-        disp_w = self.box_w * self.scale_factor
-        disp_h = self.box_h * self.scale_factor
-        
-        self.canvas.coords(self.rect_id, lx, ly, lx + disp_w, ly + disp_h)
+    def _cursor_geometry(self):
+        if not self.tk_image: return None
+        disp_w, disp_h = self.viewer.display_size()
+        return self.scale_factor, disp_w, disp_h
+        
+    def _lesion_overlap(self, x, y):
+        if self.current_lesions is None: return 0.0
+        return self.current_lesions.overlap_fraction(x, y, self.box_w, self.box_h)
+        
+    def _overlaps_lesion(self, x, y):
+        return OVERLAP_WARN and self._lesion_overlap(x, y) > OVERLAP_WARN_FRACTION
+        
+    def _on_zoom(self, zoom):
+        # Canvas coords are original * zoom at every zoom level: overlays, cursor box
+        # and the click -> original conversion all go through scale_factor
+        self.scale_factor = zoom
+        self.canvas.delete("existing_label")
+        self.canvas.delete("suggestion")
+        self.canvas.delete("pending_patch")
+        self.load_existing_labels()
+        self.draw_suggestions()
+        self.draw_pending_patches()
         
     def on_click_canvas(self, event):
         # Guard
         if not self.tk_image: return
         if self.current_index >= len(self.image_list): return
         
-        canvas_x = self.canvas.canvasx(event.x)
-        canvas_y = self.canvas.canvasy(event.y)
+        # Box under this click, already in Original Coords for Saving
+        pos = self.cursor.commit(event)
+        if pos is None: return
+        orig_x, orig_y = pos
         
-        # Get Visual (Scaled) Coords
-        final_x, final_y = self.get_clamped_box_coords(canvas_x, canvas_y)
+        if OVERLAP_BLOCK_FRACTION is not None:
+            overlap = self._lesion_overlap(orig_x, orig_y)
+            if overlap > OVERLAP_BLOCK_FRACTION:
+                self.root.bell()
+                self.lbl_status.config(text=f"병변과 겹침 ({overlap:.0%}) - 다른 위치를 선택하세요.")
+                return
         
-        # Convert to Original Coords for Saving
-        orig_x = final_x / self.scale_factor
-        orig_y = final_y / self.scale_factor
+        if MULTI_PATCH:
+            self.add_patch(orig_x, orig_y)
+            return
         
         # Regular Process: Label and Save
         self.process_image_labeled(orig_x, orig_y)
         
+    def add_patch(self, x, y):
+        """MULTI_PATCH: keep one more box for this image (saved together on Enter)."""
+        if MULTI_PATCH_NO_OVERLAP:
+            for px, py in self.pending_patches:
+                if abs(px - x) < self.box_w and abs(py - y) < self.box_h:
+                    self.root.bell()  # overlaps a box already placed
+                    return
+        self.pending_patches.append((x, y))
+        self.canvas.delete("pending_patch")
+        self.draw_pending_patches()
+        self.update_status()
+        
+    def draw_pending_patches(self):
+        factor = self.scale_factor
+        for i, (x, y) in enumerate(self.pending_patches, start=1):
+            sx, sy = x * factor, y * factor
+            self.canvas.create_rectangle(sx, sy, sx + self.box_w * factor, sy + self.box_h * factor,
+                                         outline=BOX_COLOR, width=BOX_WIDTH, tags="pending_patch")
+            self.canvas.create_text(sx + self.box_w * factor - 4, sy + 4, text=f"#{i}", fill=BOX_COLOR,
+                                    anchor=tk.NE, font=("Arial", 12, "bold"), tags="pending_patch")
+        
     def on_ambiguous_click(self):
         # Guard
         if not self.tk_image: return
@@ -533,9 +710,58 @@ class LabelTool:
         # Ambiguous Process: Just Copy
         self.process_image_ambiguous()
         
+    def _counts(self):
+        return {"labeled": self.count_labeled, "skipped": self.count_skipped, "patches": self.count_patches}
+        
+    def _set_counts(self, counts):
+        self.count_labeled = counts.get("labeled", 0)
+        self.count_skipped = counts.get("skipped", 0)
+        self.count_patches = counts.get("patches", self.count_labeled)  # journals from before MULTI_PATCH
+        
+    def _log(self, action, src, outputs):
+        if self.journal is None:
+            return
+        try:
+            self.journal.record(action, self.current_index, self.current_index + 1,
+                                src=src, outputs=outputs, counts=self._counts())
+        except Exception as e:
+            print(f"Failed to write journal: {e}")
+        
+    @PERF.timed("back")
     def on_back_click(self):
-        # Back Logic
-        if self.current_index <= 0:
+        # MULTI_PATCH: unsaved boxes on this image go first, one per Back
+        if self.pending_patches:
+            self.pending_patches.pop()
+            self.canvas.delete("pending_patch")
+            self.draw_pending_patches()
+            self.update_status()
+            return
+        
+        # Back Logic: journal first (works across restarts, any number of steps)
+        if self.journal is not None and self.journal.can_undo():
+            if self.lease is not None and not self.lease.seek(self.journal.last()["index"]):
+                messagebox.showinfo("Lease", "이전 이미지가 있는 구간은 다른 작업자에게 넘어갔습니다.")
+                return
+            entry = self.journal.undo()
+            try:
+                # Cancels the write if it is still queued
+                deleted = self.writer.revert(entry["outputs"])
+                print(f"Undo {entry['action']} (Deleted): {', '.join(os.path.basename(p) for p in deleted)}")
+                if self.shards is not None and entry["action"] == "LABEL":
+                    for out in entry["outputs"]:
+                        if out.endswith(".jpg"):  # one per patch in MULTI_PATCH "files" mode
+                            self.shards.remove(sample_key(self.target_dir, out))
+            except Exception as e:
+                print(f"Undo Error (Delete failed): {e}")
+            
+            self._set_counts(self.journal.counts())
+            self.current_index = entry["index"]
+            self.load_image()
+            return
+        
+        # No journal entry (e.g. resumed from an old progress.json): guess the outputs by name
+        # (not in lease mode: the previous index may belong to someone else)
+        if self.current_index <= 0 or self.lease is not None:
             messagebox.showinfo("First Image", "첫 번째 이미지입니다.")
             return
             
@@ -550,9 +776,7 @@ class LabelTool:
         # Calculate potential output paths to delete
         
         # A. Labeled Paths (TARGET_OUTPUT_DIR)
-        new_base = re.sub(r'A[1-6]', 'A7', base_name_no_ext)
-        if new_base == base_name_no_ext and "A7" not in new_base:
-            new_base += "_A7"
+        new_base = make_a7_basename(base_name_no_ext)
             
         target_jpg = os.path.join(self.target_dir, new_base + ".jpg")
         target_json = os.path.join(self.target_dir, new_base + ".json")
@@ -567,17 +791,15 @@ class LabelTool:
         
         # Try Delete
         try:
-            if os.path.exists(target_jpg):
-                os.remove(target_jpg)
+            deleted = self.writer.revert([target_jpg, target_json, amb_jpg])
+            if target_jpg in deleted:
                 deleted_msg.append("Labeled JPG")
                 deleted_count_labeled = True # Was labeled
                 
-            if os.path.exists(target_json):
-                os.remove(target_json)
+            if target_json in deleted:
                 deleted_msg.append("Labeled JSON")
                 
-            if os.path.exists(amb_jpg):
-                os.remove(amb_jpg)
+            if amb_jpg in deleted:
                 deleted_msg.append("Ambiguous JPG")
                 deleted_count_skipped = True # Was skipped
                 
@@ -586,16 +808,19 @@ class LabelTool:
             # Decrement Stats
             if deleted_count_labeled:
                 self.count_labeled = max(0, self.count_labeled - 1)
+                self.count_patches = max(0, self.count_patches - 1)
+                if self.shards is not None:
+                    self.shards.remove(sample_key(self.target_dir, target_jpg))
             elif deleted_count_skipped:
                 self.count_skipped = max(0, self.count_skipped - 1)
             
         except Exception as e:
             print(f"Undo Error (Delete failed): {e}")
             
-        # 3. Load the image again + Auto Save
-        self.save_progress() # Save the decremented index and stats
+        # 3. Load the image again
         self.load_image()
 
+    @PERF.timed("label_click")
     def process_image_labeled(self, x, y):
         current_img_path = self.image_list[self.current_index]
         basename = os.path.basename(current_img_path)
@@ -607,22 +832,13 @@ class LabelTool:
             return # Block progress
             
         try:
-            # 1. Read & Transform
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # x, y are ORIGINAL coordinates here
-            new_data = transform_json_data(data, x, y, self.box_w, self.box_h)
-            
-            # 2. Filename Generation
-            new_base = re.sub(r'A[1-6]', 'A7', base_name_no_ext)
-            if new_base == base_name_no_ext and "A7" not in new_base:
-                new_base += "_A7"
+            # 1. Filename Generation
+            new_base = make_a7_basename(base_name_no_ext)
                 
             new_img_name = new_base + ".jpg"
             new_json_name = new_base + ".json"
             
-            # 3. Save to TARGET_OUTPUT_DIR
+            # 2. Save to TARGET_OUTPUT_DIR
             if not self.target_dir:
                 messagebox.showerror("Error", "TARGET_OUTPUT_DIR is not set!")
                 return
@@ -634,23 +850,86 @@ class LabelTool:
             out_img = os.path.join(self.target_dir, new_img_name)
             out_json = os.path.join(self.target_dir, new_json_name)
             
-            with open(out_json, 'w', encoding='utf-8') as f:
-                json.dump(new_data, f, ensure_ascii=False, indent=2)
-                
-            shutil.copy2(current_img_path, out_img)
+            # Read & Transform & Write in the background (x, y are ORIGINAL coordinates here)
+            # Blocks only if the write queue is full
+            self.writer.submit(write_labeled_outputs, current_img_path, json_path, x, y,
+                               self.box_w, self.box_h, out_img, out_json, self.materializer, self.json_cache.get,
+                               self.shards, OUTPUT_MODE == "crop",
+                               outputs=[out_img, out_json], label=basename)
             
             print(f"Labeled: {basename} -> {out_img}")
             
-            # 4. Next & Save
+            # 3. Next & Log
             self.count_labeled += 1
+            self.count_patches += 1
             print(f"DEBUG: Label Count incremented to {self.count_labeled}")
-            self.current_index += 1
-            self.save_progress()
+            self._log("LABEL", current_img_path, [out_img, out_json])
+            self.current_index = self._next_index()
+            self.load_image()
+            
+        except Exception as e:
+            messagebox.showerror("Error", f"Labeling failed: {e}")
+
+    @PERF.timed("label_click")
+    def process_image_patches(self):
+        """MULTI_PATCH: write every box placed on this image, as one step (one journal entry, one Back)."""
+        # Guard
+        if not self.tk_image: return
+        if self.current_index >= len(self.image_list): return
+        if not self.pending_patches: return
+        
+        current_img_path = self.image_list[self.current_index]
+        basename = os.path.basename(current_img_path)
+        base_name_no_ext = os.path.splitext(basename)[0]
+        json_path = os.path.join(os.path.dirname(current_img_path), base_name_no_ext + ".json")
+        
+        if not os.path.exists(json_path):
+            messagebox.showerror("Error", f"JSON not found: {json_path}")
+            return # Block progress
+        if not self.target_dir:
+            messagebox.showerror("Error", "TARGET_OUTPUT_DIR is not set!")
+            return
+            
+        try:
+            if not os.path.exists(self.target_dir):
+                 os.makedirs(self.target_dir)
+            
+            patches = list(self.pending_patches)
+            crop = OUTPUT_MODE == "crop"
+            outputs = []
+            if MULTI_PATCH_OUTPUT == "single" and not crop:
+                # One pair, every box in its labelingInfo (same name as a single click)
+                new_base = make_a7_basename(base_name_no_ext)
+                out_img = os.path.join(self.target_dir, new_base + ".jpg")
+                out_json = os.path.join(self.target_dir, new_base + ".json")
+                self.writer.submit(write_multi_outputs, current_img_path, json_path, patches,
+                                   self.box_w, self.box_h, out_img, out_json, self.materializer, self.json_cache.get,
+                                   self.shards, outputs=[out_img, out_json], label=basename)
+                outputs = [out_img, out_json]
+            else:
+                # One pair per box: IMG_D_A7_496645_p1, _p2, ...
+                for number, (x, y) in enumerate(patches, start=1):
+                    new_base = make_a7_patch_basename(base_name_no_ext, number)
+                    out_img = os.path.join(self.target_dir, new_base + ".jpg")
+                    out_json = os.path.join(self.target_dir, new_base + ".json")
+                    self.writer.submit(write_labeled_outputs, current_img_path, json_path, x, y,
+                                       self.box_w, self.box_h, out_img, out_json, self.materializer,
+                                       self.json_cache.get, self.shards, crop,
+                                       outputs=[out_img, out_json], label=f"{basename} #{number}")
+                    outputs += [out_img, out_json]
+            
+            print(f"Labeled: {basename} -> {len(patches)} patches")
+            
+            self.count_labeled += 1
+            self.count_patches += len(patches)
+            self._log("LABEL", current_img_path, outputs)
+            self.current_index = self._next_index()
             self.load_image()
             
         except Exception as e:
             messagebox.showerror("Error", f"Labeling failed: {e}")
 
+    @PERF.timed("skip_click")
     def process_image_ambiguous(self):
         current_img_path = self.image_list[self.current_index]
         basename = os.path.basename(current_img_path)
@@ -663,17 +942,18 @@ class LabelTool:
             if not os.path.exists(self.ambiguous_dir):
                 os.makedirs(self.ambiguous_dir)
 
-            # Just copy image to AMBIGUOUS_DIR
+            # Just copy (link) image to AMBIGUOUS_DIR, in the background
             out_img = os.path.join(self.ambiguous_dir, basename)
-            shutil.copy2(current_img_path, out_img)
+            self.writer.submit(self.materializer.place, current_img_path, out_img,
+                               outputs=[out_img], label=basename)
             
             print(f"Ambiguous (Skipped): {basename} -> {out_img}")
             
-            # Next & Save
+            # Next & Log
             self.count_skipped += 1
             print(f"DEBUG: Skip Count incremented to {self.count_skipped}")
-            self.current_index += 1
-            self.save_progress()
+            self._log("SKIP", current_img_path, [out_img])
+            self.current_index = self._next_index()
             self.load_image()
             
         except Exception as e:
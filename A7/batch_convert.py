@@ -0,0 +1,134 @@
+"""
+Headless A7 converter: same clamping, filename rule (A[1-6] -> A7) and JSON transform
+as clicking in A7_label_tool.py, for patch coordinates that already exist.
+
+Input is a CSV (with header) or JSONL list of:
+    image, x, y[, box_w, box_h]
+x, y are the top-left of the box in ORIGINAL pixels (--center: the box center, like a click).
+Relative image paths are resolved against the list file's folder. An image listed more
+than once gets one output per row, numbered in list order: IMG_D_A7_xxx_p1, _p2, ...
+
+    python A7/batch_convert.py patches.csv --out /data/A7_out --workers 8
+"""
+import argparse
+import csv
+import functools
+import json
+import os
+import sys
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.a7_transform import clamp_coordinates, transform_json_data, make_a7_basename, make_a7_patch_basename
+from common.batch import Checkpoint, run_batch, DEFAULT_CHUNK_SIZE
+from common.materialize import OutputMaterializer, OUTPUT_STRATEGY
+from common.overlays import sidecar_json_path
+
+CHECKPOINT_FILE = ".batch_convert.checkpoint.jsonl"
+
+_materializers = {}
+
+
+def _materializer(strategy):
+    # One per worker process, so per-directory detection is done once per process
+    if strategy not in _materializers:
+        _materializers[strategy] = OutputMaterializer(strategy)
+    return _materializers[strategy]
+
+
+def read_rows(list_path):
+    base_dir = os.path.dirname(os.path.abspath(list_path))
+    rows = []
+    with open(list_path, 'r', encoding='utf-8-sig', newline='') as f:
+        if list_path.lower().endswith((".jsonl", ".ndjson")):
+            records = (json.loads(line) for line in f if line.strip())
+        else:
+            records = csv.DictReader(f)
+        for rec in records:
+            image = os.path.join(base_dir, rec["image"])
+            row = {"image": image, "x": float(rec["x"]), "y": float(rec["y"])}
+            for k in ("box_w", "box_h"):
+                if rec.get(k) not in (None, ""):
+                    row[k] = int(float(rec[k]))
+            rows.append(row)
+    number_patches(rows)
+    return rows
+
+
+def number_patches(rows):
+    """Rows of an image listed more than once get "patch": 1, 2, ... (list order), so their outputs don't collide."""
+    counts = {}
+    for row in rows:
+        counts[row["image"]] = counts.get(row["image"], 0) + 1
+    seen = {}
+    for row in rows:
+        if counts[row["image"]] > 1:
+            seen[row["image"]] = seen.get(row["image"], 0) + 1
+            row["patch"] = seen[row["image"]]
+    return rows
+
+
+def convert_one(row, out_dir, box_w, box_h, center, strategy):
+    img_path = row["image"]
+    json_path = sidecar_json_path(img_path)
+    bw = row.get("box_w", box_w)
+    bh = row.get("box_h", box_h)
+
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    # Header only; no pixel decode
+    with Image.open(img_path) as im:
+        img_w, img_h = im.size
+
+    x, y = row["x"], row["y"]
+    if center:
+        x -= bw / 2
+        y -= bh / 2
+    x, y = clamp_coordinates(x, y, img_w, img_h, bw, bh)
+
+    new_data = transform_json_data(data, x, y, bw, bh)
+
+    base_name_no_ext = os.path.splitext(os.path.basename(img_path))[0]
+    if "patch" in row:
+        new_base = make_a7_patch_basename(base_name_no_ext, row["patch"])
+    else:
+        new_base = make_a7_basename(base_name_no_ext)
+    out_img = os.path.join(out_dir, new_base + ".jpg")
+    out_json = os.path.join(out_dir, new_base + ".json")
+
+    with open(out_json, 'w', encoding='utf-8') as f:
+        json.dump(new_data, f, ensure_ascii=False, indent=2)
+    _materializer(strategy).place(img_path, out_img)
+    return out_img
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch A7 conversion from a CSV/JSONL list of patch coordinates.")
+    parser.add_argument("list", help="CSV (header: image,x,y[,box_w,box_h]) or JSONL file")
+    parser.add_argument("--out", required=True, help="output folder (TARGET_OUTPUT_DIR)")
+    parser.add_argument("--box-w", type=int, default=224)
+    parser.add_argument("--box-h", type=int, default=224)
+    parser.add_argument("--center", action="store_true", help="x, y are the box center instead of the top-left")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--strategy", default=OUTPUT_STRATEGY, help="auto | reflink | hardlink | symlink | copy")
+    parser.add_argument("--checkpoint", default=None, help=f"default: <out>/{CHECKPOINT_FILE}")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    rows = read_rows(args.list)
+    # Key = row position + image, so the same image with two boxes is two items (and two outputs, _p1/_p2)
+    items = [(f"{i}:{row['image']}", row) for i, row in enumerate(rows)]
+
+    checkpoint = Checkpoint(args.checkpoint or os.path.join(args.out, CHECKPOINT_FILE))
+    fn = functools.partial(convert_one, out_dir=args.out, box_w=args.box_w, box_h=args.box_h,
+                           center=args.center, strategy=args.strategy)
+    ok, failed, skipped, elapsed = run_batch(items, fn, workers=args.workers, chunk_size=args.chunk_size,
+                                             checkpoint=checkpoint, label="images")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,24 @@
 import os
-import glob
 import json
-import shutil
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk
-import re
+from PIL import ImageTk
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.prefetch import ImagePrefetcher, when_ready
+from common.original_index import OriginalIndex, extract_id, ORIGINAL_CODE_RE
+from common.overlays import parse_labeling_info, read_label_json, sidecar_json_path, offset_shapes
+from common.a7_transform import crop_info
+from common.materialize import OutputMaterializer
+from common.journal import ActionJournal, journal_path_for, resume_position
+from common.scan_manifest import StreamingScan, iter_images, scan_images, when_resume_position
+from common.sampling import (stratified_sample, sample_size, wilson_interval, early_stop,
+                             load_plan, save_plan, new_plan, ACCEPT)
+from common.perf import PERF
+from common.geometry import display_polygon
+from common.lease import LeaseManager
 
 ORIGINAL_ROOT = r"/Users/sonseunghyeon/Desktop/creamoff/workspace/labeling/테스트용 파일/변환 전"
 DEFAULT_INPUT_DIR = r"/Users/sonseunghyeon/Desktop/creamoff/workspace/labeling/테스트용 파일/변환 후"
@@ -13,6 +26,27 @@ DEFAULT_INPUT_DIR = r"/Users/sonseunghyeon/Desktop/creamoff/workspace/labeling/
 REJECT_FOLDER_NAME = "_REJECTED"
 PROGRESS_FILE = "verify_progress.json"
 
+# 여러 명이 같은 폴더를 동시에 검수할 때 True (입력 폴더의 .leases/ 로 구간을 나눠 가짐)
+# 작업자 이름: LABELING_ANNOTATOR 환경변수 (없으면 user@host)
+LEASE_MODE = False
+
+# A7/preverify.py 가 만든 review_queue.json 이 폴더에 있으면 그 목록(애매한 것만, 위험도 순)만 검수
+# preverify 이후에 생기거나 바뀐 출력은 검증 전이므로 목록 뒤에 붙여서 검수
+# False 면 항상 폴더 전체
+USE_REVIEW_QUEUE = True
+REVIEW_QUEUE_FILE = "review_queue.json"
+
+# 샘플링 검수: 폴더 전체 대신 층화 무작위 표본만 보고 반려율의 신뢰구간으로 배치 전체를 통과/전수검수 판정
+# 층 = 원본의 병변 코드(A1~A6) + 원본 폴더, 같은 SEED -> 같은 표본
+# 표본(순서 포함)은 qa_sample.json, 결정은 qa_sample_progress.journal.jsonl 에 저장 (review_queue 보다 우선)
+SAMPLING_MODE = False
+SAMPLING_SEED = 0
+SAMPLING_MAX_REJECT_RATE = 0.05  # 반려율이 이 이하면 배치 통과
+SAMPLING_CONFIDENCE = 0.95
+SAMPLING_MARGIN = 0.03           # 표본 크기 기준 (신뢰구간 +-3%p), 조기 종료되면 더 적게 봄
+SAMPLING_PLAN_FILE = "qa_sample.json"
+SAMPLING_PROGRESS_FILE = "qa_sample_progress.json"
+
 class VerifyTool:
     def __init__(self, root):
         self.root = root
@@ -21,6 +55,10 @@ class VerifyTool:
 
         # --- 상태 변수 ---
         self.image_list = []      # (jpg_path, json_path) 튜플 리스트
+        self.review_info = {}     # review_queue.json 사용 시: 파일명 -> 사유 (overlap, 거리)
+        self.sampling = None      # SAMPLING_MODE: qa_sample.json 내용 (seed, 층, 표본 순서, 판정)
+        self.sampling_verdict = None
+        self.scan = None          # image_list를 백그라운드에서 채우는 StreamingScan
         self.current_index = 0
         self.input_dir = ""
         self.reject_dir = ""
@@ -30,14 +68,30 @@ class VerifyTool:
         
         self.scale_factor = 1.0
         self.img_tk = None
+        self.image_item = None
         self.current_jpg_path = None
         self.current_json_path = None
         
-        # Undo 스택
-        self.history_stack = []
+        # OK/REJECT 기록 (append-only, 재시작 후에도 Undo 가능)
+        self.journal = None
+        self.lease = None  # LEASE_MODE 일 때 LeaseManager
+
+        # 원본 JSON ID 인덱스 (첫 조회 시 생성)
+        self.original_index = None
+
+        # 다음/이전 이미지 백그라운드 디코딩 + 리사이즈 (+ 오버레이 파싱, LRU 캐시)
+        self.prefetcher = ImagePrefetcher(self.root.winfo_screenwidth() * 0.9,
+                                          self.root.winfo_screenheight() * 0.9,
+                                          overlay_loader=self._load_overlays)
+        self.current_overlays = None
+
+        # shutil.move 대신: 같은 디바이스면 rename, 아니면 reflink/copy 후 삭제
+        self.materializer = OutputMaterializer()
 
         # --- GUI 초기화 ---
         self._init_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        PERF.attach_hud(self.root)  # LABELING_PERF=1 일 때만
         
         # --- 키보드 이벤트 ---
         self.root.bind("<Key-s>", self.action_ok)
@@ -50,6 +104,22 @@ class VerifyTool:
         # [Auto Load]
         self.root.after(100, self.try_auto_load)
 
+    def on_close(self):
+        self.prefetcher.shutdown()
+        self.close_journal()
+        PERF.close()
+        self.root.destroy()
+
+    def close_journal(self):
+        if self.lease is not None:
+            self.lease.release()  # 남은 구간은 바로 다른 작업자가 가져갈 수 있음
+            self.lease = None
+        if self.journal is None:
+            return
+        self.save_progress()  # 세션 종료 시 한 번만
+        self.journal.close()  # compaction
+        self.journal = None
+
     def _init_ui(self):
         top_frame = tk.Frame(self.root)
         top_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=5)
@@ -92,33 +162,247 @@ class VerifyTool:
 
     def load_directory(self, path):
         print(f"[DEBUG] Loading directory: {path}")
+        self.close_journal()
         self.input_dir = path
+        self.prefetcher.clear()
         self.reject_dir = os.path.join(self.input_dir, REJECT_FOLDER_NAME)
         os.makedirs(self.reject_dir, exist_ok=True)
         
+        # 원본 인덱스는 prefetch 워커들이 같이 쓰므로 미리 생성
+        if self.original_index is None:
+            self.original_index = OriginalIndex(ORIGINAL_ROOT).build()
+        
         self.load_file_list()
 
-        if self.load_progress():
-             print("[DEBUG] Progress found. Resumed.")
-        
+        progress_path = self._progress_path()
+        try:
+            if LEASE_MODE:
+                # 작업자마다 별도 journal
+                self.lease = LeaseManager(self.input_dir)
+                self.journal = ActionJournal(self.lease.journal_path(progress_path))
+            else:
+                self.journal = ActionJournal(journal_path_for(progress_path))
+        except OSError as e:
+            print(f"[ERROR] Failed to open journal: {e}")
+
+        self.current_index = 0
+        self.current_jpg_path = None
+        self.canvas.delete("all")
+        self.lbl_stats.config(text="Scanning...")
+        # 첫 쌍이 발견되는 즉시 시작
+        self.scan.when_available(self.root, 1, self._start_session)
+
+    def _start_session(self):
         if not self.image_list:
             messagebox.showinfo("Info", "No jpg files found (or all moved).")
             return
-            
+
+        if self.lease is not None:
+            # 모두 같은 목록을 써야 하므로 스캔이 끝난 뒤 구간 배정
+            self.lbl_stats.config(text="Scanning... (lease mode: waiting for the full list)")
+            self.scan.when_available(self.root, None, self._start_leased)
+            return
+
+        if self.load_progress(self._resume_at):
+             print("[DEBUG] Progress found. Resumed.")
+
+    def _start_leased(self):
+        # plan.json: 먼저 시작한 사람의 목록 (REJECT로 파일이 빠져도 인덱스는 그대로)
+        self.image_list = self.lease.load_plan(self.scan.items, key=lambda pair: pair[0],
+                                               build=lambda jpg: (jpg, sidecar_json_path(jpg)))
+        last = self.journal.last() if self.journal is not None else None
+        prefer = None
+        if last is not None:
+            prefer = resume_position(last, self.image_list, key=lambda pair: pair[0])
+            self.count_ok = last["counts"].get("ok", 0)
+            self.count_reject = last["counts"].get("reject", 0)
+        idx = self.lease.start(len(self.image_list), prefer)
+        self.current_index = len(self.image_list) if idx is None else idx
+        print(f"[DEBUG] Lease ({self.lease.owner}): starting at {self.current_index}")
+        self.lease.heartbeat(self.root)
+        self.load_current_image()
+
+    def _next_index(self):
+        # LEASE_MODE: 구간 안의 다음, 구간 끝이면 새로 받은 구간의 시작
+        if self.lease is None:
+            return self.current_index + 1
+        nxt = self.lease.advance(self.current_index)
+        return len(self.image_list) if nxt is None else nxt
+
+    def _resume_at(self, saved_idx, legacy=False):
+        self.current_index = saved_idx if 0 <= saved_idx < len(self.image_list) else 0
+        if legacy and self.journal is not None:
+            self.journal.record("BASE", self.current_index, self.current_index, counts=self._counts())
         self.load_current_image()
 
+    def _progress_path(self):
+        # 샘플링 검수는 진행 상황/결정 기록을 따로 (전수 검수와 인덱스가 다름)
+        return os.path.join(self.input_dir, SAMPLING_PROGRESS_FILE if SAMPLING_MODE else PROGRESS_FILE)
+
     def load_file_list(self):
-        jpgs = sorted(glob.glob(os.path.join(self.input_dir, "*.jpg")))
-        self.image_list = []
         print(f"[DEBUG] Scanning for jpg files in {self.input_dir}")
-        for img_path in jpgs:
-            json_path = os.path.splitext(img_path)[0] + ".json"
-            if os.path.exists(json_path):
-                self.image_list.append((img_path, json_path))
-        print(f"[DEBUG] Loaded {len(self.image_list)} valid image-json pairs.")
-
-    def load_progress(self):
-        path = os.path.join(self.input_dir, PROGRESS_FILE)
+        # 백그라운드 스캔: 찾는 대로 정렬된 순서로 image_list에 추가
+        # 캐시된 목록(.scan_manifest_flat.json) 사용, JSON 존재 여부도 목록으로 확인 (파일별 exists 없음)
+        if self.scan is not None:
+            self.scan.cancel()
+        sample = self.load_sample() if SAMPLING_MODE else None
+        queue = self.load_review_queue() if sample is None else None
+        if sample is not None:
+            # 표본만, 저장된 (섞인) 순서로
+            self.scan = StreamingScan(self.input_dir, source=sample)
+        elif queue is not None:
+            # preverify 결과: 자동 통과/반려되지 않은 것만, 위험도 높은 순서로
+            self.scan = StreamingScan(self.input_dir, source=queue)
+        else:
+            self.scan = StreamingScan(self.input_dir, recursive=False, require_json=True)
+        self.image_list = self.scan.items
+        self.scan.watch(self.root, self.update_stats)
+
+    def load_review_queue(self):
+        """
+        review_queue.json -> (jpg, json) in queue order, then the outputs written after
+        preverify ran (없거나 USE_REVIEW_QUEUE=False 면 None). Generator: the folder
+        check runs on the StreamingScan thread.
+        """
+        self.review_info = {}
+        path = os.path.join(self.input_dir, REVIEW_QUEUE_FILE)
+        if not USE_REVIEW_QUEUE or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                queue = json.load(f)
+            items = queue["items"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[ERROR] Review queue unreadable, using the whole folder: {e}")
+            return None
+        return self._iter_review_queue(items, queue.get("created", 0))
+
+    def _iter_review_queue(self, items, created):
+        queued = set()
+        left = 0
+        for item in items:
+            queued.add(item["image"])
+            jpg = os.path.join(self.input_dir, item["image"])
+            json_f = sidecar_json_path(jpg)
+            if os.path.exists(jpg) and os.path.exists(json_f):  # REJECT 된 것은 빠짐
+                self.review_info[item["image"]] = f"risk {item['risk']:.2f} ({item.get('reason') or '-'})"
+                left += 1
+                yield jpg, json_f
+        # preverify 가 못 본 출력: 큐 생성(스캔 시작) 이후에 쓰여진 것
+        # (자동 통과된 것은 그 전 mtime 이라 빠짐; JSON은 항상 새로 쓰이므로 hardlink 된 jpg 도 잡힘)
+        late = 0
+        for jpg, json_f in iter_images(self.input_dir, recursive=False, require_json=True):
+            name = os.path.basename(jpg)
+            if name in queued:
+                continue
+            try:
+                mtime = max(os.stat(jpg).st_mtime, os.stat(json_f).st_mtime)
+            except OSError:
+                continue
+            if mtime > created:
+                self.review_info[name] = "not pre-verified (newer than review_queue.json)"
+                late += 1
+                yield jpg, json_f
+        print(f"[DEBUG] Review queue: {left} of {len(items)} images left, {late} newer outputs appended")
+        if late:
+            print("[DEBUG] Run A7/preverify.py again to sort the newer outputs by risk")
+
+    def stratum_of(self, img_path):
+        """표본의 층: 원본의 병변 코드 + ORIGINAL_ROOT 기준 원본 폴더 (원본 없으면 "?")"""
+        orig_path = self.original_index.find(self.extract_id(img_path))
+        if not orig_path:
+            return "?"
+        m = ORIGINAL_CODE_RE.search(os.path.splitext(os.path.basename(orig_path))[0])
+        code = m.group(0).lstrip("_") if m else "A?"
+        folder = os.path.relpath(os.path.dirname(orig_path), ORIGINAL_ROOT).replace(os.sep, "/")
+        return f"{code} {folder}"
+
+    def load_sample(self):
+        """
+        qa_sample.json 의 표본 -> (jpg, json) in review order (없거나 SEED 가 다르면 새로 뽑아 저장).
+        Generator: drawing a new plan needs the whole folder, so it runs on the StreamingScan
+        thread and review starts with the first yielded pair.
+        """
+        self.sampling = None
+        self.sampling_verdict = None
+        return self._iter_sample(self.input_dir)
+
+    def _iter_sample(self, folder):
+        path = os.path.join(folder, SAMPLING_PLAN_FILE)
+        plan = load_plan(path)
+        if plan is None or plan.get("seed") != SAMPLING_SEED:
+            # 층을 나누려면 전체 목록이 필요 (원본 조회는 인덱스라 O(1))
+            pairs = scan_images(folder, recursive=False, require_json=True)
+            strata = {pair: self.stratum_of(pair[0]) for pair in pairs}
+            size = sample_size(len(pairs), SAMPLING_MARGIN, SAMPLING_CONFIDENCE)
+            sample, summary = stratified_sample(pairs, strata.get, size, SAMPLING_SEED)
+            plan = new_plan(sample, summary, SAMPLING_SEED, len(pairs),
+                            stratum_of=strata.get, name_of=lambda pair: os.path.basename(pair[0]),
+                            confidence=SAMPLING_CONFIDENCE, margin=SAMPLING_MARGIN,
+                            max_reject_rate=SAMPLING_MAX_REJECT_RATE)
+            try:
+                save_plan(path, plan)
+            except OSError as e:
+                print(f"[ERROR] Failed to save sampling plan: {e}")
+            print(f"[DEBUG] Sampling: {len(sample)} of {len(pairs)} images from {len(summary)} strata (seed {SAMPLING_SEED})")
+        if folder != self.input_dir:
+            return  # 그 사이 다른 폴더를 열었음
+        # 첫 쌍보다 먼저 설정 -> UI는 표본이 보이는 시점에 항상 plan 을 가짐
+        self.sampling = plan
+        self.sampling_verdict = (plan.get("result") or {}).get("verdict")
+        for item in plan["items"]:
+            jpg = os.path.join(folder, item["image"])
+            json_f = sidecar_json_path(jpg)
+            if os.path.exists(jpg) and os.path.exists(json_f):  # REJECT 된 것은 빠짐
+                yield jpg, json_f
+
+    def sampling_estimate(self):
+        """(decisions, rejects, low, high) of the sample so far"""
+        n = self.count_ok + self.count_reject
+        low, high = wilson_interval(self.count_reject, n, self.sampling.get("confidence", SAMPLING_CONFIDENCE))
+        return n, self.count_reject, low, high
+
+    def check_sampling(self, notify=True):
+        """SAMPLING_MODE: 결정마다 조기 종료 판정, 판정이 바뀌면 qa_sample.json 에 기록하고 알림"""
+        if self.sampling is None:
+            return
+        n, rejects, low, high = self.sampling_estimate()
+        exhausted = self.current_index >= len(self.image_list) and self.scan is not None and self.scan.done
+        max_rate = self.sampling.get("max_reject_rate", SAMPLING_MAX_REJECT_RATE)
+        confidence = self.sampling.get("confidence", SAMPLING_CONFIDENCE)
+        verdict = early_stop(rejects, n, max_rate, confidence, exhausted=exhausted)
+        if verdict == self.sampling_verdict:
+            return
+        self.sampling_verdict = verdict
+        self.sampling["result"] = {"verdict": verdict, "decisions": n, "rejects": rejects,
+                                   "low": round(low, 4), "high": round(high, 4), "ts": time.time()}
+        try:
+            save_plan(os.path.join(self.input_dir, SAMPLING_PLAN_FILE), self.sampling)
+        except OSError as e:
+            print(f"[ERROR] Failed to save sampling result: {e}")
+        if verdict is None or not notify:
+            return
+        print(f"[DEBUG] Sampling verdict: {verdict} after {n} decisions ({rejects} rejected)")
+        summary = (f"표본 {n}개 중 반려 {rejects}개: 반려율 {rejects / n:.1%} "
+                   f"({confidence:.0%} 신뢰구간 {low:.1%} ~ {high:.1%}, 기준 {max_rate:.1%})")
+        if verdict == ACCEPT:
+            messagebox.showinfo("Sampling QA", f"{summary}\n\n배치 통과. 남은 표본은 보지 않아도 됩니다.")
+        else:
+            messagebox.showwarning("Sampling QA", f"{summary}\n\n기준 초과: 배치 전체 검수 필요 (SAMPLING_MODE = False).")
+
+    def load_progress(self, on_ready):
+        """on_ready(index) once the saved position has been scanned (journal, else verify_progress.json)"""
+        self.count_ok = 0
+        self.count_reject = 0
+        last = self.journal.last() if self.journal is not None else None
+        if last is not None:
+            self.count_ok = last["counts"].get("ok", 0)
+            self.count_reject = last["counts"].get("reject", 0)
+            when_resume_position(self.scan, self.root, last, on_ready, key=lambda pair: pair[0])
+            return True
+
+        # journal 이전의 verify_progress.json
+        path = self._progress_path()
         if os.path.exists(path):
             try:
                 with open(path, 'r', encoding='utf-8') as f:
@@ -126,18 +410,17 @@ class VerifyTool:
                     saved_idx = data.get("last_index", 0)
                     self.count_ok = data.get("count_ok", 0)
                     self.count_reject = data.get("count_reject", 0)
-                    if 0 <= saved_idx < len(self.image_list):
-                        self.current_index = saved_idx
-                    else:
-                        self.current_index = 0
+                self.scan.when_available(self.root, saved_idx + 1, lambda: on_ready(saved_idx, legacy=True))
                 return True
             except:
                 pass
+        on_ready(0)
         return False
 
     def save_progress(self):
+        # 세션 종료 시에만 기록 (결정은 journal에)
         if not self.input_dir: return
-        path = os.path.join(self.input_dir, PROGRESS_FILE)
+        path = self._progress_path()
         data = { "last_index": self.current_index, "count_ok": self.count_ok, "count_reject": self.count_reject }
         with open(path, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
@@ -146,83 +429,26 @@ class VerifyTool:
     # [A] 수정된 extract_id: Regex를 사용하여 A7 제거
     # ---------------------------------------------------------
     def extract_id(self, filename):
-        base = os.path.basename(filename)
-        name_only = os.path.splitext(base)[0]
-        
-        # 정규식: _A7_ 혹은 _A7 패턴을 빈문자열로 치환
         # 예: IMG_D_A7_496645 -> IMG_D_496645
-        # 예: IMG_A7_001 -> IMG_001
-        # re.IGNORECASE는 필요시 사용, 여기선 대문자 A7 가정
-        # 일반적인 _A숫자_ 패턴을 모두 지우고 싶다면: r"_A[0-9]+(_|$)"
-        # 여기서는 user request대로 A7에 집중하되, 구조를 살림.
-        
-        # 방법 1: 직접적인 _A7 제거
-        # id_str = name_only.replace("_A7", "")
-        
-        # 방법 2: 정규식 활용 (더 안전)
-        # _A7 다음에 _가 오거나 문자열 끝인 경우 처리
-        id_str = re.sub(r"_A7", "", name_only)
-        
-        # 혹시 __가 생기면 _로 치환 (IMG_D__496645 -> IMG_D_496645) - 미관상
-        # id_str = id_str.replace("__", "_") 
-        # (하지만 원본에서 A6을 지웠을때 나오는 형태와 일치해야하므로, 단순 제거가 나을 수 있음)
-        # 사용자 예시: IMG_D_A6_496645  vs IMG_D_A7_496645
-        # replace("_A6", "") -> IMG_D_496645
-        # replace("_A7", "") -> IMG_D_496645
-        # 딱 맞음.
-        
-        return id_str
+        # 원본 쪽은 _A1 ~ _A6 를 지운 형태와 비교 (common/original_index.py)
+        return extract_id(filename)
 
     # ---------------------------------------------------------
-    # [B] 수정된 find_original_json: 정규화 매칭
+    # [B] find_original_json: 정규화 매칭 (ID 인덱스 사용)
     # ---------------------------------------------------------
     def find_original_json(self, file_id):
         # file_id: "IMG_D_496645" (예시)
-        print(f"[DEBUG] Searching for Original ID: [{file_id}] in {ORIGINAL_ROOT}")
-        for root, dirs, files in os.walk(ORIGINAL_ROOT):
-            for f in files:
-                if f.endswith(".json"):
-                    cand_name = os.path.splitext(f)[0]
-                    
-                    # 1. 정규화 매칭 (Normalized Match)
-                    # 원본 파일명에서 _A1 ~ _A6 제거 후 비교
-                    # 예: IMG_D_A6_496645 -> IMG_D_496645
-                    cand_norm = re.sub(r"_A[1-6]", "", cand_name)
-                    
-                    if cand_norm == file_id:
-                        print(f"[DEBUG] -> Match found (Normalized): {f}")
-                        return os.path.join(root, f)
-                    
-                    # 2. 포함 여부 확인 (Fallback)
-                    # ID의 핵심(고유번호)이 포함되어 있는지 확인
-                    # 예: file_id = "IMG_D_496645"
-                    # 고유번호 부분이 있는지 체크? (숫자 4자리 이상)
-                    match = re.search(r"(\d{4,})", file_id)
-                    if match:
-                        unique_num = match.group(1)
-                        if unique_num in cand_name:
-                             # 접두사도 맞는지 확인하면 더 정확함
-                             # 여기서는 단순 unique_num 매칭을 우선순위 낮게 둠.
-                             # 일단 정규화 매칭 실패시, 숫자 포함되는 파일 리턴? (위험할 수 있음)
-                             # -> 사용자 요청: "고유 번호가 포함된 파일을 우선적으로"
-                             # 따라서 정규화 매칭이 안되면, 이걸로 퉁칠 수도 있음.
-                             pass
-
-        # 재탐색: 못찾았을 경우, 고유 번호 기반으로 느슨한 매칭 시도
-        # (위 loop에서 하면 너무 많이 잡힐 수 있으니, 2 pass로 진행)
-        match = re.search(r"(\d{4,})", file_id)
-        if match:
-             unique_num = match.group(1)
-             print(f"[DEBUG] Exact match failed. Trying loose match with unique number: {unique_num}")
-             for root, dirs, files in os.walk(ORIGINAL_ROOT):
-                for f in files:
-                    if f.endswith(".json"):
-                        if unique_num in f:
-                            print(f"[DEBUG] -> Match found (Loose): {f}")
-                            return os.path.join(root, f)
-
-        print(f"[DEBUG] Original NOT found for [{file_id}]")
-        return None
+        # ORIGINAL_ROOT 전체를 매번 os.walk 하지 않고, 한 번 만든 인덱스에서 O(1) 조회
+        # (인덱스는 디스크에 저장되고, 디렉토리 mtime이 바뀐 폴더만 재스캔)
+        if self.original_index is None:
+            self.original_index = OriginalIndex(ORIGINAL_ROOT).build()
+
+        path = self.original_index.find(file_id)
+        if path:
+            print(f"[DEBUG] -> Match found: {os.path.basename(path)}")
+        else:
+            print(f"[DEBUG] Original NOT found for [{file_id}]")
+        return path
 
     def load_current_image(self):
         if 0 <= self.current_index < len(self.image_list):
@@ -235,117 +461,108 @@ class VerifyTool:
             self.display_image(img_path)
             self.draw_overlays()
             self.update_stats()
-            self.save_progress()
             self.root.focus_set()
+        elif self.scan is not None and not self.scan.done:
+            # 아직 스캔되지 않은 위치 -> 도착하면 표시
+            self.canvas.delete("all")
+            self.update_stats()
+            self.scan.when_available(self.root, self.current_index + 1, self.load_current_image)
         else:
             self.canvas.delete("all")
             self.lbl_stats.config(text="End of List.")
             if self.image_list:
                  messagebox.showinfo("Done", "End of list reached.")
 
+    @PERF.timed("display_image")
     def display_image(self, img_path):
+        self.current_overlays = None
         try:
-            pil_img = Image.open(img_path)
+            frame, refine = self.prefetcher.get_progressive(img_path)
         except Exception as e:
             print(f"[ERROR] Open image failed: {e}")
             return
         
-        w, h = pil_img.size
-        sw, sh = self.root.winfo_screenwidth(), self.root.winfo_screenheight()
-        max_w, max_h = sw * 0.9, sh * 0.9
-        ratio = min(max_w/w, max_h/h)
-        
-        if ratio < 1.0:
-            self.scale_factor = ratio
-            pil_img = pil_img.resize((int(w*ratio), int(h*ratio)), Image.Resampling.LANCZOS)
-        else:
-            self.scale_factor = 1.0
-            
-        self.img_tk = ImageTk.PhotoImage(pil_img)
+        self.scale_factor = frame.scale_factor
+        self.current_overlays = frame.overlays
+        with PERF.stage("photoimage"):
+            self.img_tk = ImageTk.PhotoImage(frame.image)
         self.canvas.delete("all")
         self.canvas.config(scrollregion=(0,0,self.img_tk.width(), self.img_tk.height()))
-        self.canvas.create_image(0,0, anchor=tk.NW, image=self.img_tk)
+        self.image_item = self.canvas.create_image(0,0, anchor=tk.NW, image=self.img_tk)
+        if refine is not None:
+            when_ready(self.root, refine, lambda fut, p=img_path: self._refine_image(p, fut))
+        
+        self.prefetcher.schedule(self.image_list, self.current_index, key=lambda t: t[0])
 
-    def draw_overlays(self):
-        def parse_box(node):
-            if "location" in node and isinstance(node["location"], list) and node["location"]:
-                loc = node["location"][0]
-                return [loc.get('x',0), loc.get('y',0), loc.get('width',0), loc.get('height',0)]
-            elif "x" in node:
-                return [node.get('x',0), node.get('y',0), node.get('width',0), node.get('height',0)]
-            elif isinstance(node, list) and len(node)>=4:
-                return node
-            return None
+    def _refine_image(self, img_path, refine):
+        # 드래프트(저해상도 디코딩) -> 원본 품질로 교체. 크기/scale_factor 동일
+        if self.current_jpg_path != img_path:
+            return
+        try:
+            frame = refine.result()
+        except Exception:
+            return
+        self.img_tk = ImageTk.PhotoImage(frame.image)
+        self.canvas.itemconfig(self.image_item, image=self.img_tk)
+        # 드래프트에는 오버레이가 없음 (워커에서 파싱) -> 원본 품질 프레임과 함께 그림
+        self.current_overlays = frame.overlays
+        self.draw_overlays()
+
+    def _load_overlays(self, img_path):
+        # A7 JSON + 원본 JSON을 이미지당 한 번만 파싱 (prefetch 워커에서 실행)
+        # 결과는 프레임과 함께 캐시되므로 refresh_view 토글 시 다시 읽지 않음
+        overlays = {"a7": [], "orig": None}
+        crop = None
+        try:
+            a7_data = read_label_json(sidecar_json_path(img_path))
+            overlays["a7"] = parse_labeling_info(a7_data, "A7")
+            crop = crop_info(a7_data)  # OUTPUT_MODE="crop" 결과: 패치만 있는 이미지
+        except Exception as e:
+            print(f"[ERROR] A7 Read Error: {e}")
 
-        def parse_poly(node):
-            pts = []
-            if "location" in node and isinstance(node["location"], list) and node["location"]:
-                loc = node["location"][0]
-                i = 1
-                while True:
-                    kx, ky = f"x{i}", f"y{i}"
-                    if kx in loc and ky in loc:
-                        pts.extend([loc[kx], loc[ky]])
-                        i+=1
-                    else: break
-            return pts
-
-        def draw_poly_shape(pts, color, w, txt=None):
-            if not pts or len(pts)<4: return
-            s_pts = [p * self.scale_factor for p in pts]
+        orig_path = self.find_original_json(self.extract_id(img_path))
+        if orig_path:
             try:
-                self.canvas.create_polygon(s_pts, outline=color, fill='', width=w)
-                if txt:
-                    self.canvas.create_text(s_pts[0], s_pts[1]-10, text=txt, fill=color, anchor=tk.SW, font=("Arial", 10, "bold"))
-            except: pass
+                overlays["orig"] = parse_labeling_info(read_label_json(orig_path), "Orig")
+                if crop:
+                    # 원본 좌표 -> 패치 좌표 (패치 밖의 도형은 캔버스 밖에 그려짐)
+                    overlays["orig"] = offset_shapes(overlays["orig"], -crop["x"], -crop["y"])
+            except Exception as e:
+                print(f"[ERROR] Orig Read Error: {e}")
+        return overlays
+
+    @PERF.timed("draw_overlays")
+    def draw_overlays(self):
+        overlays = self.current_overlays or {}
 
         # 1. A7 (Green)
-        try:
-            with open(self.current_json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            if "labelingInfo" in data:
-                c_b, c_p = 0, 0
-                for item in data["labelingInfo"]:
-                    lbl = item.get("label", {}).get("labelName", "A7") if isinstance(item.get("label"), dict) else "A7"
-                    if "box" in item:
-                        b = parse_box(item["box"])
-                        if b:
-                            self.draw_box(b, "green", 3, f"A7:{lbl}")
-                            c_b+=1
-                    if "polygon" in item:
-                        p = parse_poly(item["polygon"])
-                        if p:
-                            draw_poly_shape(p, "green", 3, f"A7:{lbl}")
-                            c_p+=1
-                print(f"[DEBUG] Drawn A7 (Green) -> Box:{c_b}, Poly:{c_p}")
-        except Exception as e:
-            print(f"[ERROR] A7 Read Error: {e}")
+        c_b, c_p = self.draw_shapes(overlays.get("a7") or [], "green", "green", 3, "A7")
+        print(f"[DEBUG] Drawn A7 (Green) -> Box:{c_b}, Poly:{c_p}")
 
         # 2. Original (Blue)
-        if self.var_show_original.get():
-            fid = self.extract_id(self.current_jpg_path)
-            orig_path = self.find_original_json(fid)
-            if orig_path:
-                try:
-                    with open(orig_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    if "labelingInfo" in data:
-                        c_b, c_p = 0, 0
-                        for item in data["labelingInfo"]:
-                            lbl = item.get("label", {}).get("labelName", "Orig") if isinstance(item.get("label"), dict) else "Orig"
-                            if "box" in item:
-                                b = parse_box(item["box"])
-                                if b:
-                                    self.draw_box(b, "blue", 1, f"Org:{lbl}")
-                                    c_b+=1
-                            if "polygon" in item:
-                                p = parse_poly(item["polygon"])
-                                if p:
-                                    draw_poly_shape(p, "red", 1, f"Org:{lbl}")
-                                    c_p+=1
-                        print(f"[DEBUG] Drawn Orig (Blue) -> Box:{c_b}, Poly:{c_p}")
-                except Exception as e:
-                    print(f"[ERROR] Orig Read Error: {e}")
+        if self.var_show_original.get() and overlays.get("orig") is not None:
+            c_b, c_p = self.draw_shapes(overlays["orig"], "blue", "red", 1, "Org")
+            print(f"[DEBUG] Drawn Orig (Blue) -> Box:{c_b}, Poly:{c_p}")
+
+    def draw_shapes(self, shapes, box_color, poly_color, width, prefix):
+        c_b, c_p = 0, 0
+        for kind, coords, lbl in shapes:
+            if kind == "box":
+                self.draw_box(coords, box_color, width, f"{prefix}:{lbl}")
+                c_b+=1
+            elif kind == "polygon":
+                self.draw_poly_shape(coords, poly_color, width, f"{prefix}:{lbl}")
+                c_p+=1
+        return c_b, c_p
+
+    def draw_poly_shape(self, pts, color, w, txt=None):
+        if not pts or len(pts)<4: return
+        s_pts = display_polygon(pts, self.scale_factor)  # 화면 해상도 기준으로 단순화
+        try:
+            self.canvas.create_polygon(s_pts, outline=color, fill='', width=w)
+            if txt:
+                self.canvas.create_text(s_pts[0], s_pts[1]-10, text=txt, fill=color, anchor=tk.SW, font=("Arial", 10, "bold"))
+        except: pass
 
     def draw_box(self, box, color, width, label_text=None):
         x, y, w, h = box
@@ -360,19 +577,45 @@ class VerifyTool:
     def update_stats(self):
         name = os.path.basename(self.current_jpg_path) if self.current_jpg_path else "-"
         idx = self.current_index + 1 if self.image_list else 0
-        self.lbl_stats.config(text=f"[{idx}/{len(self.image_list)}] {name} | OK: {self.count_ok} | REJECT: {self.count_reject}")
+        text = f"[{idx}/{len(self.image_list)}] {name} | OK: {self.count_ok} | REJECT: {self.count_reject}"
+        if name in self.review_info:
+            text += f" | {self.review_info[name]}"
+        if self.sampling is not None:
+            n, rejects, low, high = self.sampling_estimate()
+            if n:
+                text += f" | reject {rejects / n:.1%} (CI {low:.1%}-{high:.1%})"
+            if self.sampling_verdict:
+                text += f" -> {self.sampling_verdict.upper()}"
+        if self.scan is not None and not self.scan.done:
+            text += f" | {self.scan.status_text()}"
+        if self.lease is not None:
+            text += f" | {self.lease.status_text()}"
+        self.lbl_stats.config(text=text)
 
     def refresh_view(self):
         if self.image_list: self.load_current_image()
 
+    def _counts(self):
+        return {"ok": self.count_ok, "reject": self.count_reject}
+
+    def _log(self, action, index, next_index, src, outputs=(), **extra):
+        if self.journal is None: return
+        try:
+            self.journal.record(action, index, next_index, src=src, outputs=outputs, counts=self._counts(), **extra)
+        except Exception as e:
+            print(f"[ERROR] Journal write failed: {e}")
+
     def action_ok(self, event=None):
         if not self.image_list or self.current_index >= len(self.image_list): return
         print(f"[ACTION] OK: {os.path.basename(self.current_jpg_path)}")
-        self.history_stack.append({'action':'OK', 'index':self.current_index})
         self.count_ok +=1
-        self.current_index +=1
+        nxt = self._next_index()
+        self._log("OK", self.current_index, nxt, self.current_jpg_path)
+        self.current_index = nxt
+        self.check_sampling()
         self.load_current_image()
 
+    @PERF.timed("reject")
     def action_reject(self, event=None):
         if not self.image_list or self.current_index >= len(self.image_list): return
         jpg, json_f = self.image_list[self.current_index]
@@ -380,36 +623,49 @@ class VerifyTool:
         t_json = os.path.join(self.reject_dir, os.path.basename(json_f))
         print(f"[ACTION] REJECT: {os.path.basename(jpg)}")
         try:
-            shutil.move(jpg, t_jpg)
-            if os.path.exists(json_f): shutil.move(json_f, t_json)
-            self.history_stack.append({'action':'REJECT', 'index':self.current_index, 'src':(jpg, json_f), 'dst':(t_jpg, t_json)})
+            self.materializer.move(jpg, t_jpg)
+            if os.path.exists(json_f): self.materializer.move(json_f, t_json)
             self.count_reject +=1
-            self.image_list.pop(self.current_index)
+            if self.lease is not None:
+                # LEASE_MODE: 목록(plan)은 고정, 다음 이미지로 이동
+                nxt = self._next_index()
+                self._log("REJECT", self.current_index, nxt, jpg, (t_jpg, t_json), src_json=json_f)
+                self.current_index = nxt
+            else:
+                # 목록에서 빠지므로 다음 위치 = 같은 인덱스
+                self._log("REJECT", self.current_index, self.current_index, jpg, (t_jpg, t_json), src_json=json_f)
+                self.image_list.pop(self.current_index)
+            self.check_sampling()
             self.load_current_image()
         except Exception as e:
             print(f"[ERROR] Move Failed: {e}")
 
     def action_back(self, event=None):
-        if not self.history_stack: return
-        last = self.history_stack.pop()
+        if self.journal is None or not self.journal.can_undo(): return
+        last = self.journal.last()
+        if self.lease is not None and not self.lease.seek(last['index']):
+            messagebox.showinfo("Lease", "이전 이미지가 있는 구간은 다른 작업자에게 넘어갔습니다.")
+            return
         print(f"[ACTION] UNDO {last['action']}")
-        if last['action']=='OK':
-            self.current_index = last['index']
-            self.count_ok -=1
-            self.load_current_image()
-        elif last['action']=='REJECT':
-            idx = last['index']
-            s_j, s_js = last['src']
-            d_j, d_js = last['dst']
+        if last['action']=='REJECT':
+            # 파일을 먼저 되돌리고, 성공한 경우에만 기록에서 제거
+            s_j, s_js = last['src'], last['src_json']
+            d_j, d_js = last['outputs']
             try:
-                if os.path.exists(d_j): shutil.move(d_j, s_j)
-                if os.path.exists(d_js): shutil.move(d_js, s_js)
-                self.image_list.insert(idx, (s_j, s_js))
-                self.current_index = idx
-                self.count_reject -=1
-                self.load_current_image()
+                if os.path.exists(d_j): self.materializer.move(d_j, s_j)
+                if os.path.exists(d_js): self.materializer.move(d_js, s_js)
             except Exception as e:
                 print(f"[ERROR] Undo Failed: {e}")
+                return
+            if self.lease is None:
+                self.image_list.insert(min(last['index'], len(self.image_list)), (s_j, s_js))
+        self.journal.undo()
+        counts = self.journal.counts()
+        self.count_ok = counts.get("ok", 0)
+        self.count_reject = counts.get("reject", 0)
+        self.current_index = min(last['index'], len(self.image_list) - 1)
+        self.check_sampling(notify=False)
+        self.load_current_image()
 
 if __name__ == "__main__":
     root = tk.Tk()
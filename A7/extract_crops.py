@@ -0,0 +1,107 @@
+"""
+Turns existing full-image A7 outputs (OUTPUT_MODE = "full") into crop outputs: the
+A7 box is cut out of each image, and the JSON gets the box at (0, 0) of the patch
+with the source position in metaData["crop"]. Same result as labeling with
+OUTPUT_MODE = "crop".
+
+    python A7/extract_crops.py /data/A7_out --out /data/A7_crops --workers 8
+    python A7/extract_crops.py /data/A7_out --in-place
+
+Subfolders are kept under --out. --in-place replaces the files (through a temporary
+file, so hardlinked outputs never change their source). Outputs that are crops
+already are copied (or left alone in place), so the command can simply be run again.
+"""
+import argparse
+import functools
+import json
+import os
+import shutil
+import sys
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.a7_transform import crop_json_data, crop_info
+from common.batch import Checkpoint, run_batch, DEFAULT_CHUNK_SIZE
+from common.crop import save_crop
+from common.overlays import parse_labeling_info
+from common.scan_manifest import scan_images
+
+CHECKPOINT_FILE = ".extract_crops.checkpoint.jsonl"
+
+
+def _a7_box(data):
+    for kind, coords, _ in parse_labeling_info(data):
+        if kind == "box":
+            return coords
+    raise ValueError("no box in labelingInfo")
+
+
+def _write_json(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def extract_one(pair, src_dir, out_dir):
+    img_path, json_path = pair
+    rel = os.path.relpath(img_path, src_dir)
+    out_img = os.path.join(out_dir, rel)
+    out_json = os.path.splitext(out_img)[0] + ".json"
+    os.makedirs(os.path.dirname(out_img), exist_ok=True)
+
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    # Header only; the pixels are decoded once, by save_crop
+    with Image.open(img_path) as im:
+        img_w, img_h = im.size
+
+    box_x, box_y, box_w, box_h = _a7_box(data)
+    crop = crop_info(data)
+    if crop is not None:
+        if (img_w, img_h) == (crop["width"], crop["height"]):
+            # already a crop output
+            if out_img != img_path:
+                shutil.copy2(img_path, out_img)
+                shutil.copy2(json_path, out_json)
+            return out_img
+        # in-place run stopped between the JSON and the image: the image is still the full one
+        box_x, box_y = crop["x"], crop["y"]
+
+    new_data = crop_json_data(data, box_x, box_y, int(box_w), int(box_h), img_w, img_h)
+    # JSON first: if the image write is lost, the next run sees the "crop" entry and redoes the image
+    _write_json(out_json, new_data)
+    save_crop(img_path, out_img, box_x, box_y, int(box_w), int(box_h))
+    return out_img
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cut the A7 box out of existing full-image A7 outputs.")
+    parser.add_argument("src", help="A7 output folder (TARGET_OUTPUT_DIR)")
+    parser.add_argument("--out", default=None, help="folder for the crop outputs")
+    parser.add_argument("--in-place", action="store_true", help="replace the outputs in src")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--checkpoint", default=None, help=f"default: <out>/{CHECKPOINT_FILE}")
+    args = parser.parse_args(argv)
+
+    if args.in_place == (args.out is not None):
+        parser.error("give either --out or --in-place")
+    src_dir = os.path.abspath(args.src)
+    out_dir = src_dir if args.in_place else os.path.abspath(args.out)
+    os.makedirs(out_dir, exist_ok=True)
+
+    pairs = scan_images(src_dir, require_json=True)
+    items = [(os.path.relpath(p[0], src_dir), p) for p in pairs]
+
+    checkpoint = Checkpoint(args.checkpoint or os.path.join(out_dir, CHECKPOINT_FILE))
+    fn = functools.partial(extract_one, src_dir=src_dir, out_dir=out_dir)
+    ok, failed, skipped, elapsed = run_batch(items, fn, workers=args.workers, chunk_size=args.chunk_size,
+                                             checkpoint=checkpoint, label="images")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
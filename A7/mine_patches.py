@@ -0,0 +1,123 @@
+"""
+Bulk A7 patch mining: up to K lesion-free boxes per source image, for review in check.py.
+
+For every image/JSON pair under the source folder, the A1~A6 polygons and boxes are
+rasterized into a lesion mask (common/lesion_mask.py) and up to --per-image disjoint
+placements at least --min-distance pixels away from every lesion are drawn at random
+(the same seed gives the same patches). Each one is written like a click in
+A7_label_tool.py: clamped box, transform_json_data, A[1-6] -> A7 filename, plus _p1,
+_p2, ... per patch. --crop writes the patch only (OUTPUT_MODE = "crop").
+
+    python A7/mine_patches.py /data/원천 --out /data/A7_mined --per-image 3 --workers 8
+
+Every mined patch is also listed in <out>/mined.jsonl (image, x, y, box_w, box_h), the
+input format of A7/batch_convert.py, so a reviewed subset can be re-exported (images
+redone after an interruption are listed again).
+"""
+import argparse
+import functools
+import json
+import os
+import random
+import sys
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.a7_transform import transform_json_data, crop_json_data, make_a7_patch_basename
+from common.batch import Checkpoint, run_batch, DEFAULT_CHUNK_SIZE
+from common.crop import save_crops
+from common.lesion_mask import suggest_patches
+from common.materialize import OutputMaterializer, OUTPUT_STRATEGY
+from common.overlays import parse_labeling_info
+from common.scan_manifest import scan_images
+
+CHECKPOINT_FILE = ".mine_patches.checkpoint.jsonl"
+MINED_LIST = "mined.jsonl"
+PER_IMAGE = 3
+# Pixels between a patch and the nearest lesion
+MIN_DISTANCE = 32
+
+_materializers = {}
+
+
+def _materializer(strategy):
+    # One per worker process, so per-directory detection is done once per process
+    if strategy not in _materializers:
+        _materializers[strategy] = OutputMaterializer(strategy)
+    return _materializers[strategy]
+
+
+def mine_one(pair, src_dir, out_dir, per_image, min_distance, box_w, box_h, crop, strategy, seed):
+    img_path, json_path = pair
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    # Header only; no pixel decode (except for --crop)
+    with Image.open(img_path) as im:
+        img_w, img_h = im.size
+
+    rel = os.path.relpath(img_path, src_dir).replace(os.sep, "/")
+    rng = random.Random(f"{seed}:{rel}")  # per image: same patches whatever the worker order
+    placements = suggest_patches(parse_labeling_info(data), img_w, img_h, box_w, box_h, top_k=per_image,
+                                 min_clearance=min_distance, max_iou=0.0, rng=rng)
+
+    base_name_no_ext = os.path.splitext(os.path.basename(img_path))[0]
+    mined = []
+    outputs = [os.path.join(out_dir, make_a7_patch_basename(base_name_no_ext, number))
+               for number in range(1, len(placements) + 1)]
+    if crop and placements:
+        # one decode for all the patches of this image
+        save_crops(img_path, [(out + ".jpg", x, y) for out, (x, y, _) in zip(outputs, placements)], box_w, box_h)
+    for out, (x, y, _) in zip(outputs, placements):
+        out_img = out + ".jpg"
+        out_json = out + ".json"
+        if crop:
+            new_data = crop_json_data(data, x, y, box_w, box_h, img_w, img_h)
+        else:
+            new_data = transform_json_data(data, x, y, box_w, box_h)
+            _materializer(strategy).place(img_path, out_img)
+        with open(out_json, 'w', encoding='utf-8') as f:
+            json.dump(new_data, f, ensure_ascii=False, indent=2)
+        mined.append({"image": os.path.abspath(img_path), "x": x, "y": y, "box_w": box_w, "box_h": box_h,
+                      "output": os.path.basename(out)})
+
+    # One append per image (single write: lines from different workers don't interleave)
+    if mined:
+        with open(os.path.join(out_dir, MINED_LIST), 'a', encoding='utf-8') as f:
+            f.write("".join(json.dumps(m, ensure_ascii=False) + "\n" for m in mined))
+    return len(mined)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mine lesion-free A7 patches from labeled source images.")
+    parser.add_argument("src", help="source folder (A1~A6 images with their JSON)")
+    parser.add_argument("--out", required=True, help="output folder (review it with check.py)")
+    parser.add_argument("--per-image", type=int, default=PER_IMAGE, help="max patches per image")
+    parser.add_argument("--min-distance", type=int, default=MIN_DISTANCE, help="pixels kept from any lesion")
+    parser.add_argument("--box-w", type=int, default=224)
+    parser.add_argument("--box-h", type=int, default=224)
+    parser.add_argument("--crop", action="store_true", help="write the patch only, not the whole image")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--strategy", default=OUTPUT_STRATEGY, help="auto | reflink | hardlink | symlink | copy")
+    parser.add_argument("--checkpoint", default=None, help=f"default: <out>/{CHECKPOINT_FILE}")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    src_dir = os.path.abspath(args.src)
+    pairs = scan_images(src_dir, require_json=True)
+    items = [(os.path.relpath(p[0], src_dir), p) for p in pairs]
+
+    checkpoint = Checkpoint(args.checkpoint or os.path.join(args.out, CHECKPOINT_FILE))
+    fn = functools.partial(mine_one, src_dir=src_dir, out_dir=args.out, per_image=args.per_image,
+                           min_distance=args.min_distance, box_w=args.box_w, box_h=args.box_h,
+                           crop=args.crop, strategy=args.strategy, seed=args.seed)
+    ok, failed, skipped, elapsed = run_batch(items, fn, workers=args.workers, chunk_size=args.chunk_size,
+                                             checkpoint=checkpoint, label="images")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+Geometric pre-verification of an A7 output folder, before check.py.
+
+Every A7 box is measured against the lesion polygons/boxes of its original (same
+extract_id -> OriginalIndex lookup as check.py):
+- clear pass    no lesion within --accept-distance px          -> accepted, nothing to do
+- clear overlap lesions cover >= --reject-overlap of the box   -> moved to _REJECTED
+- anything else (close to a lesion, small overlap, no original,
+  unreadable JSON)                                             -> review queue
+
+The review queue (<folder>/review_queue.json) is written riskiest first; check.py
+loads only those images, in that order, when the file exists (plus any output written
+after the run started, at the end: those were never measured). Every measurement is
+appended to <folder>/preverify.jsonl; rejected files can be moved back from there.
+
+    python A7/preverify.py /data/A7_out --originals /data/원천 --workers 8
+    python A7/preverify.py /data/A7_out --originals /data/원천 --dry-run
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.a7_transform import crop_info
+from common.materialize import OutputMaterializer
+from common.original_index import OriginalIndex, extract_id
+from common.overlap import box_lesion_metrics
+from common.overlays import parse_labeling_info, read_label_json
+from common.scan_manifest import scan_images
+
+REJECT_FOLDER_NAME = "_REJECTED"  # same as check.py
+REVIEW_QUEUE_FILE = "review_queue.json"
+REPORT_FILE = "preverify.jsonl"
+
+# Share of the A7 box covered by lesions from which it is rejected without review
+REJECT_OVERLAP = 0.10
+# Pixels from the nearest lesion from which it is accepted without review
+ACCEPT_DISTANCE = 16
+
+
+def a7_boxes(data):
+    """A7 boxes of an output in ORIGINAL image coordinates (crop outputs shifted back)."""
+    boxes = [coords for kind, coords, _ in parse_labeling_info(data) if kind == "box"]
+    crop = crop_info(data)
+    if crop:
+        boxes = [[x + crop["x"], y + crop["y"], w, h] for x, y, w, h in boxes]
+    return boxes
+
+
+def measure(job):
+    """(jpg, json, original json or None) -> report record (runs in a worker process)."""
+    jpg, json_path, orig_path = job
+    rec = {"image": os.path.basename(jpg), "original": orig_path}
+    try:
+        boxes = a7_boxes(read_label_json(json_path))
+        if not boxes:
+            rec.update(reason="no A7 box", overlap=None, iou=None, distance=None)
+            return rec
+        if orig_path is None:
+            rec.update(reason="no original", overlap=None, iou=None, distance=None)
+            return rec
+        shapes = parse_labeling_info(read_label_json(orig_path))
+    except (OSError, ValueError) as e:
+        # one broken JSON must not abort pool.map: it goes to the review queue instead
+        rec.update(reason="unreadable", error=str(e), overlap=None, iou=None, distance=None)
+        return rec
+    # several boxes (MULTI_PATCH "single"): the worst one decides
+    overlap, iou, distance = 0.0, 0.0, float("inf")
+    for box in boxes:
+        o, i, d = box_lesion_metrics(box, shapes)
+        overlap, iou, distance = max(overlap, o), max(iou, i), min(distance, d)
+    rec.update(overlap=round(overlap, 4), iou=round(iou, 4),
+               distance=None if distance == float("inf") else round(distance, 1))
+    return rec
+
+
+def decide(rec, reject_overlap, accept_distance):
+    """Adds "decision" (accept | reject | review) and "risk" (0-1, review order) to a record."""
+    overlap, distance = rec.get("overlap"), rec.get("distance")
+    if overlap is None:
+        rec["decision"], rec["risk"] = "review", 1.0  # nothing to measure: a human has to look
+    elif overlap >= reject_overlap:
+        rec["decision"], rec["risk"] = "reject", 1.0
+        rec["reason"] = f"overlap {overlap:.0%}"
+    elif overlap > 0:
+        rec["decision"], rec["risk"] = "review", round(0.5 + 0.5 * overlap / reject_overlap, 4)
+        rec["reason"] = f"overlap {overlap:.1%}"
+    elif distance is None or distance >= accept_distance:
+        rec["decision"], rec["risk"] = "accept", 0.0
+    else:
+        rec["decision"], rec["risk"] = "review", round(0.5 * (1 - distance / accept_distance), 4)
+        rec["reason"] = f"{distance:.0f}px from a lesion"
+    return rec
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Accept/reject clear A7 outputs by geometry, queue the rest for check.py.")
+    parser.add_argument("folder", help="A7 output folder (what check.py opens)")
+    parser.add_argument("--originals", required=True, help="ORIGINAL_ROOT of check.py")
+    parser.add_argument("--reject-overlap", type=float, default=REJECT_OVERLAP)
+    parser.add_argument("--accept-distance", type=float, default=ACCEPT_DISTANCE)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--dry-run", action="store_true", help="only write the report, move nothing")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    # outputs written after this point are not measured: check.py reviews them on top of the queue
+    scan_started = time.time()
+    folder = os.path.abspath(args.folder)
+    index = OriginalIndex(args.originals).build()
+    pairs = scan_images(folder, recursive=False, require_json=True)  # check.py's list
+    jobs = [(jpg, js, index.find(extract_id(jpg))) for jpg, js in pairs]
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        records = [decide(rec, args.reject_overlap, args.accept_distance)
+                   for rec in pool.map(measure, jobs, chunksize=64)]
+
+    reject_dir = os.path.join(folder, REJECT_FOLDER_NAME)
+    materializer = OutputMaterializer()
+    if not args.dry_run and any(r["decision"] == "reject" for r in records):
+        os.makedirs(reject_dir, exist_ok=True)
+    counts = {"accept": 0, "reject": 0, "review": 0}
+    run = time.strftime("%Y-%m-%d %H:%M:%S")
+    # appended: earlier runs' lines still say where their rejects went
+    with open(os.path.join(folder, REPORT_FILE), 'a', encoding='utf-8') as f:
+        for (jpg, json_path, _), rec in zip(jobs, records):
+            if rec["decision"] == "reject" and not args.dry_run:
+                try:
+                    materializer.move(jpg, os.path.join(reject_dir, os.path.basename(jpg)))
+                    materializer.move(json_path, os.path.join(reject_dir, os.path.basename(json_path)))
+                    rec["moved_to"] = REJECT_FOLDER_NAME
+                except OSError as e:
+                    print(f"[ERROR] Move failed for {rec['image']}: {e}")
+                    rec["decision"] = "review"
+            counts[rec["decision"]] += 1
+            rec["run"] = run
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+    review = sorted((r for r in records if r["decision"] == "review"), key=lambda r: (-r["risk"], r["image"]))
+    queue = {"created": scan_started, "reject_overlap": args.reject_overlap, "accept_distance": args.accept_distance,
+             "items": [{"image": r["image"], "risk": r["risk"], "reason": r.get("reason")} for r in review]}
+    if not args.dry_run:
+        tmp = os.path.join(folder, REVIEW_QUEUE_FILE + ".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(queue, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, os.path.join(folder, REVIEW_QUEUE_FILE))
+
+    total = len(records)
+    share = counts["review"] / total if total else 0.0
+    print(f"Pre-verified {total} outputs in {time.perf_counter() - start:.1f}s: "
+          f"{counts['accept']} accepted, {counts['reject']} rejected, {counts['review']} to review ({share:.1%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
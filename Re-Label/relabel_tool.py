@@ -1,12 +1,25 @@
 import os
 import glob
 import json
-import shutil
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk
-import copy
+from PIL import ImageTk
 import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.prefetch import ImagePrefetcher, when_ready
+from common.overlays import parse_labeling_info, sidecar_json_path
+from common.materialize import OutputMaterializer
+from common.journal import ActionJournal, journal_path_for, resume_position
+from common.write_queue import BackgroundWriter
+from common.scan_manifest import StreamingScan, when_resume_position
+from common.json_cache import JsonCache
+from common.perf import PERF
+from common.geometry import display_polygon
+from common.cursor import CursorBox
+from common.lease import LeaseManager
+from common.shards import ShardWriter, sample_key
 
 LABEL_INFO = {
     "A1": {"code": "A1", "name": "A1_구진_플라크", "path_val": "유증상"},
@@ -20,6 +33,23 @@ LABEL_INFO = {
 INPUT_ROOT = r"/Users/sonseunghyeon/Desktop/creamoff/workspace/labeling/테스트용 파일/변환 전"
 PROGRESS_FILE = "relabel_progress.json"
 
+# 결과 JPG 생성 방식: "auto"(reflink -> hardlink -> copy) | "reflink" | "hardlink" | "symlink" | "copy"
+OUTPUT_STRATEGY = "auto"
+
+# 여러 명이 같은 폴더를 동시에 작업할 때 True (INPUT_ROOT/.leases/ 로 구간을 나눠 가짐)
+# 작업자 이름: LABELING_ANNOTATOR 환경변수 (없으면 user@host)
+LEASE_MODE = False
+
+# RELABEL/PASS 결과를 tar shard 로도 함께 저장할 폴더 (None = 끔)
+# 기존 relabeled/ 폴더는 python -m common.shards 로 일괄 변환
+SHARD_EXPORT_DIR = None
+
+def relabel_filename(orig_jpg_path, new_code):
+    # 정규식으로 A1~A6 패턴 찾아서 교체
+    # 예: IMG_D_A6_123456.jpg -> IMG_D_A1_123456.jpg
+    name, ext = os.path.splitext(os.path.basename(orig_jpg_path))
+    return re.sub(r"_A[1-6]_", f"_{new_code}_", name) + ext
+
 class RelabelTool:
     def __init__(self, root):
         self.root = root
@@ -34,23 +64,63 @@ class RelabelTool:
         self._create_output_dirs()
 
         self.image_list = []  # (jpg_path, json_path)
+        self.scan = None  # image_list를 백그라운드에서 채우는 StreamingScan
         self.current_index = 0
         self.current_mode = "A1"
         
         self.scale_factor = 1.0
         self.img_tk = None
+        self.image_item = None
         self.current_jpg_path = None
         self.current_json_path = None
         
-        # Undo 스택
-        self.history_stack = []
+        # RELABEL/PASS/REJECT 기록 (append-only, 재시작 후에도 Undo 가능)
+        self.journal = None
+        self.lease = None  # LEASE_MODE 일 때 LeaseManager
+
+        # 다음/이전 이미지 백그라운드 디코딩 + 리사이즈 (+ 오버레이 파싱, LRU 캐시)
+        self.prefetcher = ImagePrefetcher(self.root.winfo_screenwidth() * 0.85,
+                                          self.root.winfo_screenheight() * 0.85,
+                                          overlay_loader=self._load_overlays)
+        self.current_overlays = None
+
+        # JSON은 세션 동안 한 번만 파싱 (오버레이 표시 + 변환 저장에서 공유)
+        self.json_cache = JsonCache()
+
+        # 바이트 복사 대신 hardlink/reflink (가능한 경우)
+        self.materializer = OutputMaterializer(OUTPUT_STRATEGY)
+
+        # JSON 변환/저장 + 이미지 생성은 백그라운드 (큐가 가득 찰 때만 UI 대기)
+        self.writer = BackgroundWriter()
+        # tar shard 내보내기 (선택), writer 스레드에서 추가됨
+        self.shards = ShardWriter(SHARD_EXPORT_DIR) if SHARD_EXPORT_DIR else None
 
         self._init_ui()
         self._bind_events()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.writer.watch(self.root, self._on_write_error)
+        PERF.attach_hud(self.root)  # LABELING_PERF=1 일 때만
 
         # --- 실행 ---
         self.root.after(100, self.start_tool)
 
+    def _on_write_error(self, job):
+        messagebox.showerror("Error", f"저장 실패: {job.label}\n{job.error}\n\nBack으로 되돌린 뒤 다시 작업해주세요.")
+
+    def on_close(self):
+        self.writer.shutdown()  # 큐에 남은 작업까지 모두 저장
+        if self.shards is not None:
+            self.shards.close()  # 마지막 shard 마무리
+        self.prefetcher.shutdown()
+        print(f"[DEBUG] JSON cache: {self.json_cache.stats()}")
+        if self.lease is not None:
+            self.lease.release()  # 남은 구간은 바로 다른 작업자가 가져갈 수 있음
+        if self.journal is not None:
+            self.save_progress()  # 세션 종료 시 한 번만
+            self.journal.close()  # compaction
+        PERF.close()
+        self.root.destroy()
+
     def _create_output_dirs(self):
         if not os.path.exists(self.output_root):
             os.makedirs(self.output_root)
@@ -103,53 +173,106 @@ class RelabelTool:
         self.root.bind("<b>", lambda e: self.action_back())
         self.root.bind("<B>", lambda e: self.action_back())
         
-        self.canvas.bind("<Motion>", self.on_mouse_move)
+        # 커서 박스: Motion 이벤트는 모아서 최대 CURSOR_FPS 번만 다시 그림
+        self.cursor = CursorBox(self.canvas, self._cursor_geometry, outline="#00ff00", width=2)
+        self.cursor.bind()
         self.canvas.bind("<Button-1>", self.on_mouse_click)
 
     def start_tool(self):
-        # 1. 파일 리스트 (재귀)
+        # 1. 파일 리스트 (재귀, 백그라운드 스캔)
         self.load_file_list_recursive()
+        self.lbl_status.config(text="Scanning...")
         
-        # 2. Auto-Save 복구 확인
-        self.check_resume()
-        
+        # 2. 첫 쌍이 발견되는 즉시 시작
+        self.scan.when_available(self.root, 1, self._start_session)
+
+    def _start_session(self):
         if not self.image_list:
             messagebox.showwarning("Warning", "JPG/JSON 파일을 찾을 수 없습니다.")
             return
 
         self.update_mode_buttons()
+        if LEASE_MODE:
+            # 모두 같은 목록을 써야 하므로 스캔이 끝난 뒤 구간 배정
+            self.lbl_status.config(text="Scanning... (lease mode: waiting for the full list)")
+            self.scan.when_available(self.root, None, self._start_leased)
+            return
+        # Auto-Save 복구 확인 (저장된 위치까지 스캔되면 바로)
+        self.check_resume(self.load_current_image)
+
+    def _start_leased(self):
+        # 작업자마다 별도 journal, 확인 창 없이 journal + lease 파일 기준으로 이어서 작업
+        try:
+            self.lease = LeaseManager(self.input_root)
+            self.journal = ActionJournal(self.lease.journal_path(os.path.join(self.input_root, PROGRESS_FILE)))
+        except OSError as e:
+            messagebox.showerror("Error", f"Lease 설정 실패: {e}")
+            return
+        # plan.json: 먼저 시작한 사람의 목록 (모두 같은 인덱스)
+        self.image_list = self.lease.load_plan(self.scan.items, key=lambda pair: pair[0],
+                                               build=lambda jpg: (jpg, sidecar_json_path(jpg)))
+        last = self.journal.last()
+        prefer = resume_position(last, self.image_list, key=lambda pair: pair[0]) if last else None
+        idx = self.lease.start(len(self.image_list), prefer)
+        self.current_index = len(self.image_list) if idx is None else idx
+        print(f"[DEBUG] Lease ({self.lease.owner}): starting at {self.current_index}")
+        self.lease.heartbeat(self.root)
         self.load_current_image()
 
     def load_file_list_recursive(self):
         print(f"[DEBUG] Recursive scan in {self.input_root}")
-        self.image_list = []
-        for root, dirs, files in os.walk(self.input_root):
-            for f in files:
-                if f.lower().endswith(".jpg"):
-                    jpg_path = os.path.join(root, f)
-                    json_path = os.path.splitext(jpg_path)[0] + ".json"
-                    if os.path.exists(json_path):
-                        self.image_list.append((jpg_path, json_path))
-        self.image_list.sort()
-        print(f"[DEBUG] Found {len(self.image_list)} pairs.")
-
-    def check_resume(self):
+        # 캐시된 목록(.scan_manifest.json)에서 변경된 폴더만 다시 스캔
+        # 찾는 대로 정렬된 순서로 image_list에 추가 (전체 스캔을 기다리지 않음)
+        self.scan = StreamingScan(self.input_root, require_json=True)
+        self.image_list = self.scan.items
+        self.scan.watch(self.root, self.update_status)
+
+    def check_resume(self, on_done):
         prog_path = os.path.join(self.input_root, PROGRESS_FILE)
+        try:
+            self.journal = ActionJournal(journal_path_for(prog_path))
+        except OSError as e:
+            print(f"[ERROR] Failed to open journal: {e}")
+
+        last = self.journal.last() if self.journal is not None else None
+        if last is not None:
+            def ask(start_idx):
+                msg = f"이전 작업 기록이 있습니다.\n파일: {os.path.basename(last['src'] or '')}\n인덱스: {last['index']}\n이어하시겠습니까?"
+                if messagebox.askyesno("Resume", msg):
+                    if 0 <= start_idx <= len(self.image_list):
+                        self.current_index = start_idx
+                else:
+                    self.journal.reset()
+                on_done()
+            when_resume_position(self.scan, self.root, last, ask, key=lambda pair: pair[0])
+            return
+
+        # journal 이전의 relabel_progress.json
         if os.path.exists(prog_path):
             try:
                 with open(prog_path, 'r', encoding='utf-8') as f:
                     data = json.load(f)
                 last_idx = data.get("last_index", 0)
                 last_file = data.get("last_filename", "")
-                
+            except:
+                on_done()
+                return
+
+            def ask_legacy():
                 msg = f"이전 작업 기록이 있습니다.\n파일: {last_file}\n인덱스: {last_idx}\n이어하시겠습니까?"
                 if messagebox.askyesno("Resume", msg):
                     start_idx = last_idx + 1
                     if 0 <= start_idx <= len(self.image_list):
                         self.current_index = start_idx
-            except: pass
+                        if self.journal is not None:
+                            self.journal.record("BASE", last_idx, start_idx)
+                on_done()
+            self.scan.when_available(self.root, last_idx + 2, ask_legacy)
+            return
+        on_done()
 
     def save_progress(self):
+        # 세션 종료 시에만 기록 (결정은 journal에)
         if not self.input_root: return
         done_idx = self.current_index - 1
         done_name = ""
@@ -187,90 +310,76 @@ class RelabelTool:
             folder = "-"
             
         txt = f"[{self.current_index + 1}/{len(self.image_list)}] {fname} ({folder}) | Mode: {self.current_mode}"
+        if self.scan is not None and not self.scan.done:
+            txt += f" | {self.scan.status_text()}"
+        if self.lease is not None:
+            txt += f" | {self.lease.status_text()}"
         self.lbl_status.config(text=txt)
 
     def load_current_image(self):
         if 0 <= self.current_index < len(self.image_list):
             self.current_jpg_path, self.current_json_path = self.image_list[self.current_index]
             self.display_image(self.current_jpg_path)
-            self.draw_overlays(self.current_json_path)
+            self.draw_overlays()
             self.update_status()
             self.root.focus_set()
+        elif self.scan is not None and not self.scan.done:
+            # 아직 스캔되지 않은 위치 -> 도착하면 표시
+            self.canvas.delete("all")
+            self.update_status()
+            self.scan.when_available(self.root, self.current_index + 1, self.load_current_image)
         else:
             self.canvas.delete("all")
             self.lbl_status.config(text="End of List.")
             messagebox.showinfo("Done", "End of list reached.")
 
+    @PERF.timed("display_image")
     def display_image(self, path):
+        self.current_overlays = None
         try:
-            pil_img = Image.open(path)
+            frame, refine = self.prefetcher.get_progressive(path)
         except: return
         
-        w, h = pil_img.size
-        sw, sh = self.root.winfo_screenwidth(), self.root.winfo_screenheight()
-        max_w, max_h = sw * 0.85, sh * 0.85
-        
-        ratio = min(max_w/w, max_h/h)
-        if ratio < 1.0:
-            new_w, new_h = int(w*ratio), int(h*ratio)
-            pil_img = pil_img.resize((new_w, new_h), Image.Resampling.LANCZOS)
-            self.scale_factor = ratio
-        else:
-            self.scale_factor = 1.0
-            
-        self.img_tk = ImageTk.PhotoImage(pil_img)
+        self.scale_factor = frame.scale_factor
+        self.current_overlays = frame.overlays
+        with PERF.stage("photoimage"):
+            self.img_tk = ImageTk.PhotoImage(frame.image)
         self.canvas.delete("all")
         self.canvas.config(scrollregion=(0,0,self.img_tk.width(), self.img_tk.height()))
-        self.canvas.create_image(0,0, anchor=tk.NW, image=self.img_tk)
-
-    def draw_overlays(self, json_path):
-        if not os.path.exists(json_path): return
-        try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            if "labelingInfo" in data:
-                for item in data["labelingInfo"]:
-                    # Polygon (Red)
-                    if "polygon" in item:
-                        pts = self._parse_poly(item["polygon"])
-                        if pts:
-                            self._draw_poly(pts, "red", 2)
-                    # Box (Blue)
-                    if "box" in item:
-                        box = self._parse_box(item["box"])
-                        if box:
-                            self._draw_box(box, "blue", 2)
-        except: pass
-
-    def _parse_box(self, node):
-        try:
-            # location: [{"x":...}] or direct keys
-            loc_list = node.get("location", [])
-            if loc_list:
-                loc = loc_list[0]
-                return [loc.get('x',0), loc.get('y',0), loc.get('width',0), loc.get('height',0)]
-            if "x" in node:
-                return [node['x'], node['y'], node['width'], node['height']]
-        except: pass
-        return None
+        self.image_item = self.canvas.create_image(0,0, anchor=tk.NW, image=self.img_tk)
+        self.cursor.reset()
+        if refine is not None:
+            when_ready(self.root, refine, lambda fut, p=path: self._refine_image(p, fut))
+        
+        self.prefetcher.schedule(self.image_list, self.current_index, key=lambda t: t[0])
 
-    def _parse_poly(self, node):
+    def _refine_image(self, img_path, refine):
+        # 드래프트(저해상도 디코딩) -> 원본 품질로 교체. 크기/scale_factor 동일
+        if self.current_jpg_path != img_path:
+            return
         try:
-            loc_list = node.get("location", [])
-            if loc_list:
-                loc = loc_list[0]
-                pts = []
-                i=1
-                while True:
-                    kx, ky = f"x{i}", f"y{i}"
-                    if kx in loc and ky in loc:
-                        pts.extend([loc[kx], loc[ky]])
-                        i+=1
-                    else: break
-                if len(pts)>=4: return pts
-        except: pass
-        return None
+            frame = refine.result()
+        except Exception:
+            return
+        self.img_tk = ImageTk.PhotoImage(frame.image)
+        self.canvas.itemconfig(self.image_item, image=self.img_tk)
+        # 드래프트에는 오버레이가 없음 (워커에서 파싱) -> 원본 품질 프레임과 함께 그림
+        self.current_overlays = frame.overlays
+        self.draw_overlays()
+
+    def _load_overlays(self, img_path):
+        # JSON 파싱은 prefetch 워커에서 한 번만 (프레임과 함께 캐시)
+        return parse_labeling_info(self.json_cache.get(sidecar_json_path(img_path)))
+
+    @PERF.timed("draw_overlays")
+    def draw_overlays(self):
+        for kind, coords, _ in self.current_overlays or []:
+            # Polygon (Red)
+            if kind == "polygon":
+                self._draw_poly(coords, "red", 2)
+            # Box (Blue)
+            elif kind == "box":
+                self._draw_box(coords, "blue", 2)
 
     def _draw_box(self, box, color, width):
         x, y, w, h = box
@@ -281,37 +390,21 @@ class RelabelTool:
         )
 
     def _draw_poly(self, pts, color, width):
-        s_pts = [p*self.scale_factor for p in pts]
+        s_pts = display_polygon(pts, self.scale_factor)  # 화면 해상도 기준으로 단순화
         self.canvas.create_polygon(s_pts, outline=color, fill='', width=width)
 
     # --- Mouse Interaction ---
-    def on_mouse_move(self, event):
-        self.canvas.delete("cursor_box")
-        mx, my = event.x, event.y
-        # 224x224 scaled
-        s_size = 224 * self.scale_factor
-        
-        # Center aligned
-        x1 = mx - s_size/2
-        y1 = my - s_size/2
-        x2 = mx + s_size/2
-        y2 = my + s_size/2
-        
-        self.canvas.create_rectangle(x1, y1, x2, y2, outline="#00ff00", width=2, tag="cursor_box")
+    def _cursor_geometry(self):
+        if self.img_tk is None: return None
+        return self.scale_factor, self.img_tk.width(), self.img_tk.height()
 
     def on_mouse_click(self, event):
         if not self.image_list or self.current_index >= len(self.image_list): return
         
-        mx, my = event.x, event.y
-        # To Image Coords
-        ix = mx / self.scale_factor
-        iy = my / self.scale_factor
-        
-        # Center aligned 224 box
-        x = int(ix - 112)
-        y = int(iy - 112)
-        if x < 0: x = 0
-        if y < 0: y = 0
+        # 클릭 위치 기준 224 박스 (이미지 안으로 clamp, 원본 좌표)
+        pos = self.cursor.commit(event)
+        if pos is None: return
+        x, y = int(pos[0]), int(pos[1])
         
         box_coords = [x, y, 224, 224] # x,y,w,h
         print(f"[ACTION] Clicked at {box_coords} with mode {self.current_mode}")
@@ -321,45 +414,48 @@ class RelabelTool:
     # =========================================================================
     # 4. JSON 변환 로직
     # =========================================================================
+    @PERF.timed("relabel_click")
     def process_relabel_smart(self, label_code, box_coords):
         orig_jpg, orig_json = self.image_list[self.current_index]
         
-        try:
-            with open(orig_json, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except: data = {}
-        
-        new_data = self.update_json_smart(data, label_code, box_coords, orig_jpg)
-        
-        # Save
-        new_filename = new_data["metaData"]["Raw data ID"]
+        # 파일명은 원본 파일명만으로 결정 -> JSON을 읽기 전에 경로 확정
+        new_filename = relabel_filename(orig_jpg, label_code)
         dest_dir = os.path.join(self.output_root, label_code)
         
         dest_jpg = os.path.join(dest_dir, new_filename)
         dest_json = os.path.join(dest_dir, os.path.splitext(new_filename)[0] + ".json")
         
+        # 읽기 + 변환 + 저장은 백그라운드에서
+        self.writer.submit(self._write_relabel, orig_jpg, orig_json, label_code, box_coords, dest_jpg, dest_json,
+                           outputs=[dest_jpg, dest_json], label=os.path.basename(orig_jpg))
+        self.next_image('RELABEL', [dest_jpg, dest_json])
+
+    @PERF.timed("write_relabel")
+    def _write_relabel(self, orig_jpg, orig_json, label_code, box_coords, dest_jpg, dest_json):
         try:
-            shutil.copy(orig_jpg, dest_jpg)
-            with open(dest_json, 'w', encoding='utf-8') as f:
-                json.dump(new_data, f, ensure_ascii=False, indent=2)
-                
-            self.history_stack.append({
-                'action': 'RELABEL',
-                'index': self.current_index,
-                'output_files': [dest_jpg, dest_json]
-            })
-            self.next_image()
-            
-        except Exception as e:
-            print(f"[ERROR] Save failed: {e}")
+            data = self.json_cache.get(orig_json) or {}  # 보통 prefetch에서 이미 파싱됨
+        except: data = {}
+        
+        new_data = self.update_json_smart(data, label_code, box_coords, orig_jpg)
+        if not new_data:
+            raise ValueError(f"JSON 없음/비어있음: {orig_json}")
+        
+        self.materializer.place(orig_jpg, dest_jpg)
+        with open(dest_json, 'w', encoding='utf-8') as f:
+            json.dump(new_data, f, ensure_ascii=False, indent=2)
+        if self.shards is not None:
+            self.shards.add_pair(sample_key(self.output_root, dest_jpg), orig_jpg, new_data)
 
     def update_json_smart(self, data, new_code, box, orig_jpg_path):
         """
         요구사항에 맞춘 스마트 JSON 데이터 치환 함수
         """
         if not data: return {}
-        new_data = copy.deepcopy(data)
-        meta = new_data.get("metaData", {})
+        # copy-on-write: 최상위와 metaData만 복사 (data는 JsonCache 공유 객체, 수정 금지)
+        new_data = dict(data)
+        meta = dict(new_data.get("metaData", {}))
+        if "metaData" in new_data:
+            new_data["metaData"] = meta
         
         # 타겟 정보 조회
         target_info = LABEL_INFO.get(new_code, {})
@@ -369,15 +465,7 @@ class RelabelTool:
         # 1. 파일명 (Raw data ID) 치환
         # 기존: IMG_D_{기존코드}_{고유번호}.jpg
         # 변경: IMG_D_{새코드}_{고유번호}.jpg
-        old_fname = os.path.basename(orig_jpg_path)
-        name, ext = os.path.splitext(old_fname)
-        
-        # 정규식으로 A1~A6 패턴 찾아서 교체
-        # 예: IMG_D_A6_123456 -> IMG_D_A1_123456
-        new_name_body = re.sub(r"_A[1-6]_", f"_{new_code}_", name)
-        
-        new_filename = new_name_body + ext
-        meta["Raw data ID"] = new_filename
+        meta["Raw data ID"] = relabel_filename(orig_jpg_path, new_code)
         
         # 2. 병변 및 진단 정보 업데이트
         meta["lesions"] = new_code
@@ -460,33 +548,48 @@ class RelabelTool:
         dst_jpg = os.path.join(dest_dir, fname_jpg)
         dst_json = os.path.join(dest_dir, fname_json)
         
-        try:
-            shutil.copy(orig_jpg, dst_jpg)
-            if os.path.exists(orig_json):
-                shutil.copy(orig_json, dst_json)
-                
-            self.history_stack.append({
-                'action': intent,
-                'index': self.current_index,
-                'output_files': [dst_jpg, dst_json]
-            })
-            self.next_image()
-        except: pass
-
-    def next_image(self):
-        self.save_progress()
-        self.current_index += 1
+        # 복사 + shard 추가는 백그라운드에서 (큐가 가득 찼을 때만 대기)
+        self.writer.submit(self._place_pair, orig_jpg, orig_json, dst_jpg, dst_json, intent == "PASS",
+                           outputs=[dst_jpg, dst_json], label=fname_jpg)
+        self.next_image(intent, [dst_jpg, dst_json])
+
+    def _place_pair(self, orig_jpg, orig_json, dst_jpg, dst_json, to_shard):
+        self.materializer.place(orig_jpg, dst_jpg)
+        if os.path.exists(orig_json):
+            # JSON은 나중에 수정될 수 있으므로 원본과 inode 공유 금지 (reflink/copy만)
+            self.materializer.place(orig_json, dst_json, cow_only=True)
+            if to_shard and self.shards is not None:
+                self.shards.add_pair(sample_key(self.output_root, dst_jpg), orig_jpg,
+                                     self.json_cache.get(orig_json))
+
+    def next_image(self, action, output_files):
+        if self.journal is not None:
+            try:
+                self.journal.record(action, self.current_index, self.current_index + 1,
+                                    src=self.image_list[self.current_index][0], outputs=output_files)
+            except Exception as e:
+                print(f"[ERROR] Journal write failed: {e}")
+        if self.lease is not None:
+            # 구간 안의 다음, 구간 끝이면 새로 받은 구간의 시작
+            nxt = self.lease.advance(self.current_index)
+            self.current_index = len(self.image_list) if nxt is None else nxt
+        else:
+            self.current_index += 1
         self.load_current_image()
 
     def action_back(self):
-        if not self.history_stack: return
-        last = self.history_stack.pop()
+        if self.journal is None or not self.journal.can_undo(): return
+        if self.lease is not None and not self.lease.seek(self.journal.last()['index']):
+            messagebox.showinfo("Lease", "이전 이미지가 있는 구간은 다른 작업자에게 넘어갔습니다.")
+            return
+        last = self.journal.undo()
         print(f"[ACTION] UNDO {last['action']}")
         
-        for f in last['output_files']:
-            if os.path.exists(f):
-                try: os.remove(f)
-                except: pass
+        # 아직 큐에 있으면 취소, 이미 저장됐으면 삭제
+        try: self.writer.revert(last['outputs'])
+        except Exception as e: print(f"[ERROR] Undo delete failed: {e}")
+        if self.shards is not None and last['action'] in ("RELABEL", "PASS"):
+            self.shards.remove(sample_key(self.output_root, last['outputs'][0]))
         
         self.current_index = last['index']
         self.load_current_image()
@@ -1,11 +1,21 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk
+from PIL import ImageTk
 import os
 import json
-import shutil
-import glob
 import math
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.prefetch import ImagePrefetcher, when_ready, get_resample
+from common.overlays import parse_labeling_info, read_label_json, sidecar_json_path
+from common.materialize import OutputMaterializer
+from common.journal import ActionJournal, journal_path_for, resume_position
+from common.write_queue import BackgroundWriter
+from common.scan_manifest import StreamingScan, when_resume_position
+from common.perf import PERF
+from common.geometry import display_polygon
+from common.lease import LeaseManager
 
 # [STYLE CONFIGURATION]
 BOX_COLOR_RED = "red"
@@ -14,6 +24,15 @@ BOX_WIDTH = 2
 FONT_GUIDE = ("Arial", 16, "bold")
 FONT_STATUS = ("Arial", 12)
 
+# [OUTPUT CONFIGURATION]
+# How files land in _save/_drop: "auto"(reflink -> hardlink -> copy) | "reflink" | "hardlink" | "symlink" | "copy"
+OUTPUT_STRATEGY = "auto"
+
+# [LEASE MODE]
+# True: several people work on the same folder, each on its own chunks of the image list
+# (claimed through <folder>/.leases/; annotator name from LABELING_ANNOTATOR, else user@host)
+LEASE_MODE = False
+
 class DropTool:
     def __init__(self, root):
         self.root = root
@@ -22,22 +41,63 @@ class DropTool:
         
         # State
         self.image_list = []
+        self.scan = None  # StreamingScan filling image_list in the background
         self.current_index = 0
         self.base_dir = ""
         self.save_dir = None
         self.drop_dir = None
         
         self.tk_image = None
+        self.image_item = None
         self.raw_pil_image = None # Original Full Size (Not used directly for display if resized)
         self.scale_factor = 1.0   # For coordinate mapping
         
         # Stats
         self.count_save = 0
         self.count_drop = 0
-        self.history_stack = []
+        # Append-only SAVE/DROP log in <dir>_save (replaces the in-memory history stack)
+        self.journal = None
+        self.lease = None  # LeaseManager in LEASE_MODE
+        
+        # Background decode + resize of the next/previous images
+        # (recently shown frames stay in an LRU cache, so Undo is instant)
+        self.prefetcher = ImagePrefetcher(self.root.winfo_screenwidth() * 0.9,
+                                          self.root.winfo_screenheight() * 0.9,
+                                          resample=get_resample("BICUBIC"),
+                                          overlay_loader=self._load_overlays)
+        self.current_overlays = []
+        
+        # Hardlink/reflink output files instead of byte copies where possible
+        self.materializer = OutputMaterializer(OUTPUT_STRATEGY)
+        
+        # Copies run off the UI thread (bounded queue, flushed on close)
+        self.writer = BackgroundWriter()
         
         # UI Setup
         self.setup_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.writer.watch(self.root, self._on_write_error)
+        PERF.attach_hud(self.root)  # LABELING_PERF=1 only
+        
+    def _on_write_error(self, job):
+        messagebox.showerror("Error", f"Failed to copy files: {job.label}\n{job.error}\n\nUndo and try again.")
+        
+    def on_close(self):
+        self.writer.shutdown()  # nothing queued is lost
+        self.prefetcher.shutdown()
+        self.close_journal()
+        PERF.close()
+        self.root.destroy()
+        
+    def close_journal(self):
+        if self.lease is not None:
+            self.lease.release()  # the rest of the chunk is free for others right away
+            self.lease = None
+        if self.journal is None:
+            return
+        self.save_progress_file()  # once per session
+        self.journal.close()  # compaction
+        self.journal = None
         
     def setup_ui(self):
         # 1. Top Frame (Status & Buttons)
@@ -137,7 +197,9 @@ class DropTool:
         if not directory:
             return
             
+        self.close_journal()
         self.base_dir = directory
+        self.prefetcher.clear()
         
         # Setup Output Dirs
         self.save_dir = directory + "_save"
@@ -151,24 +213,65 @@ class DropTool:
                     messagebox.showerror("Error", f"Failed to create dir: {d}\n{e}")
                     return
         
-        # Load Images
-        search_pattern = os.path.join(directory, "**", "*.jpg")
-        all_jpgs = glob.glob(search_pattern, recursive=True)
-        self.image_list = sorted(all_jpgs)
+        # Load Images, streamed in final (sorted) order while the scan runs
+        # (cached manifest: only changed folders are listed again)
+        if self.scan is not None:
+            self.scan.cancel()
+        self.scan = StreamingScan(directory)
+        self.image_list = self.scan.items
+        self.scan.watch(self.root, self.update_status)
+        
+        progress_path = os.path.join(self.save_dir, "progress_drop.json")
+        try:
+            if LEASE_MODE:
+                # own journal per annotator
+                self.lease = LeaseManager(directory)
+                self.journal = ActionJournal(self.lease.journal_path(progress_path))
+            else:
+                self.journal = ActionJournal(journal_path_for(progress_path))
+        except OSError as e:
+            print(f"Failed to open journal: {e}")
         
+        self.current_index = 0
+        self.count_save = 0
+        self.count_drop = 0
+        self.tk_image = None
+        self.canvas.delete("all")
+        self.lbl_status.config(text="Scanning...")
+        
+        # Start as soon as the first image is found
+        self.scan.when_available(self.root, 1, lambda d=directory: self._start_session(d))
+        
+        self.root.focus_set()
+
+    def _start_session(self, directory):
         if not self.image_list:
             messagebox.showerror("Error", f"No .jpg files found in: {directory}")
             return
-            
-        # Resume Logic
-        self.resume_progress()
-        self.load_image()
         
-        self.root.focus_set()
+        if self.lease is not None:
+            # Everyone must see the same sorted list before chunks are handed out
+            self.lbl_status.config(text="Scanning... (lease mode: waiting for the full list)")
+            self.scan.when_available(self.root, None, self._start_leased)
+            return
+        
+        # Resume Logic (waits only until the saved position has been scanned)
+        last_idx, c_save, c_drop, entry = self.load_progress()
+        if entry is not None:
+            when_resume_position(self.scan, self.root, entry,
+                                 lambda idx: self.resume_progress(idx, c_save, c_drop))
+        else:
+            self.scan.when_available(self.root, last_idx + 1,
+                                     lambda: self.resume_progress(last_idx, c_save, c_drop))
 
     def load_progress(self):
-        # We also need counts now
-        if not self.save_dir: return 0, 0, 0
+        # (last_index, count_save, count_drop, journal entry or None)
+        if not self.save_dir: return 0, 0, 0, None
+        last = self.journal.last() if self.journal is not None else None
+        if last is not None:
+            counts = last["counts"]
+            return last["next"], counts.get("save", 0), counts.get("drop", 0), last
+        # progress_drop.json from before the journal
         json_path = os.path.join(self.save_dir, "progress_drop.json")
         if os.path.exists(json_path):
             try:
@@ -177,15 +280,37 @@ class DropTool:
                     return (
                         data.get("last_index", 0),
                         data.get("count_save", 0),
-                        data.get("count_drop", 0)
+                        data.get("count_drop", 0),
+                        None
                     )
             except:
                 pass
-        return 0, 0, 0
+        return 0, 0, 0, None
 
-    def resume_progress(self):
-        last_idx, c_save, c_drop = self.load_progress()
-        
+    def _start_leased(self):
+        # No prompt: the journal and the lease files already say where to continue
+        # plan.json: the list of whoever started first, so chunk indices match for everyone
+        self.image_list = self.lease.load_plan(self.scan.items)
+        last = self.journal.last() if self.journal is not None else None
+        prefer = None
+        if last is not None:
+            prefer = resume_position(last, self.image_list)
+            self.count_save = last["counts"].get("save", 0)
+            self.count_drop = last["counts"].get("drop", 0)
+        idx = self.lease.start(len(self.image_list), prefer)
+        self.current_index = len(self.image_list) if idx is None else idx
+        print(f"[DEBUG] Lease ({self.lease.owner}): starting at {self.current_index}")
+        self.lease.heartbeat(self.root)
+        self.load_image()
+
+    def _next_index(self):
+        # Lease mode: next in the chunk, or the start of a newly claimed one
+        if self.lease is None:
+            return self.current_index + 1
+        nxt = self.lease.advance(self.current_index)
+        return len(self.image_list) if nxt is None else nxt
+
+    def resume_progress(self, last_idx, c_save, c_drop):
         self.count_save = 0
         self.count_drop = 0
         
@@ -197,14 +322,20 @@ class DropTool:
                     self.current_index = last_idx
                     self.count_save = c_save
                     self.count_drop = c_drop
+                    if self.journal is not None and self.journal.last() is None:
+                        self.journal.record("BASE", last_idx, last_idx, counts=self._counts())
                 else:
                     self.current_index = 0
             else:
                 self.current_index = 0
+                if self.journal is not None:
+                    self.journal.reset()
         else:
             self.current_index = 0
+        self.load_image()
             
     def save_progress_file(self):
+        # Session close only; decisions go to the journal
         if not self.save_dir: return
         data = {
             "last_index": self.current_index,
@@ -219,7 +350,7 @@ class DropTool:
         except Exception as e:
             print(f"Failed to auto-save progress: {e}")
 
-    def load_image(self):
+    def update_status(self):
         # Status Bar with Stats
         current_file = ""
         if 0 <= self.current_index < len(self.image_list):
@@ -227,8 +358,23 @@ class DropTool:
             
         status_text = f"[{self.current_index+1}/{len(self.image_list)}] {current_file}"
         status_text += f" | Save: {self.count_save} | Drop: {self.count_drop}"
+        if self.scan is not None and not self.scan.done:
+            status_text += f" | {self.scan.status_text()}"
+        if self.lease is not None:
+            status_text += f" | {self.lease.status_text()}"
         
         self.lbl_status.config(text=status_text)
+
+    @PERF.timed("load_image")
+    def load_image(self):
+        self.update_status()
+        
+        # Not scanned this far yet -> show it when it arrives
+        if self.current_index >= len(self.image_list) and self.scan is not None and not self.scan.done:
+            self.tk_image = None
+            self.canvas.delete("all")
+            self.scan.when_available(self.root, self.current_index + 1, self.load_image)
+            return
         
         if self.current_index >= len(self.image_list):
             self.tk_image = None
@@ -240,39 +386,23 @@ class DropTool:
         img_path = self.image_list[self.current_index]
         
         try:
-            pil_img = Image.open(img_path)
-            self.raw_pil_image = pil_img # Keep original for COPY
-            
-            # --- Auto-Resize Logic ---
-            screen_w = self.root.winfo_screenwidth()
-            screen_h = self.root.winfo_screenheight()
-            
-            target_w = screen_w * 0.9
-            target_h = screen_h * 0.9
+            # Decoded + resized on a worker thread (ready already if prefetched)
+            # (draft preview first if not prefetched yet; full quality swapped in when idle)
+            frame, refine = self.prefetcher.get_progressive(img_path)
+            self.scale_factor = frame.scale_factor
+            self.current_overlays = frame.overlays or []
+            new_w, new_h = frame.size
+            with PERF.stage("photoimage"):
+                self.tk_image = ImageTk.PhotoImage(frame.image)
             
-            img_w, img_h = pil_img.size
-            self.scale_factor = 1.0
-            
-            # Use min scale to fit BOTH width and height if needed
-            scale_w = target_w / img_w
-            scale_h = target_h / img_h
-            
-            # If image is bigger than target in either dim, scale down
-            if scale_w < 1.0 or scale_h < 1.0:
-                self.scale_factor = min(scale_w, scale_h)
-                
-            new_w = int(img_w * self.scale_factor)
-            new_h = int(img_h * self.scale_factor)
-            
-            # Create RESIZED image for display
-            # Compatibility for older Pillow versions
-            resample_method = Image.Resampling.BICUBIC if hasattr(Image, "Resampling") else Image.BICUBIC
-            display_img = pil_img.resize((new_w, new_h), resample_method)
-            self.tk_image = ImageTk.PhotoImage(display_img)
+            # Warm up the next images (and the previous one for Undo)
+            self.prefetcher.schedule(self.image_list, self.current_index)
             
             self.canvas.delete("all")
             self.canvas.config(scrollregion=(0, 0, new_w, new_h))
-            self.canvas.create_image(0, 0, image=self.tk_image, anchor=tk.NW)
+            self.image_item = self.canvas.create_image(0, 0, image=self.tk_image, anchor=tk.NW)
+            if refine is not None:
+                when_ready(self.root, refine, lambda fut, p=img_path: self._refine_image(p, fut))
             
             # Visualize Labels with Scale
             self.load_existing_labels()
@@ -280,77 +410,61 @@ class DropTool:
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load image: {e}")
 
+    def _refine_image(self, img_path, refine):
+        """
+        Swap the draft preview for the full-quality render (same size, same scale_factor).
+        Ignored if the user already moved to another image.
+        """
+        if self.current_index >= len(self.image_list) or self.image_list[self.current_index] != img_path:
+            return
+        try:
+            frame = refine.result()
+        except Exception:
+            return
+        self.tk_image = ImageTk.PhotoImage(frame.image)
+        self.canvas.itemconfig(self.image_item, image=self.tk_image)
+        # The draft has no overlays (parsed on the worker): draw them with the full frame
+        self.current_overlays = frame.overlays or []
+        self.load_existing_labels()
+
+    def _load_overlays(self, img_path):
+        """
+        Parse the corresponding JSON file once (runs on a prefetch worker).
+        The shapes are cached with the frame, so Back doesn't re-read the JSON.
+        """
+        return parse_labeling_info(read_label_json(sidecar_json_path(img_path)))
+
+    @PERF.timed("draw_overlays")
     def load_existing_labels(self):
         """
-        Load and visualize existing labels from the corresponding JSON file.
+        Visualize existing labels parsed from the corresponding JSON file.
         Apply self.scale_factor to all coordinates.
         - Box: Red outline
         - Polygon: Blue outline
         """
         if not self.tk_image: return
         
-        current_img_path = self.image_list[self.current_index]
-        basename = os.path.basename(current_img_path)
-        base_name_no_ext = os.path.splitext(basename)[0]
-        json_path = os.path.join(os.path.dirname(current_img_path), base_name_no_ext + ".json")
+        factor = self.scale_factor
         
-        if not os.path.exists(json_path):
-            return
-
-        try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+        for kind, coords, _ in self.current_overlays:
+            # 1. Box
+            if kind == "box":
+                x, y, w, h = coords
                 
-            labeling_info = data.get("labelingInfo", [])
-            
-            factor = self.scale_factor
-            
-            for item in labeling_info:
-                # 1. Box
-                if "box" in item:
-                    box_data = item["box"]
-                    loc_list = box_data.get("location", [])
-                    # location could be a list of dicts
-                    for loc in loc_list:
-                        # Original Coords
-                        x = loc.get("x", 0)
-                        y = loc.get("y", 0)
-                        w = loc.get("width", 0)
-                        h = loc.get("height", 0)
-                        
-                        # Scaled Coords
-                        sx = x * factor
-                        sy = y * factor
-                        sw = w * factor
-                        sh = h * factor
-                        
-                        self.canvas.create_rectangle(sx, sy, sx+sw, sy+sh, outline=BOX_COLOR_RED, width=BOX_WIDTH, tags="existing_label")
-                        
-                # 2. Polygon
-                if "polygon" in item:
-                    poly_data = item["polygon"]
-                    loc_list = poly_data.get("location", [])
-                    for loc in loc_list:
-                        # loc is like {"x1": 100, "y1": 100, ...}
-                        # We need to flatten and scale
-                        coords = []
-                        i = 1
-                        while True:
-                            kx = f"x{i}"
-                            ky = f"y{i}"
-                            if kx in loc and ky in loc:
-                                coords.append(loc[kx] * factor)
-                                coords.append(loc[ky] * factor)
-                                i += 1
-                            else:
-                                break
-                        
-                        if coords:
-                            self.canvas.create_polygon(coords, outline=BOX_COLOR_BLUE, width=BOX_WIDTH, fill="", tags="existing_label")
-                            
-        except Exception as e:
-            print(f"Failed to load existing labels for {basename}: {e}")
+                # Scaled Coords for Visual
+                sx = x * factor
+                sy = y * factor
+                sw = w * factor
+                sh = h * factor
+                
+                self.canvas.create_rectangle(sx, sy, sx+sw, sy+sh, outline=BOX_COLOR_RED, width=BOX_WIDTH, tags="existing_label")
+                
+            # 2. Polygon
+            elif kind == "polygon":
+                scaled = display_polygon(coords, factor)
+                self.canvas.create_polygon(scaled, outline=BOX_COLOR_BLUE, width=BOX_WIDTH, fill="", tags="existing_label")
 
+    @PERF.timed("copy_files")
     def copy_files(self, target_dir):
         if self.current_index >= len(self.image_list): return False, []
         
@@ -361,87 +475,94 @@ class DropTool:
         
         created_files = []
         try:
-            # Copy Image
+            # Copy Image (link/clone when the target supports it)
             dst_img = os.path.join(target_dir, basename)
-            shutil.copy2(img_path, dst_img)
             created_files.append(dst_img)
             
             # Copy JSON if exists
+            dst_json = None
             if os.path.exists(json_path):
                 dst_json = os.path.join(target_dir, base_name_no_ext + ".json")
-                shutil.copy2(json_path, dst_json)
                 created_files.append(dst_json)
-                
+            
+            # Done in the background; blocks only if the write queue is full
+            self.writer.submit(self._place_pair, img_path, dst_img, json_path, dst_json,
+                               outputs=created_files, label=basename)
             return True, created_files
         except Exception as e:
             messagebox.showerror("Error", f"Failed to copy files: {e}")
             return False, []
 
+    def _place_pair(self, img_path, dst_img, json_path, dst_json):
+        self.materializer.place(img_path, dst_img)
+        if dst_json:
+            # JSON may be edited later -> never share the inode with the source
+            self.materializer.place(json_path, dst_json, cow_only=True)
+
     def save_current(self):
         if not self.save_dir: return
         success, copied_files = self.copy_files(self.save_dir)
         if success:
-            # 1. History Stack
-            self.history_stack.append({
-                "action": "SAVE",
-                "index": self.current_index,
-                "files": copied_files
-            })
-            
             print(f"SAVED: {os.path.basename(self.image_list[self.current_index])}")
-            self.current_index += 1
+            index = self.current_index
+            self.current_index = self._next_index()
             self.count_save += 1
             print(f"DEBUG: Save Count incremented to {self.count_save}")
-            self.save_progress_file()
+            self._log("SAVE", index, copied_files)
             self.load_image()
 
     def drop_current(self):
         if not self.drop_dir: return
         success, copied_files = self.copy_files(self.drop_dir)
         if success:
-            # 1. History Stack
-            self.history_stack.append({
-                "action": "DROP",
-                "index": self.current_index,
-                "files": copied_files
-            })
-            
             print(f"DROPPED: {os.path.basename(self.image_list[self.current_index])}")
-            self.current_index += 1
+            index = self.current_index
+            self.current_index = self._next_index()
             self.count_drop += 1
             print(f"DEBUG: Drop Count incremented to {self.count_drop}")
-            self.save_progress_file()
+            self._log("DROP", index, copied_files)
             self.load_image()
 
+    def _counts(self):
+        return {"save": self.count_save, "drop": self.count_drop}
+
+    def _log(self, action, index, files):
+        # Called after current_index was advanced (past `index`)
+        if self.journal is None:
+            return
+        try:
+            self.journal.record(action, index, self.current_index, src=self.image_list[index],
+                                outputs=files, counts=self._counts())
+        except Exception as e:
+            print(f"Failed to write journal: {e}")
+
     def undo(self):
-        if not self.history_stack:
+        if self.journal is None or not self.journal.can_undo():
             messagebox.showinfo("Undo", "No history to undo.")
             return
+        if self.lease is not None and not self.lease.seek(self.journal.last()["index"]):
+            messagebox.showinfo("Undo", "That image's chunk has been taken over by another annotator.")
+            return
 
         # Pop last action
-        last_action = self.history_stack.pop()
-        action_type = last_action["action"]
+        last_action = self.journal.undo()
         prev_index = last_action["index"]
-        files_to_remove = last_action["files"]
+        files_to_remove = last_action["outputs"]
         
-        # 1. Remove files
-        for fpath in files_to_remove:
-            if os.path.exists(fpath):
-                try:
-                    os.remove(fpath)
-                    print(f"Undo deleted: {fpath}")
-                except Exception as e:
-                    print(f"Undo failed to delete {fpath}: {e}")
+        # 1. Remove files (cancels the copy if it is still queued)
+        try:
+            for fpath in self.writer.revert(files_to_remove):
+                print(f"Undo deleted: {fpath}")
+        except Exception as e:
+            print(f"Undo failed to delete: {e}")
 
-        # 2. Revert Stats
-        if action_type == "SAVE":
-            self.count_save = max(0, self.count_save - 1)
-        elif action_type == "DROP":
-            self.count_drop = max(0, self.count_drop - 1)
+        # 2. Revert Stats (as of the action before)
+        counts = self.journal.counts()
+        self.count_save = counts.get("save", 0)
+        self.count_drop = counts.get("drop", 0)
             
         # 3. Revert Index & Reload
         self.current_index = prev_index
-        self.save_progress_file()
         self.load_image()
 
 
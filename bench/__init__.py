@@ -0,0 +1,5 @@
+"""
+Headless benchmarks for the labeling tools (no display needed).
+
+    python -m bench --count 500 --out bench_report.json
+"""
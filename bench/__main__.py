@@ -0,0 +1,233 @@
+"""
+Times the hot paths of the labeling tools on a synthetic dataset and writes a JSON report.
+
+    python -m bench                                   # 500 images, 1920x1080, temp folder
+    python -m bench --count 5000 --vertices 32 --out reports/$(git rev-parse --short HEAD).json
+    python -m bench --data /tmp/bench_data --keep     # reuse/keep the generated dataset
+
+"cold" = no cache files on disk yet (the OS page cache is not dropped).
+"""
+import argparse
+import glob
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from bench.dataset import generate_dataset, ORIGINAL_DIR, A7_DIR
+from common.a7_transform import transform_json_data
+from common.crop import save_crop
+from common.dir_manifest import RACY_MTIME_WINDOW, cache_path_for
+from common.geometry import display_polygon
+from common.json_cache import JsonCache
+from common.lesion_mask import suggest_patches
+from common.materialize import OutputMaterializer
+from common.original_index import OriginalIndex, INDEX_FILE, extract_id
+from common.overlays import parse_labeling_info, read_label_json, sidecar_json_path
+from common.prefetch import load_display_frame, load_draft_frame
+from common.pyramid import ImagePyramid
+from common.scan_manifest import SCAN_FILE, scan_images
+
+# Display box used by the tools on a 1920x1080 screen (screen * 0.9)
+DISPLAY_W, DISPLAY_H = 1728, 972
+
+
+def load_relabel_module():
+    # "Re-Label/" is not an importable package name
+    path = os.path.join(ROOT_DIR, "Re-Label", "relabel_tool.py")
+    spec = importlib.util.spec_from_file_location("relabel_tool", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Bench:
+    def __init__(self):
+        self.results = {}
+
+    def measure(self, name, items, fn):
+        """fn(item) for every item; per-item timings summarized under `name`."""
+        times = []
+        start = time.perf_counter()
+        for item in items:
+            t = time.perf_counter()
+            fn(item)
+            times.append(time.perf_counter() - t)
+        total = time.perf_counter() - start
+        self._record(name, times, total)
+
+    def measure_once(self, name, fn, n_items):
+        """A whole-batch operation (e.g. a directory scan) over n_items."""
+        start = time.perf_counter()
+        fn()
+        total = time.perf_counter() - start
+        self.results[name] = {
+            "n": n_items,
+            "total_s": round(total, 6),
+            "per_item_ms": round(total / n_items * 1000, 6) if n_items else None,
+            "items_per_s": round(n_items / total, 1) if total > 0 else None,
+        }
+        print(f"  {name:<30} n={n_items:<7} total={total * 1000:9.1f}ms")
+
+    def _record(self, name, times, total):
+        if not times:
+            return
+        ordered = sorted(times)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        self.results[name] = {
+            "n": len(times),
+            "total_s": round(total, 6),
+            "per_item_ms": round(statistics.fmean(times) * 1000, 6),
+            "p50_ms": round(statistics.median(times) * 1000, 6),
+            "p95_ms": round(p95 * 1000, 6),
+            "items_per_s": round(len(times) / total, 1) if total > 0 else None,
+        }
+        r = self.results[name]
+        print(f"  {name:<30} n={r['n']:<7} mean={r['per_item_ms']:8.3f}ms "
+              f"p50={r['p50_ms']:8.3f}ms p95={r['p95_ms']:8.3f}ms")
+
+
+def zoom_viewport(pyramid, zoom=1.0, tile=256):
+    # What the label tool's viewer renders on the first zoom step: the tiles of one screen
+    for ty in range(0, DISPLAY_H, tile):
+        for tx in range(0, DISPLAY_W, tile):
+            pyramid.render(zoom, (tx, ty, tx + tile, ty + tile))
+
+
+def remove_if_exists(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def run(args, orig_root, a7_root, bench):
+    jpgs = sorted(glob.glob(os.path.join(orig_root, "**", "*.jpg"), recursive=True))
+    jsons = [sidecar_json_path(p) for p in jpgs]
+    a7_jpgs = sorted(glob.glob(os.path.join(a7_root, "*.jpg")))
+    sample = jpgs[:args.decode_count]
+
+    print("[scan]")
+    bench.measure_once("scan_glob_sorted", lambda: sorted(glob.glob(os.path.join(orig_root, "**", "*.jpg"),
+                                                                     recursive=True)), len(jpgs))
+    remove_if_exists(cache_path_for(orig_root, SCAN_FILE))
+    bench.measure_once("scan_manifest_cold", lambda: scan_images(orig_root), len(jpgs))
+    bench.measure_once("scan_manifest_warm", lambda: scan_images(orig_root), len(jpgs))
+    bench.measure_once("scan_pairs_warm", lambda: scan_images(orig_root, require_json=True), len(jpgs))
+
+    print("[find_original]")
+    remove_if_exists(cache_path_for(orig_root, INDEX_FILE))
+    bench.measure_once("original_index_cold", lambda: OriginalIndex(orig_root).build(), len(jsons))
+    index = OriginalIndex(orig_root)
+    bench.measure_once("original_index_warm", index.build, len(jsons))
+    bench.measure("find_original", a7_jpgs, lambda p: index.find(extract_id(p)))
+
+    print("[decode]")
+    bench.measure("decode_resize_lanczos", sample, lambda p: load_display_frame(p, DISPLAY_W, DISPLAY_H))
+    bench.measure("decode_draft", sample, lambda p: load_draft_frame(p, DISPLAY_W, DISPLAY_H))
+    bench.measure("zoom_viewport_tiles", sample, lambda p: zoom_viewport(ImagePyramid(p)))
+
+    print("[overlays]")
+    bench.measure("overlay_read_parse", jsons, lambda p: parse_labeling_info(read_label_json(p)))
+    cache = JsonCache(max_entries=len(jsons) + 1)
+    for p in jsons:
+        cache.get(p)
+    bench.measure("overlay_parse_cached", jsons, lambda p: parse_labeling_info(cache.get(p)))
+    shapes = [parse_labeling_info(cache.get(p)) for p in jsons]
+    scale = min(DISPLAY_W / args.width, DISPLAY_H / args.height, 1.0)
+    bench.measure("overlay_display_polygons", shapes,
+                  lambda s: [display_polygon(c, scale) for kind, c, _ in s if kind == "polygon"])
+    bench.measure("suggest_patches", shapes, lambda s: suggest_patches(s, args.width, args.height))
+
+    print("[transforms]")
+    docs = [(p, cache.get(p)) for p in jsons]
+    bench.measure("transform_json_data", docs, lambda d: transform_json_data(d[1], 100, 100))
+    relabel = load_relabel_module()
+    bench.measure("update_json_smart", docs,
+                  lambda d: relabel.RelabelTool.update_json_smart(None, d[1], "A1", [100, 100, 224, 224], d[0]))
+    bench.measure("json_dump_indent2", docs,
+                  lambda d: json.dumps(transform_json_data(d[1], 100, 100), ensure_ascii=False, indent=2))
+
+    print("[output]")
+    out_dir = os.path.join(os.path.dirname(orig_root), "_bench_out")
+    for strategy in args.strategies:
+        shutil.rmtree(out_dir, ignore_errors=True)
+        os.makedirs(out_dir)
+        materializer = OutputMaterializer(strategy)
+        bench.measure(f"output_{strategy}", sample,
+                      lambda p: materializer.place(p, os.path.join(out_dir, os.path.basename(p))))
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+    bench.measure("output_crop", sample,
+                  lambda p: save_crop(p, os.path.join(out_dir, os.path.basename(p)), 100, 100, 224, 224))
+    shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Benchmark the labeling tools' hot paths.")
+    parser.add_argument("--count", type=int, default=500, help="original image/JSON pairs to generate")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--vertices", type=int, default=8, help="polygon vertices per lesion")
+    parser.add_argument("--shapes", type=int, default=1, help="polygon+box pairs per JSON")
+    parser.add_argument("--decode-count", type=int, default=100, help="images used for decode/output timings")
+    parser.add_argument("--strategies", nargs="+", default=["copy", "auto"], help="output strategies to time")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data", default=None, help="dataset folder (generated if missing)")
+    parser.add_argument("--keep", action="store_true", help="keep the generated dataset")
+    parser.add_argument("--out", default="bench_report.json", help="JSON report path")
+    args = parser.parse_args(argv)
+
+    root = args.data or tempfile.mkdtemp(prefix="labeling_bench_")
+    orig_root = os.path.join(root, ORIGINAL_DIR)
+    a7_root = os.path.join(root, A7_DIR)
+    generated = False
+    if not os.path.isdir(orig_root):
+        print(f"Generating {args.count} images ({args.width}x{args.height}, {args.vertices} vertices) in {root}")
+        start = time.perf_counter()
+        generate_dataset(root, args.count, args.width, args.height, args.vertices, args.shapes, seed=args.seed)
+        print(f"  done in {time.perf_counter() - start:.1f}s")
+        generated = True
+        # Let directory mtimes age past the racy window, so "warm" really is warm
+        time.sleep(RACY_MTIME_WINDOW)
+
+    bench = Bench()
+    try:
+        run(args, orig_root, a7_root, bench)
+    finally:
+        if generated and not args.keep and not args.data:
+            shutil.rmtree(root, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("out",)},
+        "results": bench.results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Report: {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Synthetic dataset in the real layout:
+
+    <root>/변환 전/<A{n}_name>/IMG_D_A{n}_{id}.jpg + .json   (originals, A1~A6)
+    <root>/변환 후/IMG_D_A7_{id}.jpg + .json                 (A7 outputs, for the verify lookup)
+"""
+import json
+import math
+import os
+import random
+
+from PIL import Image, ImageDraw
+
+LESION_NAMES = {
+    "A1": "A1_구진_플라크",
+    "A2": "A2_비듬_각질_상피성잔고리",
+    "A3": "A3_태선화_과다색소침착",
+    "A4": "A4_농포_여드름",
+    "A5": "A5_미란_궤양",
+    "A6": "A6_결절_종괴",
+}
+
+ORIGINAL_DIR = "변환 전"
+A7_DIR = "변환 후"
+
+
+def _polygon(rng, width, height, vertices):
+    # Star-ish polygon around a random center, like a traced lesion outline
+    cx = rng.uniform(width * 0.2, width * 0.8)
+    cy = rng.uniform(height * 0.2, height * 0.8)
+    radius = rng.uniform(min(width, height) * 0.05, min(width, height) * 0.2)
+    loc = {}
+    for i in range(vertices):
+        angle = 2 * math.pi * i / vertices
+        r = radius * rng.uniform(0.6, 1.0)
+        loc[f"x{i + 1}"] = int(cx + r * math.cos(angle))
+        loc[f"y{i + 1}"] = int(cy + r * math.sin(angle))
+    return loc
+
+
+def make_label_json(code, file_id, rng, width, height, vertices, shapes):
+    name = LESION_NAMES[code]
+    path = f"/라벨링데이터/반려견/피부/일반카메라/유증상/{name}"
+    labeling = []
+    for _ in range(shapes):
+        loc = _polygon(rng, width, height, vertices)
+        xs = [v for k, v in loc.items() if k.startswith("x")]
+        ys = [v for k, v in loc.items() if k.startswith("y")]
+        labeling.append({"polygon": {"location": [loc], "label": name, "color": "#00ff00", "type": "polygon"}})
+        labeling.append({"box": {"location": [{"x": min(xs), "y": min(ys),
+                                               "width": max(xs) - min(xs), "height": max(ys) - min(ys)}],
+                                 "label": name, "color": "#00ff00"}})
+    return {
+        "metaData": {
+            "Raw data ID": f"IMG_D_{code}_{file_id}.jpg",
+            "resolution": f"{width}X{height}",
+            "camera type": "IMG",
+            "species": "D",
+            "lesions": code,
+            "diagnosis": "",
+            "Path": "유증상",
+            "src_path": path,
+            "label_path": path,
+            "type": "json",
+            "fileformat": "jpg",
+        },
+        "inspRejectYn": "N",
+        "labelingInfo": labeling,
+    }
+
+
+def make_image(rng, width, height):
+    # Noise + a few blobs: compresses like a photo rather than a flat color
+    img = Image.merge("RGB", [Image.effect_noise((width, height), rng.uniform(20, 60)) for _ in range(3)])
+    draw = ImageDraw.Draw(img)
+    for _ in range(6):
+        x, y = rng.uniform(0, width), rng.uniform(0, height)
+        r = rng.uniform(20, min(width, height) / 4)
+        draw.ellipse((x - r, y - r, x + r, y + r),
+                     fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    return img
+
+
+def generate_dataset(root, count=500, width=1920, height=1080, vertices=8, shapes=1,
+                     a7_fraction=0.5, seed=0, quality=90, variants=8):
+    """
+    Write `count` original image/JSON pairs (+ A7 outputs for a7_fraction of them).
+    Only `variants` distinct JPEGs are encoded and their bytes reused, so generation
+    stays fast; every JSON is distinct. Returns (originals_root, a7_root).
+    """
+    rng = random.Random(seed)
+    orig_root = os.path.join(root, ORIGINAL_DIR)
+    a7_root = os.path.join(root, A7_DIR)
+    os.makedirs(a7_root, exist_ok=True)
+
+    templates = []
+    template_path = os.path.join(root, ".template.jpg")
+    for _ in range(max(1, variants)):
+        make_image(rng, width, height).save(template_path, quality=quality)
+        with open(template_path, 'rb') as f:
+            templates.append(f.read())
+    os.remove(template_path)
+
+    ids = rng.sample(range(100000, 1000000), count)
+    for n, file_id in enumerate(ids):
+        code = f"A{rng.randint(1, 6)}"
+        folder = os.path.join(orig_root, LESION_NAMES[code])
+        os.makedirs(folder, exist_ok=True)
+        base = f"IMG_D_{code}_{file_id}"
+        jpeg_bytes = templates[n % len(templates)]
+        with open(os.path.join(folder, base + ".jpg"), 'wb') as f:
+            f.write(jpeg_bytes)
+        data = make_label_json(code, file_id, rng, width, height, vertices, shapes)
+        with open(os.path.join(folder, base + ".json"), 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+        if rng.random() < a7_fraction:
+            a7_base = f"IMG_D_A7_{file_id}"
+            with open(os.path.join(a7_root, a7_base + ".jpg"), 'wb') as f:
+                f.write(jpeg_bytes)
+            with open(os.path.join(a7_root, a7_base + ".json"), 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+
+    return orig_root, a7_root
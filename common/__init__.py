@@ -0,0 +1,6 @@
+"""
+Shared helpers for the labeling tools (A7, Re-Label, Save Or Drop).
+
+Each tool is still launched as a plain script; they put the repository root on
+sys.path and import from here.
+"""
@@ -0,0 +1,170 @@
+"""
+A7 (정상) conversion rules shared by the labeling GUI and the headless batch tools.
+Pure functions only: no Tk, no file I/O.
+"""
+import re
+
+BOX_COLOR = "#27b73c" # 건들지 마세요
+
+def clamp_coordinates(x, y, img_w, img_h, box_w=224, box_h=224):
+    """
+    Ensure the box defined by top-left (x, y) stays within image bounds.
+    """
+    if img_w < box_w:
+        final_x = 0
+    else:
+        final_x = max(0, min(x, img_w - box_w))
+        
+    if img_h < box_h:
+        final_y = 0
+    else:
+        final_y = max(0, min(y, img_h - box_h))
+        
+    return final_x, final_y
+
+def transform_json_data(original_data, top_left_x, top_left_y, box_w=224, box_h=224):
+    """
+    A7 document for a box at (top_left_x, top_left_y). Copy-on-write: only the top level
+    and metaData are copied, everything else is shared with original_data (which is
+    left untouched, so it can come straight from a JsonCache).
+    """
+    new_data = dict(original_data)
+    
+    # Text Substitution Helper
+    def replace_text_strict_path(text):
+        if not isinstance(text, str): return text
+        text = text.replace("유증상", "무증상")
+        # Regex: A[1-6]_[^/]+ -> A7_정상
+        text = re.sub(r'A[1-6]_[^/]+', 'A7_정상', text)
+        return text
+        
+    def replace_text_filename(text):
+        if not isinstance(text, str): return text
+        text = re.sub(r'A[1-6]', 'A7', text)
+        return text
+
+    # Metadata Transformation
+    meta = dict(new_data.get("metaData", {}))
+    if "metaData" in new_data:
+        new_data["metaData"] = meta
+    
+    if "Raw data ID" in meta:
+        meta["Raw data ID"] = replace_text_filename(meta["Raw data ID"])
+        
+    meta["lesions"] = "A7"
+    meta["Path"] = "무증상"
+    meta["diagnosis"] = "정상" # Strict Rule
+    
+    if "src_path" in meta:
+        meta["src_path"] = replace_text_strict_path(meta["src_path"])
+    if "label_path" in meta:
+        meta["label_path"] = replace_text_strict_path(meta["label_path"])
+        
+    # Labeling Info
+    new_data["labelingInfo"] = a7_labeling_info(top_left_x, top_left_y, box_w, box_h)
+    new_data["inspRejectYn"] = "N"
+    
+    return new_data
+
+
+def a7_labeling_info(top_left_x, top_left_y, box_w=224, box_h=224):
+    """labelingInfo entries (polygon + box) of one A7 box."""
+    x1 = int(top_left_x)
+    y1 = int(top_left_y)
+    x2 = x1 + box_w
+    y2 = y1
+    x3 = x2
+    y3 = y1 + box_h
+    x4 = x1
+    y4 = y3
+    x5 = x1
+    y5 = y1
+    
+    polygon_item = {
+        "polygon": {
+            "color": BOX_COLOR,
+            "location": [
+                {
+                    "x1": x1, "y1": y1,
+                    "x2": x2, "y2": y2,
+                    "x3": x3, "y3": y3,
+                    "x4": x4, "y4": y4,
+                    "x5": x5, "y5": y5
+                }
+            ],
+            "label": "A7_정상",
+            "type": "polygon"
+        }
+    }
+    
+    box_item = {
+        "box": {
+            "color": BOX_COLOR,
+            "location": [
+                {"x": x1, "y": y1, "width": box_w, "height": box_h}
+            ],
+            "label": "A7_정상",
+            "type": "box"
+        }
+    }
+    
+    return [polygon_item, box_item]
+
+
+def transform_json_data_multi(original_data, boxes, box_w=224, box_h=224):
+    """transform_json_data() with one polygon + box pair per (top_left_x, top_left_y) in boxes."""
+    new_data = transform_json_data(original_data, boxes[0][0], boxes[0][1], box_w, box_h)
+    new_data["labelingInfo"] = [item for x, y in boxes for item in a7_labeling_info(x, y, box_w, box_h)]
+    return new_data
+
+
+def make_a7_basename(base_name_no_ext):
+    """
+    Output filename (no extension) for a labeled image: A1~A6 -> A7.
+    예: IMG_D_A6_496645 -> IMG_D_A7_496645 (no A-code at all -> IMG_xxx_A7)
+    """
+    new_base = re.sub(r'A[1-6]', 'A7', base_name_no_ext)
+    if new_base == base_name_no_ext and "A7" not in new_base:
+        new_base += "_A7"
+    return new_base
+
+
+def make_a7_patch_basename(base_name_no_ext, number):
+    """
+    Output filename of the number-th (1, 2, ...) patch taken from one image.
+    예: IMG_D_A6_496645, 2 -> IMG_D_A7_496645_p2 (check.py finds the original by its number)
+    """
+    return f"{make_a7_basename(base_name_no_ext)}_p{number}"
+
+
+# metaData key of a crop output: where the patch was cut from the source image
+CROP_META_KEY = "crop"
+
+def crop_rect(top_left_x, top_left_y, box_w, box_h, img_w, img_h):
+    """(x0, y0, x1, y1) of the patch, cut to the image (smaller images give a smaller patch)."""
+    x0 = int(top_left_x)
+    y0 = int(top_left_y)
+    return x0, y0, min(x0 + box_w, img_w), min(y0 + box_h, img_h)
+
+def crop_json_data(original_data, top_left_x, top_left_y, box_w, box_h, img_w, img_h):
+    """
+    A7 document for a crop output: the box covers the patch from (0, 0), and
+    metaData["crop"] keeps its position in the source image, so source overlays can
+    be shifted onto the patch. Works on an original or an already converted document.
+    """
+    new_data = transform_json_data(original_data, 0, 0, box_w, box_h)
+    x0, y0, x1, y1 = crop_rect(top_left_x, top_left_y, box_w, box_h, img_w, img_h)
+    meta = dict(new_data.get("metaData", {}))
+    meta[CROP_META_KEY] = {"x": x0, "y": y0, "width": x1 - x0, "height": y1 - y0,
+                           "source_width": img_w, "source_height": img_h}
+    new_data["metaData"] = meta
+    return new_data
+
+def crop_info(data):
+    """metaData["crop"] of a crop output, or None for a full-image output."""
+    if not data:
+        return None
+    meta = data.get("metaData")
+    if not isinstance(meta, dict):
+        return None
+    return meta.get(CROP_META_KEY)
@@ -0,0 +1,93 @@
+"""
+Chunked process-pool runner with an append-only checkpoint, for the headless tools.
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+DEFAULT_CHUNK_SIZE = 64
+
+
+class Checkpoint:
+    """
+    Keys of finished items, one JSON line per completed chunk.
+    Re-running with the same checkpoint skips everything already done.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self.done.update(json.loads(line)["done"])
+                    except (ValueError, KeyError):
+                        pass  # torn last line after a crash
+
+    def mark(self, keys):
+        if not keys:
+            return
+        self.done.update(keys)
+        if not self.path:
+            return
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"done": keys}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _run_chunk(fn, chunk):
+    # Runs in the worker process: one failure doesn't sink the chunk
+    results = []
+    for key, payload in chunk:
+        try:
+            results.append((key, True, fn(payload)))
+        except Exception as e:
+            results.append((key, False, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def run_batch(items, fn, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, checkpoint=None, label="items"):
+    """
+    Apply fn(payload) to every (key, payload) in `items` across a process pool.
+
+    - fn must be a picklable top-level function; its return value is only counted
+    - work is sent in chunks of `chunk_size` to amortize process round-trips
+    - finished keys go to `checkpoint` as each chunk completes, so a crash loses
+      at most the chunks in flight
+    Returns (ok, failed, skipped, elapsed_seconds) and prints a throughput summary.
+    """
+    checkpoint = checkpoint or Checkpoint(None)
+    todo = [(k, p) for k, p in items if k not in checkpoint.done]
+    skipped = len(items) - len(todo)
+    if skipped:
+        print(f"Resuming: {skipped} {label} already done (checkpoint)")
+
+    chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+    ok = failed = 0
+    start = time.perf_counter()
+
+    if chunks:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run_chunk, fn, chunk) for chunk in chunks]
+            for fut in as_completed(futures):
+                done_keys = []
+                for key, success, info in fut.result():
+                    if success:
+                        ok += 1
+                        done_keys.append(key)
+                    else:
+                        failed += 1
+                        print(f"[ERROR] {key}: {info}")
+                checkpoint.mark(done_keys)
+
+                elapsed = time.perf_counter() - start
+                rate = (ok + failed) / elapsed if elapsed > 0 else 0.0
+                print(f"  {ok + failed}/{len(todo)} {label} ({rate:.1f}/s)", end="\r", flush=True)
+        print()
+
+    elapsed = time.perf_counter() - start
+    rate = ok / elapsed if elapsed > 0 else 0.0
+    print(f"Done: {ok} ok, {failed} failed, {skipped} skipped in {elapsed:.1f}s ({rate:.1f} {label}/s)")
+    return ok, failed, skipped, elapsed
@@ -0,0 +1,56 @@
+"""
+Crop outputs: only the selected patch of the source JPEG is written, not the whole image.
+"""
+import os
+import threading
+
+from PIL import Image, JpegImagePlugin
+
+from common.a7_transform import crop_rect
+
+# Used when the source is not a JPEG (no tables to reuse)
+CROP_QUALITY = 95
+
+
+def save_crop(src, dst, top_left_x, top_left_y, box_w, box_h):
+    """
+    Cut the box out of `src` into the JPEG `dst`. Returns the source (width, height).
+
+    A JPEG source is re-encoded with its own quantization tables and subsampling, so
+    the patch keeps the quality of the file it came from. EXIF is not carried over
+    (its thumbnail is of the full image). `dst` is replaced through a temporary file:
+    if it was a hardlink to the source, the source is left alone.
+    """
+    return save_crops(src, [(dst, top_left_x, top_left_y)], box_w, box_h)
+
+
+def save_crops(src, patches, box_w, box_h):
+    """save_crop() for several (dst, x, y) boxes of one source, decoded once."""
+    with Image.open(src) as im:
+        size = im.size
+        options = {"quality": CROP_QUALITY}
+        if im.format == "JPEG" and im.mode in ("RGB", "L"):
+            options = {"qtables": im.quantization}
+            sampling = JpegImagePlugin.get_sampling(im)
+            if sampling != -1:
+                options["subsampling"] = sampling
+        if im.info.get("icc_profile"):
+            options["icc_profile"] = im.info["icc_profile"]
+        im.load()
+        for dst, x, y in patches:
+            patch = im.crop(crop_rect(x, y, box_w, box_h, *size))
+            if patch.mode not in ("RGB", "L"):
+                patch = patch.convert("RGB")
+            _save_jpeg(patch, dst, options)
+    return size
+
+
+def _save_jpeg(image, dst, options):
+    tmp = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        image.save(tmp, "JPEG", **options)
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
@@ -0,0 +1,107 @@
+import time
+
+# Max cursor-box redraws per second; extra <Motion> events in between are coalesced
+CURSOR_FPS = 60
+
+
+class CursorBox:
+    """
+    The box-shaped cursor of the labeling tools: one persistent canvas rectangle,
+    centered on the mouse and clamped inside the displayed image.
+
+    - <Motion> only stores the latest position; the rectangle is moved at most
+      CURSOR_FPS times a second (right away if the last move is old enough,
+      otherwise once at the end of the frame with the newest position)
+    - commit(event) returns the box for a click from that click's own position,
+      in ORIGINAL image coordinates, and moves the rectangle there
+    - call reset() after canvas.delete("all") (new image): the item is recreated
+
+    geometry() -> (scale_factor, display_w, display_h) of the shown image, or None.
+    warn(x, y) -> True if the box at that ORIGINAL top-left should be drawn in
+    warn_outline (must be cheap: it runs on every redraw).
+    """
+    def __init__(self, canvas, geometry, box_size=(224, 224), outline="#27b73c", width=2,
+                 fps=CURSOR_FPS, warn=None, warn_outline="#ff3030"):
+        self.canvas = canvas
+        self.geometry = geometry
+        self.box_size = box_size
+        self.outline = outline
+        self.width = width
+        self.warn = warn
+        self.warn_outline = warn_outline
+        self.warning = False  # current colour of the item
+        self.interval = 1.0 / fps
+        self.item = None
+        self._pos = None  # latest (event.x, event.y), widget coordinates
+        self._last_draw = 0.0
+        self._pending = None  # after() id of the end-of-frame redraw
+
+    def bind(self):
+        self.canvas.bind("<Motion>", self._on_motion, add="+")
+        self.canvas.bind("<Leave>", self._on_leave, add="+")
+
+    def reset(self):
+        self.item = self.canvas.create_rectangle(0, 0, 0, 0, outline=self.outline, width=self.width)
+        self.warning = False
+        if self._pos is not None:
+            self._draw()
+
+    def display_box(self, x, y):
+        """Widget position -> clamped (x1, y1, x2, y2) in canvas (display) coordinates, or None."""
+        geom = self.geometry()
+        if geom is None:
+            return None
+        factor, img_w, img_h = geom
+        disp_w = self.box_size[0] * factor
+        disp_h = self.box_size[1] * factor
+        cx = self.canvas.canvasx(x)
+        cy = self.canvas.canvasy(y)
+        tl_x = max(0, min(cx - disp_w / 2, img_w - disp_w))
+        tl_y = max(0, min(cy - disp_h / 2, img_h - disp_h))
+        return tl_x, tl_y, tl_x + disp_w, tl_y + disp_h
+
+    def commit(self, event):
+        """Top-left (x, y) of the box under this click in ORIGINAL image coordinates, or None."""
+        self._pos = (event.x, event.y)
+        box = self._draw()
+        if box is None:
+            return None
+        factor = self.geometry()[0]
+        return box[0] / factor, box[1] / factor
+
+    def _on_motion(self, event):
+        self._pos = (event.x, event.y)
+        if self._pending is not None:
+            return  # a redraw is already due; it will use this position
+        wait = self.interval - (time.perf_counter() - self._last_draw)
+        if wait <= 0:
+            self._draw()
+        else:
+            self._pending = self.canvas.after(max(1, int(wait * 1000)), self._draw)
+
+    def _on_leave(self, event):
+        self._cancel_pending()
+        self._pos = None
+        if self.item is not None:
+            self.canvas.coords(self.item, 0, 0, 0, 0)
+
+    def _cancel_pending(self):
+        if self._pending is not None:
+            self.canvas.after_cancel(self._pending)
+            self._pending = None
+
+    def _draw(self):
+        self._cancel_pending()
+        self._last_draw = time.perf_counter()
+        if self._pos is None:
+            return None
+        box = self.display_box(*self._pos)
+        if box is not None and self.item is not None:
+            self.canvas.coords(self.item, *box)
+            if self.warn is not None:
+                factor = self.geometry()[0]
+                warning = bool(self.warn(box[0] / factor, box[1] / factor))
+                if warning != self.warning:  # itemconfig only when the colour changes
+                    self.warning = warning
+                    self.canvas.itemconfig(self.item, outline=self.warn_outline if warning else self.outline)
+        return box
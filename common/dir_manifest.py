@@ -0,0 +1,200 @@
+import hashlib
+import heapq
+import json
+import os
+import time
+
+# Directory mtimes this close to the scan time are not trusted on the next refresh:
+# an entry added within the same timestamp tick would otherwise go unnoticed.
+RACY_MTIME_WINDOW = 2.0
+
+CACHE_HOME = os.path.join(os.path.expanduser("~"), ".cache", "labeling")
+
+
+def cache_path_for(root, filename):
+    """
+    Where to keep a cache file for `root`: next to the data if the folder is writable,
+    otherwise under ~/.cache/labeling (keyed by a hash of the root path).
+    """
+    if os.access(root, os.W_OK):
+        return os.path.join(root, filename)
+    digest = hashlib.sha1(os.path.abspath(root).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(CACHE_HOME, f"{digest}_{filename}")
+
+
+class DirectoryManifest:
+    """
+    Cached listing of a directory tree.
+
+    Each directory is stored with its mtime, its subdirectories and the files whose
+    suffix matches. On refresh() only directories whose mtime changed are listed again;
+    unchanged ones cost a single stat().
+
+        manifest = DirectoryManifest(root, suffixes=(".json",))
+        manifest.load(path)
+        manifest.refresh()
+        manifest.save(path)
+    """
+    VERSION = 2
+
+    def __init__(self, root, suffixes=(".jpg", ".json"), recursive=True):
+        self.root = root
+        self.suffixes = tuple(s.lower() for s in suffixes)
+        self.recursive = recursive
+        self.dirs = {}  # rel_dir ("" = root) -> {"mtime_ns": int|None, "dirs": [...], "files": [...]}
+        self.changed = []  # rel_dirs rescanned by the last refresh()
+        self.removed = 0
+        self._fresh = {}  # entries visited by the running refresh_iter()
+
+    def load(self, path):
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"[DEBUG] Ignoring unreadable manifest {path}: {e}")
+            return False
+
+        if (data.get("version") != self.VERSION or data.get("root") != os.path.abspath(self.root)
+                or data.get("suffixes") != list(self.suffixes) or data.get("recursive") != self.recursive):
+            return False
+        self.dirs = data.get("dirs", {})
+        return True
+
+    def _to_json(self):
+        return {
+            "version": self.VERSION,
+            "root": os.path.abspath(self.root),
+            "suffixes": list(self.suffixes),
+            "recursive": self.recursive,
+            "dirs": self.dirs,
+        }
+
+    def save(self, path):
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._to_json(), f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, path)
+            self._absorb_own_write(path)
+        except Exception as e:
+            print(f"Failed to save manifest {path}: {e}")
+
+    def _absorb_own_write(self, path):
+        # Writing the manifest inside the tree bumps that directory's mtime.
+        # Record the new mtime so our own write doesn't force a rescan next time.
+        rel = os.path.relpath(os.path.dirname(os.path.abspath(path)), os.path.abspath(self.root))
+        rel = "" if rel == "." else rel
+        entry = self.dirs.get(rel)
+        if entry is not None and entry.get("mtime_ns") is not None:
+            entry["mtime_ns"] = os.stat(os.path.dirname(os.path.abspath(path))).st_mtime_ns
+            # Rewrite in place: changing file contents doesn't touch the directory mtime
+            # (a torn write here only costs a full rescan on the next load)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self._to_json(), f, ensure_ascii=False, separators=(",", ":"))
+
+    def _scan_dir(self, full_path, mtime_ns):
+        subdirs = []
+        files = []
+        with os.scandir(full_path) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue  # hidden files, our own caches, macOS ._ forks (like glob)
+                if entry.is_dir(follow_symlinks=True):
+                    subdirs.append(entry.name)
+                elif entry.name.lower().endswith(self.suffixes):
+                    files.append(entry.name)
+        # Directories sort as "name/" so they merge with files in full-path order
+        subdirs.sort(key=lambda d: d + os.sep)
+        files.sort()
+
+        # Don't trust an mtime from the current tick (see RACY_MTIME_WINDOW)
+        if time.time() - mtime_ns / 1e9 < RACY_MTIME_WINDOW:
+            mtime_ns = None
+        return {"mtime_ns": mtime_ns, "dirs": subdirs, "files": files}
+
+    def _visit(self, rel, new_dirs):
+        # Current entry for one directory: stored one if its mtime is unchanged, else listed again
+        full = os.path.join(self.root, rel) if rel else self.root
+        try:
+            mtime_ns = os.stat(full).st_mtime_ns
+        except OSError:
+            return None
+
+        entry = self.dirs.get(rel)
+        if entry is None or entry.get("mtime_ns") != mtime_ns:
+            try:
+                entry = self._scan_dir(full, mtime_ns)
+            except OSError as e:
+                print(f"[DEBUG] Cannot list {full}: {e}")
+                return None
+            self.changed.append(rel)
+        new_dirs[rel] = entry
+        return entry
+
+    def _sorted_entries(self, entry):
+        if entry is None:
+            return iter(())
+        files = ((name, False) for name in entry["files"])
+        if not self.recursive:
+            return files
+        dirs = ((d + os.sep, True) for d in entry["dirs"])
+        return heapq.merge(files, dirs, key=lambda item: item[0])
+
+    def _walk_sorted(self, get_entry):
+        stack = [("", self._sorted_entries(get_entry("")))]
+        while stack:
+            rel, it = stack[-1]
+            item = next(it, None)
+            if item is None:
+                stack.pop()
+                continue
+            name, is_dir = item
+            if is_dir:
+                child = os.path.join(rel, name[:-1]) if rel else name[:-1]
+                stack.append((child, self._sorted_entries(get_entry(child))))
+            else:
+                yield rel, name
+
+    def refresh_iter(self):
+        """
+        refresh() and iter_paths_sorted() in one lazy pass: each directory is checked
+        (and listed again if changed) right before its files are yielded, so the first
+        files come out immediately. The manifest is updated only when the generator
+        is exhausted; `removed` is set then.
+        """
+        self._fresh = {}
+        self.changed = []
+        yield from self._walk_sorted(lambda rel: self._visit(rel, self._fresh))
+        self.removed = len(self.dirs.keys() - self._fresh.keys())
+        self.dirs = self._fresh
+
+    def refresh(self):
+        """Bring the manifest up to date. Returns the number of directories rescanned or removed."""
+        for _ in self.refresh_iter():
+            pass
+        return len(self.changed) + self.removed
+
+    def listing(self, rel):
+        """Files of one directory, including one just visited by a running refresh_iter()."""
+        entry = self._fresh.get(rel) or self.dirs.get(rel)
+        return entry["files"] if entry else []
+
+    def iter_files(self):
+        """Yield (rel_dir, filename) for every stored file, directories in sorted order."""
+        for rel in sorted(self.dirs):
+            for name in self.dirs[rel]["files"]:
+                yield rel, name
+
+    def iter_paths_sorted(self):
+        """
+        Yield (rel_dir, filename) in the same order as sorted() over the full paths,
+        without sorting anything: each directory's stored lists are already sorted and
+        are merged depth-first.
+        """
+        return self._walk_sorted(self.dirs.get)
+
+    def full_path(self, rel, name):
+        return os.path.join(self.root, rel, name) if rel else os.path.join(self.root, name)
@@ -0,0 +1,105 @@
+import os
+import threading
+from collections import OrderedDict
+
+from common.overlays import sidecar_json_path
+
+# Memory budget for decoded display frames (a 1700x950 RGB frame is ~5 MB)
+FRAME_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def frame_cache_key(path, max_w, max_h):
+    """
+    (path, mtime, sidecar JSON mtime, display size): an edited image, a relabeled JSON
+    (the frame caches the overlays parsed from it) or a different screen never hits.
+    """
+    try:
+        json_mtime = os.stat(sidecar_json_path(path)).st_mtime_ns
+    except OSError:
+        json_mtime = None
+    return (path, os.stat(path).st_mtime_ns, json_mtime, int(max_w), int(max_h))
+
+
+def estimate_frame_bytes(frame):
+    w, h = frame.image.size
+    return w * h * len(frame.image.getbands()) + _overlay_bytes(frame.overlays)
+
+
+def _overlay_bytes(overlays):
+    """
+    Rough size of a tool's overlay_loader result (Python floats in lists, ~32 bytes each):
+    dicts of overlay kinds, lists of ("box"/"polygon", coords, label) shapes, lists of
+    plain tuples such as (x, y, clearance) suggestions, and objects that report their
+    own `nbytes` (LesionMask). Anything else counts as 0.
+    """
+    if overlays is None:
+        return 0
+    if isinstance(overlays, dict):
+        return sum(_overlay_bytes(value) for value in overlays.values())
+    if not isinstance(overlays, (list, tuple)):
+        return getattr(overlays, "nbytes", 0)
+    nbytes = 0
+    for item in overlays:
+        if not isinstance(item, (list, tuple)):
+            continue
+        if len(item) > 1 and isinstance(item[1], (list, tuple)):
+            nbytes += 32 * len(item[1])  # a shape: its coordinates
+        else:
+            nbytes += 32 * len(item)
+    return nbytes
+
+
+class FrameCache:
+    """
+    Byte-budgeted LRU of DisplayFrames (resized image + parsed overlays).
+    Thread-safe: prefetch workers put, the Tk thread gets.
+    """
+    def __init__(self, max_bytes=FRAME_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()  # key -> (frame, nbytes)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def __contains__(self, key):
+        # Membership test for scheduling; doesn't touch LRU order or counters
+        with self._lock:
+            return key in self._items
+
+    def put(self, key, frame):
+        nbytes = estimate_frame_bytes(frame)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._items[key] = (frame, nbytes)
+            self.bytes += nbytes
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        hit_rate = (self.hits / total * 100) if total else 0.0
+        return (f"frames={len(self._items)} mem={self.bytes / 1e6:.1f}MB "
+                f"hits={self.hits} misses={self.misses} ({hit_rate:.0f}%) evictions={self.evictions}")
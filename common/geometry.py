@@ -0,0 +1,89 @@
+"""
+Display-side polygon geometry.
+
+Label polygons are stored in original image coordinates and can have hundreds of
+vertices. At display scale most of them land within a pixel of their neighbours, so
+they are scaled once and simplified to a pixel tolerance before going to the canvas:
+the vertex count sent to Tk then follows the screen size, not the annotation density.
+Pure functions only: no Tk.
+"""
+
+# Max distance (display pixels) a dropped vertex may be from the drawn outline
+SIMPLIFY_TOLERANCE_PX = 0.75
+
+
+def _radial_pass(xs, ys, tolerance):
+    # Drop vertices closer than `tolerance` to the last kept one (cheap, O(n))
+    sq_tol = tolerance * tolerance
+    out_x, out_y = [xs[0]], [ys[0]]
+    px, py = xs[0], ys[0]
+    last = len(xs) - 1
+    for i in range(1, last):
+        x, y = xs[i], ys[i]
+        dx, dy = x - px, y - py
+        if dx * dx + dy * dy > sq_tol:
+            out_x.append(x)
+            out_y.append(y)
+            px, py = x, y
+    out_x.append(xs[last])
+    out_y.append(ys[last])
+    return out_x, out_y
+
+
+def _rdp_keep(xs, ys, tolerance):
+    # Ramer-Douglas-Peucker with an explicit stack (no recursion limit on long outlines)
+    n = len(xs)
+    keep = [False] * n
+    keep[0] = keep[n - 1] = True
+    sq_tol = tolerance * tolerance
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        ax, ay = xs[first], ys[first]
+        dx, dy = xs[last] - ax, ys[last] - ay
+        seg_sq = dx * dx + dy * dy
+        max_sq, index = -1.0, first
+        for i in range(first + 1, last):
+            px, py = xs[i] - ax, ys[i] - ay
+            if seg_sq > 0:
+                # squared distance to the segment's line: cross^2 / |seg|^2
+                cross = px * dy - py * dx
+                d_sq = cross * cross / seg_sq
+            else:
+                # closed ring (first == last): distance to the point
+                d_sq = px * px + py * py
+            if d_sq > max_sq:
+                max_sq, index = d_sq, i
+        if max_sq > sq_tol:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return keep
+
+
+def simplify_flat(pts, tolerance=SIMPLIFY_TOLERANCE_PX):
+    """
+    Flat [x1, y1, x2, y2, ...] -> the same outline with fewer vertices; dropped points stay
+    within about `tolerance` of it. First and last vertices are always kept.
+    """
+    if len(pts) < 8 or tolerance <= 0:
+        return list(pts)
+    xs, ys = _radial_pass(pts[0::2], pts[1::2], tolerance)
+    if len(xs) > 2:
+        keep = _rdp_keep(xs, ys, tolerance)
+        xs = [x for x, k in zip(xs, keep) if k]
+        ys = [y for y, k in zip(ys, keep) if k]
+    if len(xs) < 3:
+        # collapsed below a drawable polygon: a tiny shape, keep it as annotated
+        return list(pts)
+    out = [0.0] * (len(xs) * 2)
+    out[0::2] = xs
+    out[1::2] = ys
+    return out
+
+
+def display_polygon(coords, factor, tolerance=SIMPLIFY_TOLERANCE_PX):
+    """Polygon in original coordinates -> flat canvas coordinates at `factor`, simplified."""
+    return simplify_flat([c * factor for c in coords], tolerance)
@@ -0,0 +1,176 @@
+import json
+import os
+import time
+
+from common.perf import PERF
+
+# fsync after this many records or seconds, whichever comes first.
+# Every record is flushed to the OS immediately, so a crash of the tool itself loses nothing;
+# the batching only bounds what a power loss can take.
+FSYNC_EVERY = 20
+FSYNC_INTERVAL = 2.0
+
+
+def journal_path_for(progress_path):
+    """progress.json -> progress.journal.jsonl (same folder)"""
+    return os.path.splitext(progress_path)[0] + ".journal.jsonl"
+
+
+def resume_position(entry, items, key=None):
+    """
+    Where to continue after `entry`: its "next" index, re-anchored on its source path
+    if the list changed since (files added/removed before it).
+    """
+    idx, nxt = entry["index"], entry["next"]
+    src = entry.get("src")
+    if not src:
+        return nxt
+
+    def path_at(i):
+        return key(items[i]) if key else items[i]
+
+    if 0 <= idx < len(items) and path_at(idx) == src:
+        return nxt
+    for i in range(len(items)):
+        if path_at(i) == src:
+            return i + (nxt - idx)
+    return nxt
+
+
+class ActionJournal:
+    """
+    Append-only log of decisions, one JSON line each:
+        {"seq", "ts", "action", "index", "next", "src", "outputs", "counts", ...}
+    Undo appends {"action": "UNDO", "undo": seq} instead of rewriting anything.
+
+    - O(1) write per action (no whole-file rewrite)
+    - replay on open rebuilds the undo stack (`entries`), so multi-level undo
+      survives a restart
+    - compact() at session close drops undone records
+
+    "BASE" records carry state migrated from an old progress.json; they can't be undone.
+    """
+    def __init__(self, path, fsync_every=FSYNC_EVERY, fsync_interval=FSYNC_INTERVAL):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.entries = []  # effective actions, oldest first (= the undo stack)
+        self._seq = 0
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+        self._replay()
+        self._drop_torn_tail()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._f = open(path, 'a', encoding='utf-8')
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # torn last line after a crash
+                self._seq = max(self._seq, rec.get("seq", 0))
+                if rec.get("action") == "UNDO":
+                    if self.entries and self.entries[-1]["seq"] == rec.get("undo"):
+                        self.entries.pop()
+                else:
+                    self.entries.append(rec)
+
+    def _drop_torn_tail(self):
+        # A crash mid-write leaves a partial last line; cut it so the next record
+        # starts on a fresh line instead of being glued to it.
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def _append(self, rec):
+        self._f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._f.flush()
+        self._pending += 1
+        if (self._pending >= self.fsync_every
+                or time.monotonic() - self._last_sync >= self.fsync_interval):
+            self.sync()
+
+    def sync(self):
+        if self._pending:
+            os.fsync(self._f.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    @PERF.timed("journal")
+    def record(self, action, index, next_index, src=None, outputs=(), counts=None, **extra):
+        """
+        Log a decision.
+        index: list position it was made at (where undo returns to)
+        next_index: position to resume at afterwards
+        counts: the tool's counters after the action (restored on resume/undo)
+        """
+        self._seq += 1
+        rec = {
+            "seq": self._seq,
+            "ts": round(time.time(), 3),
+            "action": action,
+            "index": index,
+            "next": next_index,
+            "src": src,
+            "outputs": list(outputs),
+            "counts": counts or {},
+        }
+        rec.update(extra)
+        self._append(rec)
+        self.entries.append(rec)
+        return rec
+
+    def last(self):
+        return self.entries[-1] if self.entries else None
+
+    def can_undo(self):
+        return bool(self.entries) and self.entries[-1]["action"] != "BASE"
+
+    def undo(self):
+        """Pop the last decision and return it (the caller reverts its outputs)."""
+        if not self.can_undo():
+            return None
+        rec = self.entries.pop()
+        self._seq += 1
+        self._append({"seq": self._seq, "ts": round(time.time(), 3), "action": "UNDO", "undo": rec["seq"]})
+        return rec
+
+    def counts(self):
+        """Counters as of the last effective action ({} if none)."""
+        last = self.last()
+        return dict(last["counts"]) if last else {}
+
+    def _rewrite(self, entries):
+        self._f.close()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for rec in entries:
+                f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._f = open(self.path, 'a', encoding='utf-8')
+        self._pending = 0
+
+    def reset(self):
+        """Start over (user declined to resume). Output files are left alone."""
+        self.entries = []
+        self._rewrite([])
+
+    def compact(self):
+        """Rewrite the file with only the effective actions (drops undone records)."""
+        self._rewrite(self.entries)
+
+    def close(self):
+        try:
+            self.compact()
+        finally:
+            self._f.close()
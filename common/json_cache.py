@@ -0,0 +1,58 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Parsed label documents kept per session (a label JSON is a few KB parsed)
+JSON_CACHE_ENTRIES = 512
+
+
+class JsonCache:
+    """
+    path -> parsed label JSON, reused while the file's (mtime, size) is unchanged.
+
+    Filled by the prefetch workers when they parse overlays, then read again by the
+    output transform on the Tk/writer thread without touching the disk.
+    Documents are shared: treat them as read-only (the transforms copy what they change).
+    """
+    def __init__(self, max_entries=JSON_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()  # path -> ((mtime_ns, size), data)
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """Parsed document, or None if the file is missing (like read_label_json)."""
+        try:
+            st = os.stat(path)
+        except (OSError, TypeError):
+            return None
+        version = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            item = self._items.get(path)
+            if item is not None and item[0] == version:
+                self._items.move_to_end(path)
+                self.hits += 1
+                return item[1]
+            self.misses += 1
+
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        with self._lock:
+            self._items[path] = (version, data)
+            self._items.move_to_end(path)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        hit_rate = (self.hits / total * 100) if total else 0.0
+        return f"json={len(self._items)} hits={self.hits} misses={self.misses} ({hit_rate:.0f}%)"
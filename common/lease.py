@@ -0,0 +1,324 @@
+"""
+Work leasing for several annotators on one dataset folder (e.g. over NFS).
+
+The sorted image list is split into chunks of LEASE_CHUNK images. An instance works
+on one chunk at a time, claimed through files in <input folder>/.leases/ only:
+
+    plan.json             the image list everyone works on (relative paths, fixed)
+    chunk_00000150.lock   held: {"owner", "host", "pid", "token", "next", "expires"}
+    chunk_00000150.done   finished: {"owner", "finished"}
+
+- claiming = creating the .lock with O_CREAT | O_EXCL (atomic, also on NFSv3+)
+- the holder rewrites the lock (tmp + rename) on every step with its position
+  ("next") and a new expiry; a crashed client's lock expires after LEASE_TTL
+- an expired lock is taken over by renaming it away first (only one client can
+  win the rename), and the new holder continues from its "next"
+- closing the tool expires its lock at once, so the rest of the chunk is free again
+- every claim writes a new random token; the lock is re-read before each rewrite or
+  removal, and a holder that finds someone else's token (it stalled past LEASE_TTL and
+  was taken over) drops the chunk and claims another instead of writing
+
+Chunks are index ranges, so every instance must use the same list: the first one
+writes plan.json from its finished scan and the others load it. Files added later
+are not part of the plan (remove .leases/ once everyone is done to start a new round).
+The annotator name must be unique per running instance. Expiry compares wall clocks
+of different machines: keep LEASE_TTL well above the clock skew between them.
+"""
+import getpass
+import json
+import os
+import re
+import socket
+import time
+import uuid
+
+LEASE_DIR = ".leases"
+PLAN_FILE = "plan.json"
+LEASE_CHUNK = 50
+# Seconds without a step or heartbeat before a chunk is given to someone else
+LEASE_TTL = 15 * 60
+HEARTBEAT_MS = 60 * 1000
+
+
+def annotator_id():
+    """LABELING_ANNOTATOR, or user@host. Stable across restarts, so own chunks are picked up again."""
+    owner = os.environ.get("LABELING_ANNOTATOR")
+    if not owner:
+        try:
+            user = getpass.getuser()
+        except Exception:
+            user = "user"
+        owner = f"{user}@{socket.gethostname()}"
+    return owner
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class LeaseManager:
+    def __init__(self, root, owner=None, chunk=LEASE_CHUNK, ttl=LEASE_TTL):
+        self.root = root
+        self.dir = os.path.join(root, LEASE_DIR)
+        self.owner = owner or annotator_id()
+        self.chunk = chunk
+        self.ttl = ttl
+        self.current = None  # start index of the chunk held
+        self.token = None  # written into our lock by the claim; someone else's token = lost
+        self.position = None
+        self.total = 0
+        os.makedirs(self.dir, exist_ok=True)
+
+    # --- paths ---
+    def _lock_path(self, start):
+        return os.path.join(self.dir, f"chunk_{start:08d}.lock")
+
+    def _done_path(self, start):
+        return os.path.join(self.dir, f"chunk_{start:08d}.done")
+
+    def journal_path(self, progress_path):
+        """progress.json -> progress.<owner>.journal.jsonl: one journal per annotator."""
+        safe = re.sub(r'[^A-Za-z0-9_.-]', '_', self.owner)
+        return os.path.splitext(progress_path)[0] + f".{safe}.journal.jsonl"
+
+    def chunk_of(self, index):
+        return index - index % self.chunk
+
+    def _chunk_end(self, start):
+        return min(start + self.chunk, self.total)
+
+    # --- lock files ---
+    def _lock_data(self, position, expires=None, token=None):
+        return {"owner": self.owner, "host": socket.gethostname(), "pid": os.getpid(),
+                "token": token or self.token, "next": position,
+                "expires": time.time() + self.ttl if expires is None else expires}
+
+    def _create_lock(self, start, position):
+        """The new claim's token, or None if the chunk is locked already."""
+        try:
+            fd = os.open(self._lock_path(start), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return None
+        token = uuid.uuid4().hex
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self._lock_data(position, token=token), f)
+            f.flush()
+            os.fsync(f.fileno())
+        return token
+
+    def _write_lock(self, start, position, expires=None):
+        path = self._lock_path(start)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._lock_data(position, expires), f)
+        os.replace(tmp, path)
+
+    def _still_held(self):
+        """
+        Re-read our lock before touching it. False (and the chunk dropped) if it is gone
+        or carries another claim's token: we stalled past the TTL and were taken over.
+        """
+        if self.current is None:
+            return False
+        data = _read_json(self._lock_path(self.current))
+        if data is not None and data.get("owner") == self.owner and data.get("token") == self.token:
+            return True
+        who = data.get("owner") if data else "nobody"
+        print(f"[DEBUG] Lease: chunk {self.current} lost (now held by {who})")
+        self.current = None
+        return False
+
+    def _take_expired(self, start):
+        """Steal an expired lock. Returns (its "next", our token) if we won the race, else None."""
+        path = self._lock_path(start)
+        data = _read_json(path)
+        if data is None or data.get("expires", 0) > time.time():
+            return None
+        stale = f"{path}.stale.{os.getpid()}.{time.time_ns()}"
+        try:
+            os.rename(path, stale)  # only one client gets this
+        except OSError:
+            return None
+        data = _read_json(stale) or {}
+        try:
+            os.remove(stale)
+        except OSError:
+            pass
+        position = data.get("next", start)
+        if not isinstance(position, int) or not start <= position <= self._chunk_end(start):
+            position = start
+        token = self._create_lock(start, position)
+        if token is None:
+            return None
+        print(f"[DEBUG] Lease: took over expired chunk {start} from {data.get('owner')} at {position}")
+        return position, token
+
+    def _claim(self, start, prefer=None):
+        """Hold chunk `start` (free, expired, or already ours). Returns the index to continue at, or None."""
+        if os.path.exists(self._done_path(start)):
+            return None
+        position = prefer if prefer is not None else start
+        token = self._create_lock(start, position)
+        if token is not None:
+            return self._hold(start, position, token)
+        data = _read_json(self._lock_path(start))
+        if data is not None and data.get("owner") == self.owner:
+            # our own lock from before a restart/crash: a new claim, so a new token
+            if prefer is None:
+                position = data.get("next", start)
+            return self._hold(start, position, uuid.uuid4().hex)
+        taken = self._take_expired(start)
+        if taken is None:
+            return None
+        position, token = taken
+        return self._hold(start, position if prefer is None else prefer, token)
+
+    def _hold(self, start, position, token):
+        self.current = start
+        self.position = position
+        self.token = token
+        self._write_lock(start, position)
+        return position
+
+    def _scan_dir(self):
+        locks, done = set(), set()
+        for name in os.listdir(self.dir):
+            m = re.fullmatch(r'chunk_(\d+)\.(lock|done)', name)
+            if m:
+                (locks if m.group(2) == "lock" else done).add(int(m.group(1)))
+        return locks, done
+
+    def _claim_next(self):
+        locks, done = self._scan_dir()
+        starts = [s for s in range(0, self.total, self.chunk) if s not in done]
+        # our own locks first (restart), then free chunks, then expired ones
+        for start in starts:
+            if start in locks:
+                data = _read_json(self._lock_path(start))
+                if data is not None and data.get("owner") == self.owner:
+                    return self._claim(start)
+        for start in starts:
+            if start not in locks:
+                position = self._claim(start)
+                if position is not None:
+                    return position
+        for start in starts:
+            if start in locks:
+                position = self._claim(start)
+                if position is not None:
+                    return position
+        return None
+
+    # --- API for the tools ---
+    def load_plan(self, items, key=None, build=None):
+        """
+        The shared image list. The first instance writes plan.json from `items` (its
+        finished scan); later ones get that list back even if their own scan differs.
+        key(item) -> image path stored in the plan, build(path) -> item (default: the path).
+        """
+        plan_path = os.path.join(self.dir, PLAN_FILE)
+        data = _read_json(plan_path)
+        if data is None:
+            rel = [os.path.relpath(key(it) if key else it, self.root).replace(os.sep, "/") for it in items]
+            tmp = f"{plan_path}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({"created_by": self.owner, "items": rel}, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                os.link(tmp, plan_path)  # create-if-absent: one writer wins
+            except FileExistsError:
+                pass
+            finally:
+                os.remove(tmp)
+            data = _read_json(plan_path)
+        paths = [os.path.join(self.root, *r.split("/")) for r in data["items"]]
+        print(f"[DEBUG] Lease plan: {len(paths)} images (by {data.get('created_by')})")
+        return [build(p) for p in paths] if build else paths
+
+    def start(self, total, prefer=None):
+        """
+        First index to show for a list of `total` images, or None if every chunk is
+        done or held by someone else. `prefer` is where this annotator's journal resumes.
+        """
+        self.total = total
+        if prefer is not None and 0 <= prefer < total:
+            position = self._claim(self.chunk_of(prefer), prefer)
+            if position is not None:
+                return position
+        return self._claim_next()
+
+    def advance(self, index):
+        """Index to show after finishing `index` (claims the next chunk at the end of this one)."""
+        nxt = index + 1
+        if not self._still_held():
+            return self._claim_next()
+        if nxt < self._chunk_end(self.current):
+            self.position = nxt
+            self._write_lock(self.current, nxt)
+            return nxt
+        self.finish()
+        return self._claim_next()
+
+    def seek(self, index):
+        """Back/undo to `index`. True if that image is (again) ours."""
+        start = self.chunk_of(index)
+        if start == self.current and self._still_held():
+            self.position = index
+            self._write_lock(start, index)
+            return True
+        done = _read_json(self._done_path(start))
+        if done is None or done.get("owner") != self.owner:
+            return False
+        # reopen our own finished chunk
+        token = self._create_lock(start, index)
+        if token is None:
+            return False
+        os.remove(self._done_path(start))
+        self.release()
+        self._hold(start, index, token)
+        return True
+
+    def finish(self):
+        if not self._still_held():
+            return
+        with open(self._done_path(self.current), 'w', encoding='utf-8') as f:
+            json.dump({"owner": self.owner, "finished": time.time()}, f)
+        try:
+            os.remove(self._lock_path(self.current))
+        except OSError:
+            pass
+        self.current = None
+
+    def release(self):
+        """Give the rest of the held chunk back (expires the lock now, position kept)."""
+        if not self._still_held():
+            return
+        try:
+            self._write_lock(self.current, self.position, expires=0)
+        except OSError as e:
+            print(f"Failed to release lease: {e}")
+        self.current = None
+
+    def renew(self):
+        if self._still_held():
+            self._write_lock(self.current, self.position)
+
+    def heartbeat(self, widget, interval=HEARTBEAT_MS):
+        """Keep the lease alive while the tool sits on one image."""
+        def beat():
+            try:
+                self.renew()
+            except OSError as e:
+                print(f"Failed to renew lease: {e}")
+            widget.after(interval, beat)
+        widget.after(interval, beat)
+
+    def status_text(self):
+        if self.current is None:
+            return "lease: -"
+        return f"lease {self.current + 1}-{self._chunk_end(self.current)}"
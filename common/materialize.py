@@ -0,0 +1,151 @@
+import errno
+import os
+import shutil
+import sys
+import threading
+
+# How output files are created from their source:
+# - "auto":     reflink -> hardlink -> copy, first one the target directory supports
+# - "reflink":  copy-on-write clone (btrfs/XFS FICLONE, APFS clonefile), falls back to copy
+# - "hardlink": same inode, no extra space; falls back to copy across devices
+# - "symlink":  link to the absolute source path (outputs break if the source moves)
+# - "copy":     plain shutil.copy2
+OUTPUT_STRATEGY = "auto"
+
+AUTO_ORDER = ("reflink", "hardlink", "copy")
+COW_ORDER = ("reflink", "copy")
+
+FICLONE = 0x40049409  # linux/fs.h _IOW(0x94, 9, int)
+
+
+def _reflink(src, dst):
+    if sys.platform.startswith("linux"):
+        import fcntl
+        with open(src, 'rb') as fs:
+            fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            try:
+                fcntl.ioctl(fd, FICLONE, fs.fileno())
+            except OSError:
+                os.close(fd)
+                os.remove(dst)
+                raise
+            os.close(fd)
+        shutil.copystat(src, dst)
+    elif sys.platform == "darwin":
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), dst)
+    else:
+        raise OSError(errno.EOPNOTSUPP, "reflink not supported on this platform", dst)
+
+
+def _hardlink(src, dst):
+    os.link(src, dst)
+
+
+def _symlink(src, dst):
+    os.symlink(os.path.abspath(src), dst)
+
+
+def _copy(src, dst):
+    shutil.copy2(src, dst)
+
+
+def _is_source_entry(src, dst):
+    """True if removing `dst` would remove the source's data, not just another link to it."""
+    if os.path.islink(dst) or not os.path.exists(dst) or not os.path.samefile(src, dst):
+        return False
+    if os.stat(dst).st_nlink == 1:
+        return True
+    # several hard links: only the very same name in the same directory is the source
+    return (os.path.basename(src) == os.path.basename(dst) and
+            os.path.samefile(os.path.dirname(os.path.abspath(src)), os.path.dirname(os.path.abspath(dst))))
+
+
+METHODS = {
+    "reflink": _reflink,
+    "hardlink": _hardlink,
+    "symlink": _symlink,
+    "copy": _copy,
+}
+
+
+class OutputMaterializer:
+    """
+    Creates output files without byte-copying when the filesystem allows it.
+
+    What works is detected per (target directory, source device) on first use and
+    remembered, so later files go straight to the working method. Every method
+    creates a new directory entry at `dst` only, so undo can still just os.remove()
+    the paths the tool recorded; the source is never touched.
+    """
+    def __init__(self, strategy=OUTPUT_STRATEGY):
+        if strategy != "auto" and strategy not in METHODS:
+            raise ValueError(f"Unknown output strategy: {strategy}")
+        self.strategy = strategy
+        self._resolved = {}  # (target_dir, src_dev, cow_only) -> method name
+        self._lock = threading.Lock()
+
+    def _candidates(self, cow_only):
+        if cow_only:
+            # Shared inodes/links would let an in-place edit of the output change the source
+            return COW_ORDER if self.strategy != "copy" else ("copy",)
+        if self.strategy == "auto":
+            return AUTO_ORDER
+        if self.strategy == "copy":
+            return ("copy",)
+        return (self.strategy, "copy")
+
+    def place(self, src, dst, cow_only=False):
+        """
+        Make `dst` a copy of `src` (overwriting like shutil.copy2).
+        cow_only=True restricts to reflink/copy, for files that may be edited later.
+        Returns the method used. Raises shutil.SameFileError (like copy2) if `dst` is
+        `src` itself: removing it first would delete the source. An earlier output
+        linked to `src` (another name for the same inode, or a symlink) is replaced.
+        """
+        if os.path.lexists(dst):
+            if _is_source_entry(src, dst):
+                raise shutil.SameFileError(f"{src!r} and {dst!r} are the same file")
+            os.remove(dst)
+
+        target_dir = os.path.dirname(os.path.abspath(dst))
+        key = (target_dir, os.stat(src).st_dev, cow_only)
+        with self._lock:
+            known = self._resolved.get(key)
+
+        candidates = self._candidates(cow_only)
+        if known is not None:
+            candidates = (known,) + tuple(c for c in candidates if c != known)
+
+        last_error = None
+        for name in candidates:
+            try:
+                METHODS[name](src, dst)
+            except OSError as e:
+                if name == "copy":
+                    raise
+                last_error = e
+                continue
+            if name != known:
+                with self._lock:
+                    self._resolved[key] = name
+                print(f"[DEBUG] Output strategy for {target_dir}: {name}")
+            return name
+        raise last_error
+
+    def move(self, src, dst):
+        """Like shutil.move: a rename, or reflink/copy + remove when crossing devices."""
+        try:
+            os.replace(src, dst)
+            return "rename"
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+        # The source is deleted afterwards, so links are not an option here
+        method = self.place(src, dst, cow_only=True)
+        os.remove(src)
+        return method
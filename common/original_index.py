@@ -0,0 +1,87 @@
+import os
+import re
+
+from common.dir_manifest import DirectoryManifest, cache_path_for
+
+INDEX_FILE = ".original_index.json"
+
+ORIGINAL_CODE_RE = re.compile(r"_A[1-6]")
+UNIQUE_NUM_RE = re.compile(r"(\d{4,})")
+
+
+def extract_id(filename):
+    """
+    A7 output filename -> ID shared with the original.
+    예: IMG_D_A7_496645.jpg -> IMG_D_496645
+    """
+    name_only = os.path.splitext(os.path.basename(filename))[0]
+    return re.sub(r"_A7", "", name_only)
+
+
+def normalize_original_name(name):
+    """
+    Original filename (no extension) -> ID, i.e. the _A1 ~ _A6 part removed.
+    예: IMG_D_A6_496645 -> IMG_D_496645
+    """
+    return ORIGINAL_CODE_RE.sub("", name)
+
+
+class OriginalIndex:
+    """
+    ID -> original JSON path lookup over ORIGINAL_ROOT.
+
+    Built once from a DirectoryManifest (saved next to the originals, or in ~/.cache
+    when that folder is read-only). Reopening only rescans directories whose mtime
+    changed, and every lookup is a dict access.
+
+    - by_id:  normalized ID (see normalize_original_name) -> path
+    - by_num: every 4+ digit run in the filename -> path (the loose "unique number" match)
+    The first file in sorted directory/file order wins for both.
+    """
+    def __init__(self, root):
+        self.root = root
+        self.manifest = DirectoryManifest(root, suffixes=(".json",))
+        self.by_id = {}
+        self.by_num = {}
+        self.built = False
+
+    def build(self):
+        cache_path = cache_path_for(self.root, INDEX_FILE)
+        self.manifest.load(cache_path)
+        changed = self.manifest.refresh()
+        if changed:
+            self.manifest.save(cache_path)
+
+        by_id = {}
+        by_num = {}
+        for rel, name in self.manifest.iter_files():
+            if name == INDEX_FILE:
+                continue
+            path = self.manifest.full_path(rel, name)
+            stem = os.path.splitext(name)[0]
+            by_id.setdefault(normalize_original_name(stem), path)
+            for num in UNIQUE_NUM_RE.findall(stem):
+                by_num.setdefault(num, path)
+
+        self.by_id = by_id
+        self.by_num = by_num
+        self.built = True
+        print(f"[DEBUG] Original index: {len(by_id)} IDs ({changed} dirs rescanned) in {self.root}")
+        return self
+
+    def find(self, file_id):
+        """
+        1. Normalized match (IMG_D_496645 == IMG_D_A6_496645 without _A6)
+        2. Loose match on the unique number (first 4+ digit run of file_id)
+        """
+        if not self.built:
+            self.build()
+
+        path = self.by_id.get(file_id)
+        if path:
+            return path
+
+        match = UNIQUE_NUM_RE.search(file_id)
+        if match:
+            return self.by_num.get(match.group(1))
+        return None
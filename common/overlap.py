@@ -0,0 +1,120 @@
+"""
+Exact box-vs-lesion geometry for checking A7 outputs against their original's labels.
+Boxes are (x, y, w, h), shapes come from parse_labeling_info(), everything in ORIGINAL
+image coordinates. Pure functions only.
+"""
+import math
+
+
+def _shape_points(kind, coords):
+    if kind == "box":
+        x, y, w, h = coords
+        return [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]
+    pts = list(zip(coords[0::2], coords[1::2]))
+    if len(pts) > 1 and pts[0] == pts[-1]:
+        pts.pop()  # closed outlines repeat the first vertex (x5 == x1 in A7 polygons)
+    return pts
+
+
+def clip_to_box(points, box):
+    """Sutherland-Hodgman: the part of polygon `points` inside `box`."""
+    x0, y0, w, h = box
+    x1, y1 = x0 + w, y0 + h
+    edges = (
+        (lambda p: p[0] >= x0, lambda p, q: _cross_x(p, q, x0)),
+        (lambda p: p[0] <= x1, lambda p, q: _cross_x(p, q, x1)),
+        (lambda p: p[1] >= y0, lambda p, q: _cross_y(p, q, y0)),
+        (lambda p: p[1] <= y1, lambda p, q: _cross_y(p, q, y1)),
+    )
+    out = points
+    for inside, cross in edges:
+        if not out:
+            break
+        pts, out = out, []
+        prev = pts[-1]
+        for cur in pts:
+            if inside(cur):
+                if not inside(prev):
+                    out.append(cross(prev, cur))
+                out.append(cur)
+            elif inside(prev):
+                out.append(cross(prev, cur))
+            prev = cur
+    return out
+
+
+def _cross_x(p, q, x):
+    t = (x - p[0]) / (q[0] - p[0])
+    return x, p[1] + t * (q[1] - p[1])
+
+
+def _cross_y(p, q, y):
+    t = (y - p[1]) / (q[1] - p[1])
+    return p[0] + t * (q[0] - p[0]), y
+
+
+def polygon_area(points):
+    """Shoelace area (always >= 0)."""
+    n = len(points)
+    if n < 3:
+        return 0.0
+    s = 0.0
+    for i in range(n):
+        xa, ya = points[i]
+        xb, yb = points[(i + 1) % n]
+        s += xa * yb - xb * ya
+    return abs(s) / 2
+
+
+def _point_box_distance(px, py, box):
+    x0, y0, w, h = box
+    dx = max(x0 - px, 0, px - (x0 + w))
+    dy = max(y0 - py, 0, py - (y0 + h))
+    return math.hypot(dx, dy)
+
+
+def _point_segment_distance(px, py, a, b):
+    ax, ay = a
+    bx, by = b
+    dx, dy = bx - ax, by - ay
+    length = dx * dx + dy * dy
+    t = 0.0 if length == 0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length))
+    return math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+def box_shape_metrics(box, kind, coords):
+    """(intersection area, lesion area, distance) of an A7 box and one lesion shape; distance is 0 when they meet."""
+    pts = _shape_points(kind, coords)
+    if len(pts) < 3:
+        return 0.0, 0.0, math.inf
+    inter = polygon_area(clip_to_box(pts, box))
+    area = polygon_area(pts)
+    if inter > 0:
+        return inter, area, 0.0
+    x0, y0, w, h = box
+    corners = ((x0, y0), (x0 + w, y0), (x0 + w, y0 + h), (x0, y0 + h))
+    dist = min(_point_box_distance(px, py, box) for px, py in pts)
+    for i in range(len(pts)):
+        a, b = pts[i - 1], pts[i]
+        for cx, cy in corners:
+            dist = min(dist, _point_segment_distance(cx, cy, a, b))
+    return 0.0, area, dist
+
+
+def box_lesion_metrics(box, shapes):
+    """
+    An A7 box against all lesion shapes:
+        overlap   share of the box covered by lesions (0-1; overlapping lesions count twice, capped)
+        iou       largest IoU with a single lesion
+        distance  to the nearest lesion (0 if touching, inf without lesions)
+    """
+    box_area = box[2] * box[3]
+    covered, iou, distance = 0.0, 0.0, math.inf
+    for kind, coords, _ in shapes:
+        inter, area, dist = box_shape_metrics(box, kind, coords)
+        covered += inter
+        if inter > 0:
+            iou = max(iou, inter / (box_area + area - inter))
+        distance = min(distance, dist)
+    overlap = min(1.0, covered / box_area) if box_area > 0 else 0.0
+    return overlap, iou, distance
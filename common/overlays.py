@@ -0,0 +1,88 @@
+import json
+import os
+
+
+def sidecar_json_path(img_path):
+    """IMG_xxx.jpg -> IMG_xxx.json in the same folder."""
+    return os.path.splitext(img_path)[0] + ".json"
+
+
+def read_label_json(json_path):
+    """Parsed label JSON, or None if the file is missing."""
+    if not json_path or not os.path.exists(json_path):
+        return None
+    with open(json_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _label_name(item, default):
+    label = item.get("label")
+    if isinstance(label, dict):
+        return label.get("labelName", default)
+    return default
+
+
+def _box_locations(node):
+    # location: [{"x":..}, ...] or the keys directly on the node or [x, y, w, h]
+    if isinstance(node, list):
+        if len(node) >= 4:
+            yield list(node[:4])
+        return
+    loc_list = node.get("location")
+    if isinstance(loc_list, list) and loc_list:
+        for loc in loc_list:
+            yield [loc.get("x", 0), loc.get("y", 0), loc.get("width", 0), loc.get("height", 0)]
+    elif "x" in node:
+        yield [node.get("x", 0), node.get("y", 0), node.get("width", 0), node.get("height", 0)]
+
+
+def _poly_locations(node):
+    loc_list = node.get("location") if isinstance(node, dict) else None
+    if not isinstance(loc_list, list):
+        return
+    for loc in loc_list:
+        # loc is like {"x1": 100, "y1": 100, "x2": ...}
+        pts = []
+        i = 1
+        while True:
+            kx, ky = f"x{i}", f"y{i}"
+            if kx in loc and ky in loc:
+                pts.extend([loc[kx], loc[ky]])
+                i += 1
+            else:
+                break
+        if len(pts) >= 4:
+            yield pts
+
+
+def parse_labeling_info(data, default_label=""):
+    """
+    labelingInfo -> list of shapes in ORIGINAL image coordinates:
+        ("box", [x, y, w, h], label)
+        ("polygon", [x1, y1, x2, y2, ...], label)
+    Done once per image (in the prefetch worker); drawing only scales.
+    """
+    shapes = []
+    if not data:
+        return shapes
+    for item in data.get("labelingInfo", []):
+        label = _label_name(item, default_label)
+        if "box" in item:
+            for box in _box_locations(item["box"]):
+                shapes.append(("box", box, label))
+        if "polygon" in item:
+            for pts in _poly_locations(item["polygon"]):
+                shapes.append(("polygon", pts, label))
+    return shapes
+
+
+def offset_shapes(shapes, dx, dy):
+    """parse_labeling_info() shapes moved by (dx, dy), e.g. source shapes onto a crop output."""
+    moved = []
+    for kind, coords, label in shapes:
+        if kind == "box":
+            x, y, w, h = coords
+            moved.append((kind, [x + dx, y + dy, w, h], label))
+        else:
+            moved.append((kind, [v + (dx if i % 2 == 0 else dy) for i, v in enumerate(coords)], label))
+    return moved
@@ -0,0 +1,170 @@
+"""
+Per-stage latency recording for the labeling tools.
+
+    from common.perf import PERF
+    with PERF.stage("decode"):
+        ...
+
+    @PERF.timed("load_image")
+    def load_image(self): ...
+
+Enable with LABELING_PERF=1 (or PERF_ENABLED below). Disabled, stage() returns a shared
+no-op context manager and timed() leaves the function undecorated, so the cost is one
+attribute check per stage() and nothing at all for timed().
+Enabled:
+- every stage goes into a ring buffer (last PERF_RING_SIZE samples)
+- attach_hud(root) shows p50/p95 per stage in the window corner (F12 toggles it)
+- dump_trace() writes Chrome trace-event JSON (chrome://tracing, ui.perfetto.dev)
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+PERF_ENABLED = os.environ.get("LABELING_PERF", "") not in ("", "0")
+PERF_RING_SIZE = 4096
+# Written at exit when enabled; {ts} is replaced by a timestamp
+PERF_TRACE_PATH = os.environ.get("LABELING_PERF_TRACE", "labeling_trace_{ts}.json")
+HUD_INTERVAL_MS = 1000
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("recorder", "name", "start")
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.recorder.record(self.name, self.start, end - self.start)
+        return False
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class PerfRecorder:
+    def __init__(self, enabled=PERF_ENABLED, ring_size=PERF_RING_SIZE):
+        self.enabled = enabled
+        self._samples = deque(maxlen=ring_size)  # (name, start_s, dur_s, thread_name)
+        self._epoch = time.perf_counter()
+        self._hud = None
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def timed(self, name):
+        """Decorator form of stage(); decided at import time, so free when disabled."""
+        def decorate(fn):
+            if not self.enabled:
+                return fn
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with _Stage(self, name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def record(self, name, start, duration):
+        # deque.append is atomic: safe from prefetch/writer threads without a lock
+        self._samples.append((name, start, duration, threading.current_thread().name))
+
+    def summary(self):
+        """{stage: (count, p50_ms, p95_ms)} over the samples in the ring buffer."""
+        by_name = {}
+        for name, _, dur, _ in list(self._samples):
+            by_name.setdefault(name, []).append(dur)
+        result = {}
+        for name, durs in by_name.items():
+            durs.sort()
+            result[name] = (len(durs), _percentile(durs, 0.5) * 1000, _percentile(durs, 0.95) * 1000)
+        return result
+
+    def format_summary(self):
+        lines = [f"{'stage':<22}{'n':>6}{'p50 ms':>9}{'p95 ms':>9}"]
+        for name, (n, p50, p95) in sorted(self.summary().items()):
+            lines.append(f"{name:<22}{n:>6}{p50:>9.1f}{p95:>9.1f}")
+        return "\n".join(lines)
+
+    def dump_trace(self, path=None):
+        """Chrome trace-event JSON ("X" complete events, one track per thread)."""
+        if not self.enabled or not self._samples:
+            return None
+        path = path or PERF_TRACE_PATH.format(ts=time.strftime("%Y%m%d_%H%M%S"))
+        pid = os.getpid()
+        tids = {}
+        events = []
+        for name, start, dur, thread_name in list(self._samples):
+            tid = tids.setdefault(thread_name, len(tids) + 1)
+            events.append({"name": name, "cat": "stage", "ph": "X", "pid": pid, "tid": tid,
+                           "ts": round((start - self._epoch) * 1e6, 1), "dur": round(dur * 1e6, 1)})
+        for thread_name, tid in tids.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                           "args": {"name": thread_name}})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        print(f"[DEBUG] Perf trace written: {path} ({len(events)} events)")
+        return path
+
+    def attach_hud(self, root, interval=HUD_INTERVAL_MS):
+        """Corner overlay with p50/p95 per stage, refreshed every `interval` ms. F12 toggles."""
+        if not self.enabled:
+            return
+        import tkinter as tk
+        hud = tk.Label(root, justify=tk.LEFT, anchor="ne", font=("Courier", 10),
+                       bg="#000000", fg="#00ff00")
+        self._hud = hud
+        visible = [True]
+
+        def refresh():
+            if visible[0]:
+                hud.config(text=self.format_summary())
+                hud.lift()
+            root.after(interval, refresh)
+
+        def toggle(event=None):
+            visible[0] = not visible[0]
+            if visible[0]:
+                hud.place(relx=1.0, rely=0.0, anchor="ne")
+            else:
+                hud.place_forget()
+
+        hud.place(relx=1.0, rely=0.0, anchor="ne")
+        root.bind("<F12>", toggle, add="+")
+        root.after(interval, refresh)
+
+    def close(self):
+        """Call on exit: prints the summary and writes the trace file (if enabled)."""
+        if not self.enabled or not self._samples:
+            return
+        print(self.format_summary())
+        try:
+            self.dump_trace()
+        except OSError as e:
+            print(f"Failed to write perf trace: {e}")
+
+
+# Shared by the tools and the common/ helpers (one process = one tool)
+PERF = PerfRecorder()
@@ -0,0 +1,295 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+from PIL import Image
+
+from common.frame_cache import FrameCache, frame_cache_key
+from common.perf import PERF
+
+# Default prefetch window: N images ahead of the current one and M behind (for Back)
+PREFETCH_AHEAD = 3
+PREFETCH_BEHIND = 1
+PREFETCH_WORKERS = 2
+
+# Show a reduced-DCT-scale decode first, swap in the exact LANCZOS render when it's ready
+PROGRESSIVE_PREVIEW = True
+
+
+def get_resample(name="LANCZOS"):
+    """Pillow resample filter by name (compatible with older Pillow versions)."""
+    if hasattr(Image, "Resampling"):
+        return getattr(Image.Resampling, name)
+    return getattr(Image, name)
+
+
+def fit_scale(img_w, img_h, max_w, max_h):
+    """
+    Scale factor (visual / original) that fits the image into max_w x max_h.
+    Images are only ever scaled down.
+    """
+    scale = min(max_w / img_w, max_h / img_h)
+    if scale < 1.0:
+        return scale
+    return 1.0
+
+
+class DisplayFrame:
+    """
+    A decoded image already resized for display.
+    - image: PIL image at display size (ImageTk.PhotoImage is created on the Tk thread)
+    - scale_factor: display / original, exact for the original size
+    - orig_size: (w, h) of the source image
+    - overlays: parsed label shapes from the tool's overlay_loader (None = not loaded,
+      e.g. a draft preview: they come with the full frame)
+    - cache_key: frame_cache_key() of the files it was loaded from (None for drafts)
+    """
+    def __init__(self, path, image, scale_factor, orig_size, draft=False):
+        self.path = path
+        self.image = image
+        self.scale_factor = scale_factor
+        self.orig_size = orig_size
+        self.draft = draft  # True for the quick preview of load_draft_frame()
+        self.overlays = None
+        self.cache_key = None
+
+    @property
+    def size(self):
+        return self.image.size
+
+
+def load_display_frame(path, max_w, max_h, resample=None):
+    """
+    Decode `path` and resize it to fit max_w x max_h.
+    Safe to call from worker threads (no Tk calls).
+    """
+    if resample is None:
+        resample = get_resample("LANCZOS")
+
+    pil_img = Image.open(path)
+    img_w, img_h = pil_img.size
+    scale_factor = fit_scale(img_w, img_h, max_w, max_h)
+
+    new_w = int(img_w * scale_factor)
+    new_h = int(img_h * scale_factor)
+
+    with PERF.stage("decode"):
+        pil_img.load()
+    if scale_factor < 1.0:
+        with PERF.stage("resize"):
+            display_img = pil_img.resize((new_w, new_h), resample)
+    else:
+        display_img = pil_img
+
+    return DisplayFrame(path, display_img, scale_factor, (img_w, img_h))
+
+
+@PERF.timed("decode_draft")
+def load_draft_frame(path, max_w, max_h):
+    """
+    Quick preview: let the JPEG decoder skip detail (DCT scaling 1/2 .. 1/8) via
+    Image.draft(), then resize to the exact display size with a cheap filter.
+    The display size and scale_factor are the same as load_display_frame(), only the
+    pixels are lower quality, so box coordinates never depend on which stage is shown.
+    """
+    pil_img = Image.open(path)
+    img_w, img_h = pil_img.size
+    scale_factor = fit_scale(img_w, img_h, max_w, max_h)
+
+    new_w = int(img_w * scale_factor)
+    new_h = int(img_h * scale_factor)
+
+    if scale_factor < 1.0:
+        pil_img.draft(pil_img.mode, (new_w, new_h))  # no-op for non-JPEG files
+        display_img = pil_img.resize((new_w, new_h), get_resample("BILINEAR"))
+        return DisplayFrame(path, display_img, scale_factor, (img_w, img_h), draft=True)
+
+    pil_img.load()
+    return DisplayFrame(path, pil_img, scale_factor, (img_w, img_h))
+
+
+def when_ready(widget, future, callback, interval=20):
+    """
+    Call callback(future) on the Tk thread once `future` is done.
+    Polls with widget.after() (Tk is not thread-safe) and runs the callback when idle.
+    """
+    def poll():
+        if future.done():
+            widget.after_idle(callback, future)
+        else:
+            widget.after(interval, poll)
+    poll()
+
+
+class ImagePrefetcher:
+    """
+    Decodes and resizes the images around the current index on worker threads,
+    so advancing only has to swap a ready bitmap.
+
+    Usage (Tk thread):
+        frame = prefetcher.get(path)                    # blocks only on a miss
+        frame, refine = prefetcher.get_progressive(path) # never blocks on the full decode
+        prefetcher.schedule(image_list, index, key=...) # warm the window, cancel the rest
+
+    Finished frames go into a FrameCache (LRU keyed by path, image and sidecar JSON
+    mtime and display size), so going Back to anything seen recently is a cache hit;
+    an edited JSON misses, since its overlays are part of the frame. `overlay_loader(path)`,
+    if given, runs in the worker too and its result is kept on frame.overlays.
+    """
+    def __init__(self, max_w, max_h, resample=None,
+                 ahead=PREFETCH_AHEAD, behind=PREFETCH_BEHIND, workers=PREFETCH_WORKERS,
+                 progressive=PROGRESSIVE_PREVIEW, overlay_loader=None, cache=None):
+        self.progressive = progressive
+        self.overlay_loader = overlay_loader
+        self.cache = cache if cache is not None else FrameCache()
+        self.max_w = max_w
+        self.max_h = max_h
+        self.resample = resample if resample is not None else get_resample("LANCZOS")
+        self.ahead = ahead
+        self.behind = behind
+
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._futures = {}  # path -> Future[DisplayFrame]
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _cache_key(self, path):
+        try:
+            return frame_cache_key(path, self.max_w, self.max_h)
+        except OSError:
+            return None
+
+    def _cached(self, path):
+        key = self._cache_key(path)
+        if key is None:
+            return None
+        return self.cache.get(key)
+
+    def load_overlays(self, path):
+        """Run the overlay loader; errors are printed, not raised (the image still shows)."""
+        if self.overlay_loader is None:
+            return None
+        try:
+            return self.overlay_loader(path)
+        except Exception as e:
+            print(f"Failed to load overlays for {path}: {e}")
+            return []
+
+    def _load(self, path):
+        key = self._cache_key(path)
+        frame = load_display_frame(path, self.max_w, self.max_h, self.resample)
+        with PERF.stage("overlay_parse"):
+            frame.overlays = self.load_overlays(path)
+        frame.cache_key = key
+        if key is not None:
+            self._cache_put(key, frame)
+        return frame
+
+    def _cache_put(self, key, frame):
+        # Caching is an optimization: a failure here must not fail the load
+        try:
+            self.cache.put(key, frame)
+        except Exception as e:
+            print(f"[ERROR] Frame cache put failed for {frame.path}: {e}")
+
+    def _submit(self, path):
+        # Caller holds self._lock
+        fut = self._futures.get(path)
+        # a failed load is retried (NFS hiccup, file still being written), not re-raised forever;
+        # a finished one is redone if the image or its JSON changed on disk since
+        if (fut is None or fut.cancelled() or (fut.done() and fut.exception() is not None) or
+                (fut.done() and fut.result().cache_key != self._cache_key(path))):
+            fut = self._pool.submit(self._load, path)
+            self._futures[path] = fut
+        return fut
+
+    def get(self, path):
+        """
+        Return the DisplayFrame for `path`.
+        Uses the prefetched result if ready, waits if in flight, loads now otherwise.
+        Loader errors are re-raised to the caller.
+        """
+        frame = self._cached(path)
+        if frame is not None:
+            return frame
+        if self._closed:
+            return self._load(path)
+
+        with self._lock:
+            fut = self._submit(path)
+        try:
+            return fut.result()
+        except CancelledError:
+            # Cancelled by a concurrent schedule() between submit and result
+            return self._load(path)
+
+    def get_progressive(self, path):
+        """
+        Return (frame, refine_future).
+        - Prefetched (or progressive off): (full frame, None)
+        - Otherwise: (draft preview decoded now, future of the full-quality frame).
+          The draft has no overlays: the loader can be slow (suggestions, lesion masks)
+          and runs with the full frame on the worker. Use when_ready() to swap the
+          full frame in and draw its overlays; the future may be cancelled if the
+          user moves on before it finishes.
+        """
+        frame = self._cached(path)
+        if frame is not None:
+            return frame, None
+        if self._closed or not self.progressive:
+            return self.get(path), None
+
+        with self._lock:
+            fut = self._submit(path)
+        if fut.done() and not fut.cancelled():
+            return fut.result(), None
+
+        try:
+            frame = load_draft_frame(path, self.max_w, self.max_h)
+        except Exception:
+            # Let the full loader report the error
+            return self.get(path), None
+        return frame, fut
+
+    def schedule(self, items, index, key=None):
+        """
+        Prefetch the window [index - behind, index + ahead] of `items`.
+        Anything outside the window is cancelled (queued) or forgotten (running),
+        so a jump never waits behind stale work.
+        `key` maps a list item to its image path (e.g. lambda t: t[0] for (jpg, json) tuples).
+        """
+        if self._closed:
+            return
+
+        # Order matters: the pool is FIFO, so the next images come before the previous one
+        wanted = []
+        for i in range(index, min(len(items), index + self.ahead + 1)):
+            wanted.append(items[i])
+        for i in range(index - 1, max(-1, index - self.behind - 1), -1):
+            wanted.append(items[i])
+        if key is not None:
+            wanted = [key(item) for item in wanted]
+
+        wanted_set = set(wanted)
+        with self._lock:
+            for path in list(self._futures):
+                if path not in wanted_set:
+                    self._futures.pop(path).cancel()
+            for path in wanted:
+                if path not in self._futures:
+                    key = self._cache_key(path)
+                    if key is not None and key in self.cache:
+                        continue
+                self._submit(path)
+
+    def clear(self):
+        """Cancel and forget everything (e.g. when a new folder is opened)."""
+        with self._lock:
+            for fut in self._futures.values():
+                fut.cancel()
+            self._futures.clear()
+
+    def shutdown(self):
+        self._closed = True
+        self.clear()
+        print(f"[DEBUG] Frame cache: {self.cache.stats()}")
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,63 @@
+import math
+
+from PIL import Image
+
+# Levels stop once the image is this small (no point reducing further)
+MIN_LEVEL_SIDE = 64
+# Tiles are at most a 2x downscale of their level (or an upscale when zoomed in)
+TILE_RESAMPLE = Image.Resampling.BILINEAR
+
+
+class ImagePyramid:
+    """
+    Full-resolution image plus 1/2, 1/4, ... levels, each made by Image.reduce(2)
+    from the level above. Decoded and reduced lazily: only down to the level a zoom needs.
+    Safe to use from one thread at a time (no Tk calls).
+    """
+    def __init__(self, path):
+        self.path = path
+        self._levels = []
+
+    def _base(self):
+        img = Image.open(self.path)
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        img.load()
+        return img
+
+    @property
+    def size(self):
+        return self.level(0).size
+
+    def level(self, k):
+        if not self._levels:
+            self._levels.append(self._base())
+        while len(self._levels) <= k:
+            top = self._levels[-1]
+            if min(top.size) < MIN_LEVEL_SIDE * 2:
+                return top
+            self._levels.append(top.reduce(2))
+        return self._levels[k]
+
+    @staticmethod
+    def level_for(zoom):
+        """Smallest level that still has at least as many pixels as the display at `zoom`."""
+        if zoom >= 1.0:
+            return 0
+        return max(0, int(math.floor(math.log2(1.0 / zoom) + 1e-9)))
+
+    def render(self, zoom, box):
+        """
+        Display-space box (x0, y0, x1, y1) at `zoom` (display / original) -> PIL image of
+        that region. Only the region is resampled, from the closest level above it.
+        """
+        level = self.level(self.level_for(zoom))
+        orig_w, orig_h = self.size
+        sx = level.width / orig_w / zoom
+        sy = level.height / orig_h / zoom
+        x0, y0, x1, y1 = box
+        src = (x0 * sx, y0 * sy, min(level.width, x1 * sx), min(level.height, y1 * sy))
+        return level.resize((int(x1 - x0), int(y1 - y0)), TILE_RESAMPLE, box=src)
+
+    def release(self):
+        self._levels = []
@@ -0,0 +1,158 @@
+"""
+Statistical QA of a batch from a sample instead of a full review.
+
+The batch is split into strata (lesion code + source folder of the original), a
+proportional random sample is drawn from every stratum with a fixed seed, and the
+sample is reviewed in a shuffled order, so any prefix of it is itself a random sample
+of the batch. After every decision the Wilson interval of the reject rate is
+recomputed, and review stops as soon as the interval is clear of the acceptable
+reject rate:
+
+- accept    the whole interval is below it
+- escalate  the whole interval is above it (the batch needs a full review)
+
+The sample is sized for +-margin at the worst case, so it usually stops well before
+its end; if it does not, the point estimate decides.
+
+The plan (seed, strata, items in review order) is saved to a JSON file, so the same
+sample is reviewed after a restart and can be redrawn from the seed. Stdlib only.
+"""
+import json
+import math
+import os
+import random
+import time
+from statistics import NormalDist
+
+SAMPLE_CONFIDENCE = 0.95
+# Half-width of the interval the sample size is computed for (worst case p = 0.5)
+SAMPLE_MARGIN = 0.03
+# Reject rate up to which a batch is accepted
+MAX_REJECT_RATE = 0.05
+# No early stop before this many decisions (the interval is unreliable below)
+MIN_DECISIONS = 30
+MIN_PER_STRATUM = 1
+
+ACCEPT = "accept"
+ESCALATE = "escalate"
+
+
+def _z(confidence):
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def sample_size(population, margin=SAMPLE_MARGIN, confidence=SAMPLE_CONFIDENCE):
+    """Items needed for +-margin at p = 0.5, with the finite population correction."""
+    if population <= 0:
+        return 0
+    n0 = _z(confidence) ** 2 * 0.25 / margin ** 2
+    return min(population, math.ceil(n0 / (1 + (n0 - 1) / population)))
+
+
+def allocate(sizes, total, min_per_stratum=MIN_PER_STRATUM):
+    """
+    {stratum: population} -> {stratum: sample count}, proportional (largest remainder),
+    at least min_per_stratum per stratum while `total` allows it, never above the population.
+    """
+    population = sum(sizes.values())
+    total = min(total, population)
+    if total <= 0:
+        return {key: 0 for key in sizes}
+    counts = {key: min(size, min_per_stratum) for key, size in sizes.items()}
+    if sum(counts.values()) >= total:
+        # more strata than the sample: the largest ones get theirs first
+        order = sorted(sizes, key=lambda key: (-sizes[key], key))
+        return {key: (1 if i < total else 0) for i, key in enumerate(order)}
+    # proportional quotas, raised to the minimum, then corrected to `total` by remainder
+    quotas = {key: size * total / population for key, size in sizes.items()}
+    counts = {key: min(sizes[key], max(counts[key], int(quotas[key]))) for key in sizes}
+    by_remainder = sorted(sizes, key=lambda key: (-(quotas[key] - int(quotas[key])), -sizes[key], key))
+    left = total - sum(counts.values())
+    while left != 0:
+        step = 1 if left > 0 else -1
+        # grow the largest remainders first, shrink the smallest ones (never below the minimum)
+        for key in (by_remainder if step > 0 else reversed(by_remainder)):
+            if left == 0:
+                break
+            floor = min(sizes[key], min_per_stratum)
+            if (step > 0 and counts[key] < sizes[key]) or (step < 0 and counts[key] > floor):
+                counts[key] += step
+                left -= step
+    return counts
+
+
+def stratified_sample(items, stratum_of, size, seed, min_per_stratum=MIN_PER_STRATUM):
+    """
+    items -> (sample in review order, {stratum: {"population", "sample"}}).
+    Same items, stratum_of and seed -> same sample, whatever order items come in.
+    """
+    strata = {}
+    for item in items:
+        strata.setdefault(stratum_of(item), []).append(item)
+    counts = allocate({key: len(members) for key, members in strata.items()}, size, min_per_stratum)
+    rng = random.Random(seed)
+    sample = []
+    for key in sorted(strata):
+        members = sorted(strata[key])
+        sample.extend(rng.sample(members, counts[key]))
+    rng.shuffle(sample)
+    summary = {key: {"population": len(strata[key]), "sample": counts[key]} for key in sorted(strata)}
+    return sample, summary
+
+
+def wilson_interval(rejects, n, confidence=SAMPLE_CONFIDENCE):
+    """(low, high) of the reject rate; (0.0, 1.0) with no decisions."""
+    if n <= 0:
+        return 0.0, 1.0
+    z = _z(confidence)
+    p = rejects / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def early_stop(rejects, n, max_rate=MAX_REJECT_RATE, confidence=SAMPLE_CONFIDENCE,
+               min_decisions=MIN_DECISIONS, exhausted=False):
+    """ACCEPT, ESCALATE or None (keep sampling). exhausted=True: the sample is done, always decide."""
+    if n <= 0:
+        return None
+    low, high = wilson_interval(rejects, n, confidence)
+    if n >= min_decisions or exhausted:
+        if high < max_rate:
+            return ACCEPT
+        if low > max_rate:
+            return ESCALATE
+    if exhausted:
+        return ACCEPT if rejects / n <= max_rate else ESCALATE
+    return None
+
+
+def load_plan(path):
+    """Saved plan dict, or None if missing/unreadable."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            plan = json.load(f)
+        plan["items"]  # required
+        return plan
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"[ERROR] Sampling plan unreadable, drawing a new one: {e}")
+        return None
+
+
+def save_plan(path, plan):
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(plan, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def new_plan(sample, strata, seed, population, stratum_of, name_of, **settings):
+    """Plan dict for save_plan(): items are {"image", "stratum"} in review order."""
+    plan = {"created": time.time(), "seed": seed, "population": population, "size": len(sample)}
+    plan.update(settings)
+    plan["strata"] = strata
+    plan["items"] = [{"image": name_of(item), "stratum": stratum_of(item)} for item in sample]
+    return plan
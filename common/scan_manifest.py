@@ -0,0 +1,133 @@
+import os
+import threading
+
+from common.dir_manifest import DirectoryManifest, cache_path_for
+from common.journal import resume_position
+
+SCAN_FILE = ".scan_manifest.json"
+SCAN_FILE_FLAT = ".scan_manifest_flat.json"  # non-recursive listing of the same folder
+
+
+def iter_images(root, recursive=True, require_json=False):
+    """
+    Yield the .jpg files under `root` in sorted(full path) order (like sorted(glob(...))),
+    as the tree is walked: nothing waits for the whole scan.
+    require_json=True: (jpg_path, json_path) pairs, only where the sidecar exists;
+    the check uses the directory listing instead of one exists() per image.
+
+    The listing is cached in a DirectoryManifest next to the data (or in ~/.cache when
+    read-only); directories whose mtime is unchanged are not listed again. The cache is
+    saved once the walk completes.
+    """
+    manifest = DirectoryManifest(root, suffixes=(".jpg", ".json"), recursive=recursive)
+    cache_path = cache_path_for(root, SCAN_FILE if recursive else SCAN_FILE_FLAT)
+    manifest.load(cache_path)
+
+    names_rel, names = None, None
+    for rel, name in manifest.refresh_iter():
+        if not name.lower().endswith(".jpg"):
+            continue
+        jpg_path = manifest.full_path(rel, name)
+        if not require_json:
+            yield jpg_path
+            continue
+        if rel != names_rel:
+            names_rel, names = rel, set(manifest.listing(rel))
+        json_name = os.path.splitext(name)[0] + ".json"
+        if json_name in names:
+            yield jpg_path, manifest.full_path(rel, json_name)
+
+    changed = len(manifest.changed) + manifest.removed
+    if changed:
+        manifest.save(cache_path)
+    print(f"[DEBUG] Scan manifest: {len(manifest.dirs)} dirs ({changed} rescanned) in {root}")
+
+
+def scan_images(root, recursive=True, require_json=False):
+    """Complete, sorted list from iter_images()."""
+    return list(iter_images(root, recursive, require_json))
+
+
+class StreamingScan:
+    """
+    iter_images() on a background thread, appending to `items` as files are found.
+
+    `items` is the tool's image_list: the order is final as soon as an item is
+    appended (the walk yields in sorted order), so indexes into it - resume
+    positions included - mean the same thing as with a full scan.
+    UI code checks `done`, and uses when_available() to wait for an index.
+    `source`: an iterable of items to use instead of the walk (e.g. a review queue).
+    """
+    def __init__(self, root, recursive=True, require_json=False, accept=None, source=None):
+        self.items = []
+        self.done = False
+        self.error = None
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(root, recursive, require_json, accept, source),
+                                        name="scan", daemon=True)
+        self._thread.start()
+
+    def _run(self, root, recursive, require_json, accept, source):
+        try:
+            items = source if source is not None else iter_images(root, recursive, require_json)
+            for item in items:
+                if self._cancelled.is_set():
+                    return
+                if accept is None or accept(item):
+                    self.items.append(item)
+        except Exception as e:
+            self.error = e
+            print(f"[ERROR] Scan failed in {root}: {e}")
+        finally:
+            self.done = True
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def available(self, count):
+        return self.done or (count is not None and len(self.items) >= count)
+
+    def when_available(self, widget, count, callback, interval=50):
+        """Call callback() on the Tk thread once `count` items exist (None: once the scan ended)."""
+        def poll():
+            if self._cancelled.is_set():
+                return
+            if self.available(count):
+                callback()
+            else:
+                widget.after(interval, poll)
+        poll()
+
+    def watch(self, widget, on_progress, interval=500):
+        """on_progress() every `interval` ms while scanning, and once more at the end."""
+        def poll():
+            if self._cancelled.is_set():
+                return
+            on_progress()
+            if not self.done:
+                widget.after(interval, poll)
+        widget.after(interval, poll)
+
+    def status_text(self):
+        if self.done:
+            return ""
+        return f"{len(self.items)} found, scan in progress"
+
+
+def when_resume_position(scan, widget, entry, callback, key=None):
+    """
+    callback(index) with journal.resume_position(entry, scan.items) as soon as it is
+    known: once the entry's own index has been scanned and still holds its source,
+    otherwise (list changed since) after the whole scan.
+    """
+    def path_at(i):
+        return key(scan.items[i]) if key else scan.items[i]
+
+    def settle():
+        idx, src = entry["index"], entry.get("src")
+        if scan.done or not src or (0 <= idx < len(scan.items) and path_at(idx) == src):
+            callback(resume_position(entry, scan.items, key))
+        else:
+            scan.when_available(widget, None, settle)
+
+    scan.when_available(widget, entry["index"] + 1, settle)
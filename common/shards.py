@@ -0,0 +1,242 @@
+"""
+Packed export of labeled outputs: image/JSON pairs streamed into fixed-size tar shards
+(WebDataset layout: members "<key>.jpg" + "<key>.json" next to each other), so training
+reads a few large files sequentially instead of millions of small ones.
+
+    shard-000000.tar ...      sealed shards (at most SHARD_MAX_BYTES / SHARD_MAX_COUNT)
+    shard-000007.tar.part     the shard being written
+    index.jsonl               one line per sample: shard, byte offsets of each member
+
+Removals (Back/Undo in a tool) append {"key", "deleted": true} to the index; the bytes
+stay in the shard until the folder is packed again.
+
+Batch pass over an existing output folder (A7 output, relabeled/A1 ...):
+    python -m common.shards /data/A7_out --out /data/A7_shards
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tarfile
+import threading
+import time
+
+SHARD_MAX_BYTES = 1024 ** 3
+SHARD_MAX_COUNT = 10000
+SHARD_PREFIX = "shard"
+INDEX_FILE = "index.jsonl"
+
+
+def _padded(size):
+    return (size + tarfile.BLOCKSIZE - 1) // tarfile.BLOCKSIZE * tarfile.BLOCKSIZE
+
+
+def sample_key(root, path):
+    """Key of an output file: its path under `root` without extension, "/"-separated."""
+    return os.path.splitext(os.path.relpath(path, root))[0].replace(os.sep, "/")
+
+
+def read_index(shard_dir):
+    """key -> index record of the samples currently in the shards (deletions applied)."""
+    samples = {}
+    path = os.path.join(shard_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return samples
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # torn last line after a crash
+            if rec.get("deleted"):
+                samples.pop(rec["key"], None)
+            else:
+                samples[rec["key"]] = rec
+    return samples
+
+
+class ShardWriter:
+    """
+    Appends samples to the current shard, sealing it (tar.part -> tar) when it is full.
+    Thread-safe, so BackgroundWriter workers can add samples directly.
+    A .part left by a crash is cut back to its last indexed sample and sealed on open.
+    """
+    def __init__(self, out_dir, max_bytes=SHARD_MAX_BYTES, max_count=SHARD_MAX_COUNT, prefix=SHARD_PREFIX):
+        self.out_dir = out_dir
+        self.max_bytes = max_bytes
+        self.max_count = max_count
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._tar = None
+        self._count = 0
+        os.makedirs(out_dir, exist_ok=True)
+        self._index = open(os.path.join(out_dir, INDEX_FILE), 'a', encoding='utf-8')
+        self._number = self._recover()
+
+    def _shard_name(self, number):
+        return f"{self.prefix}-{number:06d}.tar"
+
+    def _recover(self):
+        numbers = []
+        for name in os.listdir(self.out_dir):
+            if name.startswith(self.prefix + "-") and (name.endswith(".tar") or name.endswith(".tar.part")):
+                try:
+                    numbers.append(int(name[len(self.prefix) + 1:].split(".")[0]))
+                except ValueError:
+                    pass
+        for number in sorted(numbers):
+            part = os.path.join(self.out_dir, self._shard_name(number) + ".part")
+            if not os.path.exists(part):
+                continue
+            # keep what the index knows about, then seal it
+            shard = self._shard_name(number)
+            end = max([rec["end"] for rec in read_index(self.out_dir).values() if rec["shard"] == shard],
+                      default=0)
+            with open(part, 'r+b') as f:
+                f.truncate(end)
+                f.seek(end)
+                f.write(b"\0" * tarfile.BLOCKSIZE * 2)  # end-of-archive marker
+            os.replace(part, os.path.join(self.out_dir, shard))
+            print(f"[DEBUG] Sealed interrupted shard {shard} at {end} bytes")
+        return max(numbers) + 1 if numbers else 0
+
+    def _open_shard(self):
+        part = os.path.join(self.out_dir, self._shard_name(self._number) + ".part")
+        self._tar = tarfile.open(part, 'w', format=tarfile.PAX_FORMAT)
+        self._count = 0
+
+    def _seal(self):
+        if self._tar is None:
+            return
+        name = self._shard_name(self._number)
+        self._tar.close()
+        os.replace(os.path.join(self.out_dir, name + ".part"), os.path.join(self.out_dir, name))
+        self._tar = None
+        self._number += 1
+        print(f"[DEBUG] Shard sealed: {name} ({self._count} samples)")
+
+    def add(self, key, members):
+        """members: {"jpg": bytes, "json": bytes, ...} -> <key>.<ext>, written in this order."""
+        size = sum(_padded(len(data)) + tarfile.BLOCKSIZE for data in members.values())
+        with self._lock:
+            if self._tar is not None and (self._count >= self.max_count or
+                                          self._tar.offset + size > self.max_bytes):
+                self._seal()
+            if self._tar is None:
+                self._open_shard()
+            tar = self._tar
+            record = {"key": key, "shard": self._shard_name(self._number), "offset": tar.offset, "members": {}}
+            for ext, data in members.items():
+                info = tarfile.TarInfo(f"{key}.{ext}")
+                info.size = len(data)
+                info.mtime = time.time()
+                tar.addfile(info, io.BytesIO(data))
+                # data sits right before the padding that ends at tar.offset
+                record["members"][ext] = [tar.offset - _padded(len(data)), len(data)]
+            record["end"] = tar.offset
+            tar.fileobj.flush()
+            self._index.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._index.flush()
+            self._count += 1
+
+    def add_files(self, key, paths):
+        """add() with members read from files: {"jpg": path, "json": path}."""
+        members = {}
+        for ext, path in paths.items():
+            with open(path, 'rb') as f:
+                members[ext] = f.read()
+        self.add(key, members)
+
+    def add_pair(self, key, image_path, doc):
+        """An output pair: image bytes from image_path, the label document as compact JSON."""
+        with open(image_path, 'rb') as f:
+            image = f.read()
+        # compact JSON: the pretty-printed whitespace of the loose files is dead weight here
+        data = json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.add(key, {"jpg": image, "json": data})
+
+    def remove(self, key):
+        with self._lock:
+            self._index.write(json.dumps({"key": key, "deleted": True}, ensure_ascii=False) + "\n")
+            self._index.flush()
+
+    def close(self):
+        with self._lock:
+            self._seal()
+            self._index.close()
+
+
+def read_member(shard_dir, record, ext):
+    """Random access to one member through its index record (no tar parsing)."""
+    offset, size = record["members"][ext]
+    path = os.path.join(shard_dir, record["shard"])
+    if not os.path.exists(path):
+        path += ".part"
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+def iter_samples(shard_path):
+    """
+    (key, {ext: bytes}) in file order, reading the shard as one sequential stream.
+    Removed samples are still in the bytes: skip keys missing from read_index().
+    """
+    key, members = None, {}
+    with tarfile.open(shard_path, 'r|') as tar:
+        for info in tar:
+            if not info.isfile():
+                continue
+            k, _, ext = info.name.rpartition(".")
+            if k != key and members:
+                yield key, members
+                members = {}
+            key = k
+            members[ext] = tar.extractfile(info).read()
+    if members:
+        yield key, members
+
+
+def pack_folder(src_dir, out_dir, max_bytes=SHARD_MAX_BYTES, max_count=SHARD_MAX_COUNT, recursive=True):
+    """Batch pass: every image/JSON pair under src_dir, in sorted order. Returns the sample count."""
+    from common.scan_manifest import scan_images  # cached listing of the output folder
+
+    writer = ShardWriter(out_dir, max_bytes, max_count)
+    done = read_index(out_dir)
+    count = 0
+    try:
+        for jpg, json_path in scan_images(src_dir, recursive=recursive, require_json=True):
+            key = sample_key(src_dir, jpg)
+            if key in done:
+                continue  # packed by an earlier (interrupted) run
+            with open(json_path, 'r', encoding='utf-8') as f:
+                doc = json.load(f)
+            writer.add_pair(key, jpg, doc)
+            count += 1
+            if count % 1000 == 0:
+                print(f"  {count} samples packed")
+    finally:
+        writer.close()
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m common.shards",
+                                     description="Pack an output folder's image/JSON pairs into tar shards.")
+    parser.add_argument("src", help="output folder (e.g. TARGET_OUTPUT_DIR or relabeled/)")
+    parser.add_argument("--out", required=True, help="shard folder")
+    parser.add_argument("--max-mb", type=int, default=SHARD_MAX_BYTES // 1024 ** 2, help="max shard size")
+    parser.add_argument("--max-count", type=int, default=SHARD_MAX_COUNT, help="max samples per shard")
+    parser.add_argument("--flat", action="store_true", help="only the top folder (no subfolders)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    count = pack_folder(args.src, args.out, args.max_mb * 1024 ** 2, args.max_count, recursive=not args.flat)
+    print(f"Packed {count} samples into {args.out} in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    sys.exit(main())
@@ -0,0 +1,189 @@
+import math
+from collections import OrderedDict
+
+from PIL import ImageTk
+
+from common.perf import PERF
+from common.pyramid import ImagePyramid
+
+TILE_SIZE = 256
+# PhotoImage tiles kept for the current image (~256 KB each)
+TILE_CACHE = 192
+ZOOM_STEP = 1.25
+MAX_ZOOM = 4.0
+
+
+class TiledViewer:
+    """
+    Zoom/pan on top of a tool's canvas.
+
+    At the fit zoom the tool's own image item (the prefetched display frame) is shown
+    as before. Any other zoom hides it and draws TILE_SIZE tiles rendered from an
+    ImagePyramid of the original file, only for the part of the canvas in view (plus
+    one tile around it); scrolling renders the newly exposed tiles.
+
+    Canvas coordinates are always original * zoom, so tools keep converting with
+    their scale_factor: on_zoom(zoom) is called after every change to update it and
+    redraw overlays.
+    """
+    def __init__(self, canvas, v_scroll=None, h_scroll=None, on_zoom=None, tile_size=TILE_SIZE):
+        self.canvas = canvas
+        self.v_scroll = v_scroll
+        self.h_scroll = h_scroll
+        self.on_zoom = on_zoom
+        self.tile_size = tile_size
+        self.path = None
+        self.orig_size = (0, 0)
+        self.fit_zoom = 1.0
+        self.zoom = 1.0
+        self.fit_item = None
+        self.fit_size = (0, 0)
+        self.pyramid = None
+        self._tiles = {}  # (tx, ty) -> (canvas item, PhotoImage), current zoom
+        self._photos = OrderedDict()  # (zoom, tx, ty) -> PhotoImage
+        self._render_pending = None
+
+        canvas.config(xscrollcommand=self._on_xscroll, yscrollcommand=self._on_yscroll)
+        canvas.bind("<Configure>", lambda e: self._schedule_render(), add="+")
+
+    def bind_keys(self, root):
+        """Ctrl+wheel zooms at the mouse, +/- zoom at the center, 0 goes back to fit."""
+        root.bind("<Control-MouseWheel>", lambda e: self.zoom_by(ZOOM_STEP if e.delta > 0 else 1 / ZOOM_STEP, e))
+        root.bind("<Control-Button-4>", lambda e: self.zoom_by(ZOOM_STEP, e))
+        root.bind("<Control-Button-5>", lambda e: self.zoom_by(1 / ZOOM_STEP, e))
+        for key in ("<plus>", "<equal>", "<KP_Add>"):
+            root.bind(key, lambda e: self.zoom_by(ZOOM_STEP))
+        for key in ("<minus>", "<KP_Subtract>"):
+            root.bind(key, lambda e: self.zoom_by(1 / ZOOM_STEP))
+        root.bind("<Key-0>", lambda e: self.zoom_fit())
+
+    def reset(self, path, orig_size, fit_zoom, fit_item, fit_size):
+        """A new image is on the canvas: fit_item, fit_size pixels, at fit_zoom."""
+        self.path = path
+        self.orig_size = orig_size
+        self.fit_zoom = fit_zoom
+        self.zoom = fit_zoom
+        self.fit_item = fit_item
+        self.fit_size = fit_size
+        self._tiles = {}  # the canvas was cleared with the old image
+        self._photos.clear()
+        if self.pyramid is not None:
+            self.pyramid.release()
+        self.pyramid = None
+
+    def clear(self):
+        """Nothing on the canvas any more (end of list, new folder)."""
+        self.reset(None, (0, 0), 1.0, None, (0, 0))
+
+    def display_size(self):
+        if self.zoom == self.fit_zoom:
+            return self.fit_size
+        return self.orig_size[0] * self.zoom, self.orig_size[1] * self.zoom
+
+    def zoom_fit(self):
+        self.set_zoom(self.fit_zoom)
+
+    def zoom_by(self, factor, event=None):
+        self.set_zoom(self.zoom * factor, event)
+
+    @PERF.timed("zoom")
+    def set_zoom(self, zoom, event=None):
+        if self.path is None:
+            return
+        zoom = max(self.fit_zoom, min(zoom, max(MAX_ZOOM, self.fit_zoom)))
+        # snap back onto the fit view instead of stopping just above it
+        if abs(zoom - self.fit_zoom) < self.fit_zoom * 0.01:
+            zoom = self.fit_zoom
+        if zoom == self.zoom:
+            return
+
+        # keep the point under the mouse (or the view center) where it is
+        if event is not None and event.widget is self.canvas:
+            wx, wy = event.x, event.y
+        else:
+            wx, wy = self.canvas.winfo_width() / 2, self.canvas.winfo_height() / 2
+        ix = self.canvas.canvasx(wx) / self.zoom
+        iy = self.canvas.canvasy(wy) / self.zoom
+
+        self.zoom = zoom
+        self.canvas.delete("tile")
+        self._tiles = {}
+        width, height = self.display_size()
+        if zoom == self.fit_zoom:
+            self.canvas.itemconfig(self.fit_item, state="normal")
+        else:
+            self.canvas.itemconfig(self.fit_item, state="hidden")
+        self.canvas.config(scrollregion=(0, 0, width, height))
+        self.canvas.xview_moveto(max(0.0, (ix * zoom - wx) / width))
+        self.canvas.yview_moveto(max(0.0, (iy * zoom - wy) / height))
+
+        if self.on_zoom is not None:
+            self.on_zoom(zoom)
+        self._render()
+
+    def _on_xscroll(self, first, last):
+        if self.h_scroll is not None:
+            self.h_scroll.set(first, last)
+        self._schedule_render()
+
+    def _on_yscroll(self, first, last):
+        if self.v_scroll is not None:
+            self.v_scroll.set(first, last)
+        self._schedule_render()
+
+    def _schedule_render(self):
+        # many scroll callbacks per wheel notch -> one render when idle
+        if self._render_pending is None:
+            self._render_pending = self.canvas.after_idle(self._render)
+
+    def _visible_tiles(self):
+        t = self.tile_size
+        width, height = self.display_size()
+        x0 = self.canvas.canvasx(0)
+        y0 = self.canvas.canvasy(0)
+        x1 = x0 + self.canvas.winfo_width()
+        y1 = y0 + self.canvas.winfo_height()
+        cols = math.ceil(width / t)
+        rows = math.ceil(height / t)
+        tx0, tx1 = max(0, int(x0 // t) - 1), min(cols - 1, int(x1 // t) + 1)
+        ty0, ty1 = max(0, int(y0 // t) - 1), min(rows - 1, int(y1 // t) + 1)
+        return {(tx, ty) for ty in range(ty0, ty1 + 1) for tx in range(tx0, tx1 + 1)}
+
+    def _tile_photo(self, tx, ty):
+        key = (self.zoom, tx, ty)
+        photo = self._photos.get(key)
+        if photo is not None:
+            self._photos.move_to_end(key)
+            return photo
+        if self.pyramid is None:
+            self.pyramid = ImagePyramid(self.path)
+        t = self.tile_size
+        width, height = self.display_size()
+        box = (tx * t, ty * t, min(width, (tx + 1) * t), min(height, (ty + 1) * t))
+        with PERF.stage("tile_render"):
+            photo = ImageTk.PhotoImage(self.pyramid.render(self.zoom, box))
+        self._photos[key] = photo
+        while len(self._photos) > TILE_CACHE:
+            self._photos.popitem(last=False)
+        return photo
+
+    def _render(self):
+        self._render_pending = None
+        if self.path is None or self.zoom == self.fit_zoom:
+            return
+        try:
+            wanted = self._visible_tiles()
+            for key in list(self._tiles):
+                if key not in wanted:
+                    self.canvas.delete(self._tiles.pop(key)[0])
+            added = False
+            for tx, ty in sorted(wanted - self._tiles.keys()):
+                photo = self._tile_photo(tx, ty)  # held by _tiles too: LRU eviction can't blank it
+                item = self.canvas.create_image(tx * self.tile_size, ty * self.tile_size,
+                                                image=photo, anchor="nw", tags="tile")
+                self._tiles[(tx, ty)] = (item, photo)
+                added = True
+            if added:
+                self.canvas.tag_lower("tile")  # under overlays and the cursor box
+        except Exception as e:
+            print(f"[ERROR] Tile render failed for {self.path}: {e}")
@@ -0,0 +1,141 @@
+import os
+import queue
+import threading
+import traceback
+
+from common.perf import PERF
+
+# Max jobs waiting to be written; the UI blocks on submit() only when this many are queued
+WRITE_QUEUE_SIZE = 16
+WRITE_WORKERS = 2
+
+PENDING, RUNNING, DONE, FAILED, CANCELLED = "pending", "running", "done", "failed", "cancelled"
+
+
+class WriteJob:
+    def __init__(self, fn, args, outputs, label):
+        self.fn = fn
+        self.args = args
+        self.outputs = list(outputs)
+        self.label = label
+        self.state = PENDING
+        self.error = None
+        self.finished = threading.Event()
+
+
+class BackgroundWriter:
+    """
+    Bounded queue of output writes (JSON dump, image link/copy) run on worker threads,
+    so the UI can move to the next image right after a click.
+
+    - submit() blocks only while the queue is full (backpressure)
+    - revert(outputs) is the undo: queued jobs touching those paths are cancelled,
+      running ones are waited for, then the paths are deleted
+    - flush() waits for everything; call it before exit
+    - failures are collected and handed to the UI thread by watch()
+
+    The journal records the decision at submit time, so a hard kill can leave
+    journal entries whose files were never written; flush() on close covers
+    normal exits.
+    """
+    def __init__(self, max_pending=WRITE_QUEUE_SIZE, workers=WRITE_WORKERS):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._jobs = []  # not finished yet, submit order
+        self._errors = []
+        self._threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self._worker, name=f"writer-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                with self._lock:
+                    if job.state == CANCELLED:
+                        continue
+                    job.state = RUNNING
+                try:
+                    with PERF.stage("write_job"):
+                        job.fn(*job.args)
+                    state = DONE
+                except Exception as e:
+                    job.error = e
+                    state = FAILED
+                    print(f"[ERROR] Background write failed ({job.label}): {e}")
+                    traceback.print_exc()
+                with self._lock:
+                    job.state = state
+                    if state == FAILED:
+                        self._errors.append(job)
+            finally:
+                if job is not None:
+                    with self._lock:
+                        if job in self._jobs:
+                            self._jobs.remove(job)
+                    job.finished.set()
+                self._queue.task_done()
+
+    def submit(self, fn, *args, outputs=(), label=""):
+        """Queue fn(*args), which creates `outputs`. Blocks while the queue is full."""
+        job = WriteJob(fn, args, outputs, label)
+        with self._lock:
+            self._jobs.append(job)
+        self._queue.put(job)
+        return job
+
+    def pending(self):
+        with self._lock:
+            return len(self._jobs)
+
+    def revert(self, outputs):
+        """
+        Undo the writes that create `outputs`: cancel them if still queued,
+        otherwise wait for them and delete the files.
+        """
+        targets = set(outputs)
+        with self._lock:
+            related = [j for j in self._jobs if targets.intersection(j.outputs)]
+            running = []
+            for job in related:
+                if job.state == PENDING:
+                    job.state = CANCELLED
+                else:
+                    running.append(job)
+        for job in running:
+            job.finished.wait()
+
+        removed = []
+        for path in outputs:
+            if os.path.lexists(path):
+                os.remove(path)
+                removed.append(path)
+        return removed
+
+    def flush(self):
+        """Block until every queued write has finished."""
+        self._queue.join()
+
+    def take_errors(self):
+        with self._lock:
+            errors, self._errors = self._errors, []
+        return errors
+
+    def watch(self, widget, on_error, interval=250):
+        """Poll for failed jobs from the Tk thread; on_error(job) is called for each."""
+        def poll():
+            for job in self.take_errors():
+                on_error(job)
+            widget.after(interval, poll)
+        widget.after(interval, poll)
+
+    def shutdown(self):
+        self.flush()
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
@@ -0,0 +1,40 @@
+import json
+import os
+
+from PIL import Image
+
+import batch_convert
+
+
+def _source(folder, name, size=(640, 480)):
+    img = os.path.join(folder, name + ".jpg")
+    Image.new("RGB", size).save(img)
+    with open(os.path.join(folder, name + ".json"), "w", encoding="utf-8") as f:
+        json.dump({"metaData": {}, "labelingInfo": []}, f)
+    return img
+
+
+def _boxes(path):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return [item["box"]["location"][0] for item in data["labelingInfo"] if "box" in item]
+
+
+def test_same_image_twice_gives_two_outputs(tmp_path):
+    src = tmp_path / "src"
+    out = tmp_path / "out"
+    src.mkdir()
+    _source(str(src), "IMG_D_A1_034851")
+    _source(str(src), "IMG_D_A2_034852")
+    (tmp_path / "list.csv").write_text("image,x,y\n"
+                                       "src/IMG_D_A1_034851.jpg,10,20\n"
+                                       "src/IMG_D_A2_034852.jpg,0,0\n"
+                                       "src/IMG_D_A1_034851.jpg,300,200\n", encoding="utf-8")
+    assert batch_convert.main([str(tmp_path / "list.csv"), "--out", str(out), "--workers", "1",
+                               "--strategy", "copy"]) == 0
+    assert sorted(os.listdir(out)) == [".batch_convert.checkpoint.jsonl",
+                                       "IMG_D_A7_034851_p1.jpg", "IMG_D_A7_034851_p1.json",
+                                       "IMG_D_A7_034851_p2.jpg", "IMG_D_A7_034851_p2.json",
+                                       "IMG_D_A7_034852.jpg", "IMG_D_A7_034852.json"]
+    assert _boxes(out / "IMG_D_A7_034851_p1.json")[0]["x"] == 10
+    assert _boxes(out / "IMG_D_A7_034851_p2.json")[0]["x"] == 300
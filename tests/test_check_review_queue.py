@@ -0,0 +1,35 @@
+import json
+import os
+import time
+import types
+
+import check
+
+
+def _pair(folder, name, mtime):
+    for ext in (".jpg", ".json"):
+        path = os.path.join(folder, name + ext)
+        open(path, "w").close()
+        os.utime(path, (mtime, mtime))
+
+
+def test_outputs_newer_than_the_queue_are_appended(tmp_path, monkeypatch):
+    monkeypatch.setattr(check, "USE_REVIEW_QUEUE", True)
+    folder = str(tmp_path)
+    created = time.time() - 100
+    _pair(folder, "IMG_D_A7_000001", created - 50)  # accepted by preverify
+    _pair(folder, "IMG_D_A7_000002", created - 50)  # queued
+    _pair(folder, "IMG_D_A7_000003", created - 50)  # queued, rejected since
+    os.remove(os.path.join(folder, "IMG_D_A7_000003.jpg"))
+    _pair(folder, "IMG_D_A7_000004", created + 50)  # written after preverify
+    with open(os.path.join(folder, check.REVIEW_QUEUE_FILE), "w", encoding="utf-8") as f:
+        json.dump({"created": created, "items": [
+            {"image": "IMG_D_A7_000002.jpg", "risk": 0.9, "reason": "overlap 5%"},
+            {"image": "IMG_D_A7_000003.jpg", "risk": 0.5, "reason": None}]}, f)
+
+    tool = types.SimpleNamespace(input_dir=folder)
+    tool._iter_review_queue = types.MethodType(check.VerifyTool._iter_review_queue, tool)
+    pairs = list(check.VerifyTool.load_review_queue(tool))
+    assert [os.path.basename(jpg) for jpg, _ in pairs] == ["IMG_D_A7_000002.jpg", "IMG_D_A7_000004.jpg"]
+    assert tool.review_info["IMG_D_A7_000002.jpg"].startswith("risk 0.90")
+    assert "not pre-verified" in tool.review_info["IMG_D_A7_000004.jpg"]
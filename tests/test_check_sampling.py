@@ -0,0 +1,33 @@
+import os
+import threading
+import types
+
+import check
+from common.scan_manifest import StreamingScan
+
+
+def test_sample_is_drawn_on_the_scan_thread(tmp_path, monkeypatch):
+    folder = str(tmp_path)
+    for i in range(40):
+        for ext in (".jpg", ".json"):
+            open(os.path.join(folder, f"IMG_D_A7_{i:06d}{ext}"), "w").close()
+    scanned_on = []
+    real_scan = check.scan_images
+
+    def scan_images(*args, **kwargs):
+        scanned_on.append(threading.current_thread().name)
+        return real_scan(*args, **kwargs)
+
+    monkeypatch.setattr(check, "scan_images", scan_images)
+    tool = types.SimpleNamespace(input_dir=folder, stratum_of=lambda jpg: "A7")
+    tool._iter_sample = types.MethodType(check.VerifyTool._iter_sample, tool)
+
+    sample = check.VerifyTool.load_sample(tool)
+    assert scanned_on == [] and tool.sampling is None  # nothing done on the caller's (Tk) thread
+    scan = StreamingScan(folder, source=sample)
+    scan._thread.join(5)
+    assert scanned_on == ["scan"]
+    assert tool.sampling["population"] == 40
+    assert len(scan.items) == tool.sampling["size"] == check.sample_size(40, check.SAMPLING_MARGIN,
+                                                                       check.SAMPLING_CONFIDENCE)
+    assert os.path.exists(os.path.join(folder, check.SAMPLING_PLAN_FILE))
@@ -0,0 +1,42 @@
+from PIL import Image
+
+from common.frame_cache import FrameCache, estimate_frame_bytes
+from common.lesion_mask import LesionMask
+from common.prefetch import DisplayFrame
+
+
+def _frame(w=10, h=10, overlays=None):
+    frame = DisplayFrame("x.jpg", Image.new("RGB", (w, h)), 1.0, (w, h))
+    frame.overlays = overlays
+    return frame
+
+
+def test_lru_stays_within_budget():
+    cache = FrameCache(max_bytes=3 * 300)
+    for i in range(3):
+        cache.put(i, _frame())
+    cache.get(0)  # 0 is now the most recent
+    cache.put(3, _frame())
+    assert cache.get(1) is None
+    assert cache.get(0) is not None
+    assert cache.bytes == 3 * 300
+    assert cache.evictions == 1
+
+
+def test_oversized_frame_is_not_cached():
+    cache = FrameCache(max_bytes=100)
+    cache.put("big", _frame())
+    assert cache.get("big") is None
+    assert cache.bytes == 0
+
+
+def test_shape_overlays_are_counted():
+    shapes = [("polygon", [0, 0, 5, 0, 5, 5], "A1"), ("box", [1, 1, 2, 2], "A1")]
+    assert estimate_frame_bytes(_frame(overlays={"a7": shapes, "orig": None})) == 300 + 32 * 10
+
+
+def test_lesion_mask_is_counted_by_its_table():
+    mask = LesionMask([("box", [0, 0, 100, 100], "A1")], 1920, 1080)
+    assert mask.sat.width * mask.sat.height == 240 * 135
+    assert estimate_frame_bytes(_frame(overlays={"lesions": mask})) == 300 + mask.nbytes
+    assert mask.nbytes >= 240 * 135 * 8
@@ -0,0 +1,22 @@
+import math
+
+from common.geometry import simplify_flat, display_polygon
+
+
+def test_dense_circle_is_simplified_within_tolerance():
+    pts = []
+    for i in range(2000):
+        a = 2 * math.pi * i / 2000
+        pts += [100 + 50 * math.cos(a), 100 + 50 * math.sin(a)]
+    out = simplify_flat(pts, 0.75)
+    assert 8 <= len(out) < len(pts) // 10
+    assert out[:2] == pts[:2] and out[-2:] == pts[-2:]
+    # every kept vertex is an original one, on the circle
+    for x, y in zip(out[0::2], out[1::2]):
+        assert abs(math.hypot(x - 100, y - 100) - 50) < 1e-6
+
+
+def test_small_polygons_are_kept():
+    tri = [0, 0, 10, 0, 5, 5]
+    assert simplify_flat(tri) == tri
+    assert display_polygon([0, 0, 10, 0, 10, 10, 0, 10], 0.5) == [0, 0, 5, 0, 5, 5, 0, 5]
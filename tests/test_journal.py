@@ -0,0 +1,72 @@
+import json
+
+from common.journal import ActionJournal, resume_position
+
+
+def _lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_replay_rebuilds_undo_stack(tmp_path):
+    path = str(tmp_path / "progress.journal.jsonl")
+    j = ActionJournal(path)
+    j.record("OK", 0, 1, src="a.jpg", counts={"ok": 1})
+    j.record("REJECT", 1, 1, src="b.jpg", outputs=["r/b.jpg"], counts={"ok": 1, "reject": 1})
+    j.record("OK", 1, 2, src="c.jpg", counts={"ok": 2, "reject": 1})
+    assert j.undo()["src"] == "c.jpg"
+    j._f.close()  # crash: no compaction
+
+    j = ActionJournal(path)
+    assert [e["src"] for e in j.entries] == ["a.jpg", "b.jpg"]
+    assert j.counts() == {"ok": 1, "reject": 1}
+    assert j.undo()["outputs"] == ["r/b.jpg"]
+    assert j.last()["src"] == "a.jpg"
+    j.close()
+    # compaction keeps only the effective actions
+    assert [r["src"] for r in _lines(path)] == ["a.jpg"]
+
+
+def test_undo_only_pops_the_matching_record(tmp_path):
+    path = str(tmp_path / "j.jsonl")
+    j = ActionJournal(path)
+    first = j.record("OK", 0, 1, src="a.jpg")
+    j.record("OK", 1, 2, src="b.jpg")
+    j._f.close()
+    # a stray UNDO for a record that isn't last must not pop anything
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"seq": 99, "action": "UNDO", "undo": first["seq"]}) + "\n")
+    j = ActionJournal(path)
+    assert [e["src"] for e in j.entries] == ["a.jpg", "b.jpg"]
+    # new records continue after the highest seq seen
+    assert j.record("OK", 2, 3, src="c.jpg")["seq"] == 100
+    j.close()
+
+
+def test_torn_tail_is_dropped(tmp_path):
+    path = str(tmp_path / "j.jsonl")
+    j = ActionJournal(path)
+    j.record("OK", 0, 1, src="a.jpg")
+    j._f.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"seq": 2, "action": "O')
+    j = ActionJournal(path)
+    j.record("OK", 1, 2, src="b.jpg")
+    j.close()
+    assert [r["src"] for r in _lines(path)] == ["a.jpg", "b.jpg"]
+
+
+def test_base_record_cannot_be_undone(tmp_path):
+    j = ActionJournal(str(tmp_path / "j.jsonl"))
+    j.record("BASE", 5, 5, counts={"ok": 5})
+    assert not j.can_undo()
+    assert j.undo() is None
+    j.close()
+
+
+def test_resume_position_follows_the_source_path():
+    entry = {"index": 1, "next": 2, "src": "b"}
+    assert resume_position(entry, ["a", "b", "c"]) == 2
+    # one file was added before "b"
+    assert resume_position(entry, ["0", "a", "b", "c"]) == 3
+    assert resume_position(entry, [("x", 1), ("b", 2)], key=lambda t: t[0]) == 2
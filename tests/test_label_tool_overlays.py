@@ -0,0 +1,53 @@
+import json
+import types
+
+import pytest
+from PIL import Image
+
+import A7_label_tool
+from common.frame_cache import FrameCache, estimate_frame_bytes
+from common.json_cache import JsonCache
+from common.prefetch import DisplayFrame, ImagePrefetcher
+
+LABELS = {"labelingInfo": [
+    {"box": {"location": [{"x": 600, "y": 300, "width": 400, "height": 300}], "label": "A1"}},
+    {"polygon": {"location": [{"x1": 100, "y1": 700, "x2": 400, "y2": 650, "x3": 350, "y3": 1000}],
+                 "label": "A2"}},
+]}
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "IMG_D_A1_000001.jpg"
+    Image.new("RGB", (1920, 1080)).save(path)
+    (tmp_path / "IMG_D_A1_000001.json").write_text(json.dumps(LABELS), encoding="utf-8")
+    return str(path)
+
+
+def _load_overlays(path):
+    # LabelTool._load_overlays without the Tk window
+    tool = types.SimpleNamespace(json_cache=JsonCache(), box_w=224, box_h=224)
+    return A7_label_tool.LabelTool._load_overlays(tool, path)
+
+
+@pytest.mark.parametrize("overlap_warn", [False, True])
+def test_label_tool_overlays_fit_the_frame_cache(image, monkeypatch, overlap_warn):
+    monkeypatch.setattr(A7_label_tool, "SUGGEST_TOP_K", 3)
+    monkeypatch.setattr(A7_label_tool, "OVERLAP_WARN", overlap_warn)
+    overlays = _load_overlays(image)
+    assert len(overlays["suggestions"]) == 3
+    assert (overlays["lesions"] is not None) == overlap_warn
+
+    frame = DisplayFrame(image, Image.new("RGB", (10, 10)), 1.0, (1920, 1080))
+    frame.overlays = overlays
+    cache = FrameCache()
+    cache.put("key", frame)
+    assert cache.get("key") is frame
+    assert estimate_frame_bytes(frame) > 300
+
+    prefetcher = ImagePrefetcher(960, 540, progressive=False, overlay_loader=_load_overlays)
+    try:
+        frame = prefetcher.get(image)
+        assert prefetcher.cache.bytes == estimate_frame_bytes(frame)
+    finally:
+        prefetcher.shutdown()
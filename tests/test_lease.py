@@ -0,0 +1,65 @@
+import json
+import os
+
+from common.lease import LeaseManager
+
+
+def test_two_annotators_get_different_chunks(tmp_path):
+    a = LeaseManager(str(tmp_path), owner="a", chunk=10)
+    b = LeaseManager(str(tmp_path), owner="b", chunk=10)
+    assert a.start(25) == 0
+    assert b.start(25) == 10
+    for i in range(9):
+        assert a.advance(i) == i + 1
+    assert a.advance(9) == 20  # chunk 0 done, 10 is b's
+    assert not a.seek(15)
+    assert a.seek(5)  # own finished chunk is reopened
+
+
+def test_expired_lock_is_taken_over_at_its_position(tmp_path):
+    a = LeaseManager(str(tmp_path), owner="a", chunk=10, ttl=60)
+    assert a.start(10) == 0
+    a.advance(0)
+    a.advance(1)
+    a.release()  # expires now, keeps "next"
+    b = LeaseManager(str(tmp_path), owner="b", chunk=10)
+    assert b.start(10) == 2  # free chunks come first: only one here
+    with open(os.path.join(b.dir, "chunk_00000000.lock"), encoding="utf-8") as f:
+        assert json.load(f)["owner"] == "b"
+
+
+def test_plan_is_shared(tmp_path):
+    a = LeaseManager(str(tmp_path), owner="a")
+    first = a.load_plan([str(tmp_path / "x.jpg"), str(tmp_path / "y.jpg")])
+    b = LeaseManager(str(tmp_path), owner="b")
+    assert b.load_plan([str(tmp_path / "z.jpg")]) == first
+
+
+def _lock_owner(manager, start=0):
+    with open(os.path.join(manager.dir, f"chunk_{start:08d}.lock"), encoding="utf-8") as f:
+        return json.load(f)["owner"]
+
+
+def test_stalled_holder_does_not_overwrite_the_takeover(tmp_path):
+    a = LeaseManager(str(tmp_path), owner="a", chunk=10, ttl=-1)  # a's lock is expired at once
+    assert a.start(20) == 0
+    b = LeaseManager(str(tmp_path), owner="b", chunk=10)
+    b.total = 20
+    assert b._claim(0) == 0  # takes over a's expired chunk
+    a.renew()
+    assert _lock_owner(b) == "b"
+    assert a.current is None
+    assert a.advance(0) == 10  # a moves on to a free chunk instead
+    assert _lock_owner(b) == "b"
+    assert b.advance(0) == 1
+
+
+def test_stalled_holder_does_not_finish_the_takeover(tmp_path):
+    a = LeaseManager(str(tmp_path), owner="a", chunk=10, ttl=-1)
+    assert a.start(10) == 0
+    b = LeaseManager(str(tmp_path), owner="b", chunk=10)
+    assert b.start(10) == 0
+    a.finish()
+    a.release()
+    assert _lock_owner(b) == "b"
+    assert not os.path.exists(os.path.join(a.dir, "chunk_00000000.done"))
@@ -0,0 +1,50 @@
+import random
+
+from PIL import Image
+
+from common.lesion_mask import LesionMask, SummedAreaTable, suggest_patches
+from common.overlap import box_lesion_metrics
+
+LESIONS = [("box", [600, 300, 400, 300], "A1"),
+           ("polygon", [100, 700, 400, 650, 350, 1000, 120, 980], "A2")]
+
+
+def test_summed_area_table_matches_brute_force():
+    rng = random.Random(1)
+    mask = Image.new("L", (13, 9))
+    mask.putdata([rng.randint(0, 1) for _ in range(13 * 9)])
+    px = mask.load()
+    for pad in (0, 3):
+        sat = SummedAreaTable(mask, pad=pad)
+        for _ in range(200):
+            x0, x1 = sorted(rng.randint(-2, 15) for _ in range(2))
+            y0, y1 = sorted(rng.randint(-2, 11) for _ in range(2))
+            expected = sum(px[x, y] for x in range(max(0, x0), min(13, x1)) for y in range(max(0, y0), min(9, y1)))
+            assert sat.sum(x0, y0, x1, y1) == expected
+
+
+def test_suggestions_stay_clear_of_lesions():
+    suggestions = suggest_patches(LESIONS, 1920, 1080, 224, 224, top_k=3)
+    assert len(suggestions) == 3
+    for x, y, clearance in suggestions:
+        assert 0 <= x <= 1920 - 224 and 0 <= y <= 1080 - 224
+        assert box_lesion_metrics((x, y, 224, 224), LESIONS)[2] >= clearance
+
+
+def test_random_placements_are_disjoint_and_seeded():
+    a = suggest_patches(LESIONS, 1920, 1080, 224, 224, top_k=5, min_clearance=32, max_iou=0.0,
+                        rng=random.Random(7))
+    b = suggest_patches(LESIONS, 1920, 1080, 224, 224, top_k=5, min_clearance=32, max_iou=0.0,
+                        rng=random.Random(7))
+    assert a == b
+    for i, (x, y, _) in enumerate(a):
+        assert box_lesion_metrics((x, y, 224, 224), LESIONS)[2] >= 32
+        for x2, y2, _ in a[i + 1:]:
+            assert abs(x - x2) >= 224 or abs(y - y2) >= 224
+
+
+def test_overlap_fraction():
+    mask = LesionMask(LESIONS, 1920, 1080)
+    assert mask.overlap_fraction(650, 350, 224, 224) == 1.0
+    assert mask.overlap_fraction(1500, 50, 224, 224) == 0.0
+    assert 0.0 < mask.overlap_fraction(500, 300, 224, 224) < 1.0
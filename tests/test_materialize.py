@@ -0,0 +1,57 @@
+import os
+import shutil
+
+import pytest
+
+from common.materialize import OutputMaterializer
+
+
+@pytest.mark.parametrize("strategy", ["auto", "hardlink", "copy"])
+def test_place_copies_and_overwrites(tmp_path, strategy):
+    src = tmp_path / "src.jpg"
+    dst = tmp_path / "out" / "dst.jpg"
+    src.write_bytes(b"new")
+    dst.parent.mkdir()
+    dst.write_bytes(b"old")
+    OutputMaterializer(strategy).place(str(src), str(dst))
+    assert dst.read_bytes() == b"new"
+    assert src.read_bytes() == b"new"
+
+
+@pytest.mark.parametrize("strategy", ["auto", "hardlink", "symlink", "copy"])
+def test_place_onto_itself_keeps_the_source(tmp_path, monkeypatch, strategy):
+    src = tmp_path / "IMG_D_A1_000001.jpg"
+    src.write_bytes(b"original")
+    m = OutputMaterializer(strategy)
+    with pytest.raises(shutil.SameFileError):
+        m.place(str(src), str(src))
+    # the same file through another path (AMBIGUOUS_DIR = "." run from the image folder)
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(shutil.SameFileError):
+        m.place(str(src), os.path.join(".", src.name))
+    assert src.read_bytes() == b"original"
+
+
+def test_place_replaces_an_earlier_linked_output(tmp_path):
+    # labeling the same image again: the old output is a hardlink/symlink of the source
+    src = tmp_path / "a.jpg"
+    src.write_bytes(b"original")
+    os.link(src, tmp_path / "hard.jpg")
+    os.symlink(src, tmp_path / "soft.jpg")
+    m = OutputMaterializer("copy")
+    m.place(str(src), str(tmp_path / "hard.jpg"))
+    m.place(str(src), str(tmp_path / "soft.jpg"))
+    assert src.read_bytes() == b"original"
+    assert not (tmp_path / "soft.jpg").is_symlink()
+    # a hardlinked source placed onto its own name is still refused
+    with pytest.raises(shutil.SameFileError):
+        m.place(str(tmp_path / "hard.jpg"), str(tmp_path / "hard.jpg"))
+    assert src.read_bytes() == b"original"
+
+
+def test_move_across_names(tmp_path):
+    src = tmp_path / "a.jpg"
+    src.write_bytes(b"x")
+    OutputMaterializer().move(str(src), str(tmp_path / "b.jpg"))
+    assert not src.exists()
+    assert (tmp_path / "b.jpg").read_bytes() == b"x"
@@ -0,0 +1,20 @@
+import math
+
+from common.overlap import box_lesion_metrics, clip_to_box, polygon_area
+
+
+def test_clip_and_area():
+    square = [(0, 0), (10, 0), (10, 10), (0, 10)]
+    assert polygon_area(square) == 100
+    assert polygon_area(clip_to_box(square, (5, 5, 10, 10))) == 25
+
+
+def test_box_lesion_metrics():
+    shapes = [("box", [50, 0, 10, 10], "A1"), ("polygon", [0, 0, 10, 0, 10, 10, 0, 10, 0, 0], "A2")]
+    overlap, iou, distance = box_lesion_metrics((5, 0, 10, 10), shapes)
+    assert overlap == 0.5
+    assert math.isclose(iou, 50 / 150)
+    assert distance == 0
+    overlap, iou, distance = box_lesion_metrics((20, 0, 10, 10), shapes)
+    assert (overlap, iou, distance) == (0.0, 0.0, 10)
+    assert box_lesion_metrics((0, 0, 10, 10), []) == (0.0, 0.0, math.inf)
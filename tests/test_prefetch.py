@@ -0,0 +1,86 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+from common.frame_cache import FrameCache
+from common.prefetch import ImagePrefetcher
+
+
+def _jpeg(path, size=(64, 48)):
+    Image.new("RGB", size, (120, 80, 40)).save(path, quality=90)
+    return str(path)
+
+
+@pytest.fixture
+def prefetcher():
+    p = ImagePrefetcher(32, 32, progressive=False)
+    yield p
+    p.shutdown()
+
+
+def test_get_fits_display_size(prefetcher, tmp_path):
+    frame = prefetcher.get(_jpeg(tmp_path / "a.jpg"))
+    assert frame.orig_size == (64, 48)
+    assert frame.size == (32, 24)
+    assert frame.scale_factor == 0.5
+
+
+def test_failed_load_is_retried(prefetcher, tmp_path):
+    path = str(tmp_path / "late.jpg")
+    with pytest.raises(OSError):
+        prefetcher.get(path)  # not written yet
+    _jpeg(path)
+    assert prefetcher.get(path).orig_size == (64, 48)
+
+
+def test_cache_error_does_not_fail_the_load(tmp_path):
+    class BrokenCache(FrameCache):
+        def put(self, key, frame):
+            raise TypeError("bad overlay")
+
+    p = ImagePrefetcher(32, 32, progressive=False, cache=BrokenCache())
+    try:
+        assert p.get(_jpeg(tmp_path / "a.jpg")).size == (32, 24)
+    finally:
+        p.shutdown()
+
+
+def test_draft_leaves_overlays_to_the_worker(tmp_path):
+    threads = []
+
+    def loader(path):
+        threads.append(threading.current_thread().name)
+        time.sleep(0.05)  # slow loader: the full frame can't be done before get_progressive() returns
+        return {"shapes": []}
+
+    p = ImagePrefetcher(32, 32, progressive=True, overlay_loader=loader)
+    try:
+        frame, refine = p.get_progressive(_jpeg(tmp_path / "a.jpg", size=(640, 480)))
+        assert frame.overlays is None
+        assert refine is not None
+        assert refine.result().overlays == {"shapes": []}
+        assert threads and all(name.startswith("prefetch") for name in threads)
+    finally:
+        p.shutdown()
+
+
+def test_edited_sidecar_json_misses_the_cache(tmp_path):
+    def loader(path):
+        with open(os.path.splitext(path)[0] + ".json", encoding="utf-8") as f:
+            return json.load(f)
+
+    json_path = tmp_path / "a.json"
+    json_path.write_text('{"code": "A1"}', encoding="utf-8")
+    p = ImagePrefetcher(32, 32, progressive=False, overlay_loader=loader)
+    try:
+        path = _jpeg(tmp_path / "a.jpg")
+        assert p.get(path).overlays == {"code": "A1"}
+        json_path.write_text('{"code": "A2"}', encoding="utf-8")
+        os.utime(json_path, ns=(time.time_ns(), time.time_ns() + 10 ** 9))  # coarse-mtime filesystems
+        assert p.get(path).overlays == {"code": "A2"}
+    finally:
+        p.shutdown()
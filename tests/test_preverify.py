@@ -0,0 +1,24 @@
+import json
+import os
+
+import preverify
+
+
+def _output(folder, name, text):
+    open(os.path.join(folder, name + ".jpg"), "wb").close()
+    with open(os.path.join(folder, name + ".json"), "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_unreadable_json_is_queued_for_review(tmp_path):
+    folder, originals = tmp_path / "out", tmp_path / "originals"
+    folder.mkdir()
+    originals.mkdir()
+    box = {"labelingInfo": [{"box": {"location": [{"x": 1, "y": 2, "width": 3, "height": 4}]}}]}
+    _output(str(folder), "IMG_D_A7_000001", json.dumps(box))
+    _output(str(folder), "IMG_D_A7_000002", '{"labelingInfo": [')  # truncated write
+
+    assert preverify.main([str(folder), "--originals", str(originals), "--workers", "1"]) == 0
+    with open(folder / preverify.REVIEW_QUEUE_FILE, encoding="utf-8") as f:
+        items = {item["image"]: item["reason"] for item in json.load(f)["items"]}
+    assert items == {"IMG_D_A7_000001.jpg": "no original", "IMG_D_A7_000002.jpg": "unreadable"}
@@ -0,0 +1,47 @@
+import importlib.util
+import os
+import threading
+import types
+
+from common.json_cache import JsonCache
+from common.materialize import OutputMaterializer
+from common.write_queue import BackgroundWriter
+
+_spec = importlib.util.spec_from_file_location(
+    "relabel_tool", os.path.join(os.path.dirname(os.path.dirname(__file__)), "Re-Label", "relabel_tool.py"))
+relabel_tool = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(relabel_tool)
+
+
+class RecordingShards:
+    def __init__(self):
+        self.added = []
+
+    def add_pair(self, key, image_path, data):
+        self.added.append((key, threading.current_thread() is threading.main_thread(), data))
+
+
+def test_pass_writes_and_shards_off_the_ui_thread(tmp_path):
+    src = tmp_path / "in"
+    src.mkdir()
+    jpg, js = src / "IMG_D_A2_000001.jpg", src / "IMG_D_A2_000001.json"
+    jpg.write_bytes(b"jpeg")
+    js.write_text('{"metaData": {}}', encoding="utf-8")
+    out = tmp_path / "out"
+    shards = RecordingShards()
+    steps = []
+    tool = types.SimpleNamespace(
+        image_list=[(str(jpg), str(js))], current_index=0, output_root=str(out),
+        materializer=OutputMaterializer("copy"), json_cache=JsonCache(), shards=shards,
+        writer=BackgroundWriter(),
+        next_image=lambda action, outputs: steps.append((action, outputs)))
+    tool._place_pair = types.MethodType(relabel_tool.RelabelTool._place_pair, tool)
+    try:
+        relabel_tool.RelabelTool._copy_action(tool, "PASS")
+        tool.writer.flush()
+    finally:
+        tool.writer.shutdown()
+    dst = out / "A2" / "IMG_D_A2_000001.jpg"
+    assert steps == [("PASS", [str(dst), str(out / "A2" / "IMG_D_A2_000001.json")])]
+    assert dst.read_bytes() == b"jpeg"
+    assert shards.added == [("A2/IMG_D_A2_000001", False, {"metaData": {}})]
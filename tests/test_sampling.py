@@ -0,0 +1,37 @@
+import pytest
+
+from common.sampling import (ACCEPT, ESCALATE, allocate, early_stop, sample_size, stratified_sample,
+                             wilson_interval)
+
+
+def test_allocate_is_proportional_with_a_minimum():
+    assert allocate({"a": 1000, "b": 3, "c": 1}, 50) == {"a": 48, "b": 1, "c": 1}
+    counts = allocate({"a": 600, "b": 300, "c": 20}, 100)
+    assert sum(counts.values()) == 100
+    assert counts["a"] == pytest.approx(2 * counts["b"], abs=1)
+    assert allocate({"a": 2, "b": 1}, 10) == {"a": 2, "b": 1}
+    assert sum(allocate({k: 5 for k in "abcdef"}, 3).values()) == 3
+
+
+def test_sample_is_seeded_and_order_independent():
+    items = [(f"img{i}", "A1" if i % 3 else "A2") for i in range(300)]
+    sample, strata = stratified_sample(items, lambda it: it[1], 60, seed=3)
+    again, _ = stratified_sample(list(reversed(items)), lambda it: it[1], 60, seed=3)
+    assert sample == again
+    assert len(set(sample)) == 60
+    assert strata == {"A1": {"population": 200, "sample": 40}, "A2": {"population": 100, "sample": 20}}
+    other, _ = stratified_sample(items, lambda it: it[1], 60, seed=4)
+    assert other != sample
+
+
+def test_wilson_interval_and_early_stop():
+    low, high = wilson_interval(0, 73)
+    assert low == 0.0 and high < 0.05
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    assert sample_size(10 ** 6) == 1066
+    assert sample_size(50) == 48
+    assert early_stop(0, 20) is None  # below MIN_DECISIONS
+    assert early_stop(0, 73) == ACCEPT
+    assert early_stop(10, 40) == ESCALATE
+    assert early_stop(20, 400) is None
+    assert early_stop(20, 400, exhausted=True) == ACCEPT
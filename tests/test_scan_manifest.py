@@ -0,0 +1,22 @@
+import os
+
+from common.scan_manifest import scan_images
+
+
+def _touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "w").close()
+
+
+def test_scan_is_sorted_and_pairs_need_json(tmp_path):
+    root = str(tmp_path)
+    for rel in ("b/2.jpg", "b/2.json", "a/1.jpg", "a/1.json", "a/3.jpg"):
+        _touch(os.path.join(root, rel))
+    assert scan_images(root) == [os.path.join(root, p) for p in ("a/1.jpg", "a/3.jpg", "b/2.jpg")]
+    assert [p[0] for p in scan_images(root, require_json=True)] == [os.path.join(root, "a/1.jpg"),
+                                                                   os.path.join(root, "b/2.jpg")]
+    # the cached listing picks up changes
+    _touch(os.path.join(root, "a/3.json"))
+    os.remove(os.path.join(root, "b/2.jpg"))
+    assert [p[0] for p in scan_images(root, require_json=True)] == [os.path.join(root, "a/1.jpg"),
+                                                                   os.path.join(root, "a/3.jpg")]
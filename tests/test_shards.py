@@ -0,0 +1,33 @@
+import os
+
+from common.shards import ShardWriter, iter_samples, read_index, read_member
+
+
+def test_write_read_and_remove(tmp_path):
+    out = str(tmp_path)
+    w = ShardWriter(out, max_count=2)
+    for i in range(3):
+        w.add(f"k{i}", {"jpg": b"J" * (i + 1), "json": b"{}"})
+    w.remove("k1")
+    w.close()
+    index = read_index(out)
+    assert sorted(index) == ["k0", "k2"]
+    assert read_member(out, index["k2"], "jpg") == b"JJJ"
+    shards = sorted(n for n in os.listdir(out) if n.endswith(".tar"))
+    assert len(shards) == 2
+    samples = list(iter_samples(os.path.join(out, shards[0])))
+    assert samples == [("k0", {"jpg": b"J", "json": b"{}"}), ("k1", {"jpg": b"JJ", "json": b"{}"})]
+
+
+def test_interrupted_shard_is_sealed_on_open(tmp_path):
+    out = str(tmp_path)
+    w = ShardWriter(out)
+    w.add("a", {"jpg": b"1", "json": b"{}"})
+    w._tar.fileobj.write(b"garbage from a crash")
+    w._tar.fileobj.flush()
+    w._index.close()  # crash: nothing sealed
+    ShardWriter(out).close()
+    names = sorted(os.listdir(out))
+    assert not any(n.endswith(".part") for n in names)
+    shard = [n for n in names if n.endswith(".tar")][0]
+    assert [k for k, _ in iter_samples(os.path.join(out, shard))] == ["a"]